@@ -31,5 +31,8 @@ setup(
     update_search_preprint=updatepreprint.updatepreprint:main
     update_search_accesses=updatesearch.accesses:main
     update_search_citations=updatesearch.citations:main
+    update_search_replay=updatesearch.replay:main
+    update_search_load=updatesearch.load:main
+    update_search_fakesolr=updatesearch.fakesolr:main
     """
 )
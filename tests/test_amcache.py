@@ -0,0 +1,131 @@
+# coding: utf-8
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+from unittest.mock import MagicMock
+
+from xylose.scielodocument import Article
+
+from updatesearch import amcache
+
+Identifier = namedtuple('Identifier', 'code collection processing_date')
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'article_meta.json')
+
+
+def article(processing_date=None, code=None):
+    with open(FIXTURE) as f:
+        data = json.load(f)
+
+    if processing_date:
+        data['processing_date'] = processing_date
+    if code:
+        data['code'] = code
+        data['article']['v880'] = [{'_': code}]
+
+    return Article(data)
+
+
+class DocumentCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = amcache.DocumentCache(self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_put_and_get(self):
+        self.cache.put(article())
+
+        cached = self.cache.get('scl', 'S0034-89102010000400007', '2010-07-26')
+
+        self.assertEqual('S0034-89102010000400007', cached.publisher_id)
+        self.assertIsNone(self.cache.get('scl', 'S0034-89102010000400007', '2011-01-01'))
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_new_processing_date_replaces_old_version(self):
+        self.cache.put(article())
+        self.cache.put(article('2011-01-01'))
+
+        self.assertIsNone(self.cache.get('scl', 'S0034-89102010000400007', '2010-07-26'))
+        self.assertIsNotNone(self.cache.get('scl', 'S0034-89102010000400007', '2011-01-01'))
+        self.assertEqual(1, len(list(self.cache._files())))
+
+    def test_size_is_restored(self):
+        self.cache.put(article())
+
+        self.assertEqual(self.cache.size, amcache.DocumentCache(self.tmpdir).size)
+
+    def test_least_recently_used_are_evicted(self):
+        self.cache.put(article(code='S0034-89102010000400001'))
+        size = self.cache.size
+        self.cache.max_size = size * 2.5
+
+        old = self.cache.path('scl', 'S0034-89102010000400001', '2010-07-26')
+        os.utime(old, (1, 1))
+
+        self.cache.put(article(code='S0034-89102010000400002'))
+        self.cache.put(article(code='S0034-89102010000400003'))
+
+        self.assertFalse(os.path.exists(old))
+        self.assertEqual(1, self.cache.evicted)
+        self.assertLessEqual(self.cache.size, self.cache.max_size)
+
+
+class CachedClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.client = MagicMock()
+        self.client.documents.return_value = [
+            Identifier('S0034-89102010000400007', 'scl', '2010-07-26')]
+        self.client.document.return_value = article()
+        self.cached = amcache.CachedClient(
+            self.client, amcache.DocumentCache(self.tmpdir))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_documents_are_requested_once(self):
+        first = list(self.cached.documents(collection='scl'))
+        second = list(self.cached.documents(collection='scl'))
+
+        self.assertEqual(1, self.client.document.call_count)
+        self.assertEqual(
+            [a.publisher_id for a in first], [a.publisher_id for a in second])
+        self.assertTrue(self.client.documents.call_args[1]['only_identifiers'])
+
+
+class RestfulClient(object):
+    """
+    Lists only full documents, as articlemeta.client.RestfulClient.
+    """
+
+    def __init__(self, articles):
+        self.articles = articles
+
+    def documents(self, collection=None, issn=None, from_date=None,
+                  until_date=None, fmt='xylose', body=False):
+        return iter(self.articles)
+
+
+class CachedRestfulClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_documents_are_listed_and_cached(self):
+        cache = amcache.DocumentCache(self.tmpdir)
+        cached = amcache.CachedClient(RestfulClient([article()]), cache)
+
+        documents = list(cached.documents(collection='scl'))
+
+        self.assertEqual(['S0034-89102010000400007'], [a.publisher_id for a in documents])
+        self.assertIsNotNone(cache.get('scl', 'S0034-89102010000400007', '2010-07-26'))
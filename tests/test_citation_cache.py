@@ -0,0 +1,54 @@
+# coding: utf-8
+import time
+import unittest
+
+from updatesearch import citation_cache
+
+
+class CitationCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = citation_cache.CitationCache(':memory:')
+        self.now = time.mktime((2020, 6, 1, 0, 0, 0, 0, 0, 0))
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_max_age_recent_documents_refresh_more_often(self):
+        recent = citation_cache.max_age(2020, 0, self.now)
+        old = citation_cache.max_age(1990, 0, self.now)
+
+        self.assertLess(recent, old)
+
+    def test_max_age_frequently_cited_refresh_more_often(self):
+        cited = citation_cache.max_age(2000, citation_cache.FREQUENTLY_CITED, self.now)
+        uncited = citation_cache.max_age(2000, 0, self.now)
+
+        self.assertEqual(uncited / 2, cited)
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get('S0034-89102010000400007'))
+
+    def test_get_fresh_and_stale(self):
+        self.cache.set('S1', 3, year=2020, now=self.now)
+
+        self.assertEqual(3, self.cache.get('S1', now=self.now + 60))
+        self.assertIsNone(self.cache.get('S1', now=self.now + 2 * citation_cache.DAY))
+
+    def test_total_received_fetches_only_on_miss(self):
+        calls = []
+
+        def fetch(pid):
+            calls.append(pid)
+            return 7
+
+        first = self.cache.total_received('S1', fetch, publication_date='2010-05-01')
+        second = self.cache.total_received('S1', fetch, publication_date='2010-05-01')
+
+        self.assertEqual((7, 7), (first, second))
+        self.assertEqual(['S1'], calls)
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_publication_year(self):
+        self.assertEqual(2010, citation_cache.publication_year('2010-05'))
+        self.assertIsNone(citation_cache.publication_year(None))
@@ -0,0 +1,58 @@
+# coding: utf-8
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+
+from updatesearch import dumps
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'article_meta.json')
+
+
+class DumpsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+        with open(FIXTURE) as f:
+            self.data = json.load(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def dump(self, name, codes, opener=open):
+        path = os.path.join(self.tmpdir, name)
+
+        with opener(path, 'wt', encoding='utf-8') as f:
+            for code in codes:
+                f.write(json.dumps(dict(self.data, code=code)) + '\n')
+
+        return path
+
+    def test_read_dump(self):
+        path = self.dump('scl.jsonl.gz', ['S1', 'S2'], opener=gzip.open)
+
+        self.assertEqual(
+            ['S1', 'S2'], [a.data['code'] for a in dumps.read_dump(path)])
+
+    def test_invalid_lines_are_skipped(self):
+        path = self.dump('scl.jsonl', ['S1'])
+        with open(path, 'a') as f:
+            f.write('{invalid\n\n')
+
+        self.assertEqual(1, len(list(dumps.read_dump(path))))
+
+    def test_read_dumps_in_parallel(self):
+        paths = [
+            self.dump('a.jsonl', ['S1', 'S2']),
+            self.dump('b.jsonl.gz', ['S3'], opener=gzip.open),
+            self.dump('c.jsonl', ['S4', 'S5', 'S6']),
+        ]
+
+        articles = dumps.read_dumps(paths, readers=2, queue_size=1)
+
+        self.assertEqual(
+            ['S1', 'S2', 'S3', 'S4', 'S5', 'S6'],
+            sorted(a.data['code'] for a in articles))
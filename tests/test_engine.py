@@ -0,0 +1,124 @@
+# coding: utf-8
+import threading
+import unittest
+
+from updatesearch import engine
+
+
+def double(item):
+    return item * 2
+
+
+class EngineTests(unittest.TestCase):
+
+    def _engine(self, transform, write, **kwargs):
+        self.lines = []
+        kwargs.setdefault('log', self.lines.append)
+        return engine.Engine(transform, write, **kwargs)
+
+    def test_all_items_are_written(self):
+        written = []
+        lock = threading.Lock()
+
+        def write(data):
+            with lock:
+                written.append(data)
+
+        indexer = self._engine(double, write, transformers=3, writers=2, queue_size=2)
+        result = indexer.run(range(50))
+
+        self.assertEqual(sorted(i * 2 for i in range(50)), sorted(written))
+        self.assertEqual(
+            {'fetched': 50, 'transformed': 50, 'written': 50, 'errors': 0}, result)
+        self.assertTrue(self.lines[-1].startswith('fetched: 50'))
+
+    def test_errors_are_reported_and_skipped(self):
+        errors = []
+
+        def transform(item):
+            if item == 1:
+                raise ValueError('bad document')
+            return item
+
+        def write(data):
+            if data == 2:
+                raise IOError('solr down')
+
+        indexer = self._engine(
+            transform, write,
+            on_error=lambda item, stage, e: errors.append((item, stage)))
+        result = indexer.run(range(4))
+
+        self.assertEqual([(1, 'transform'), (2, 'write')], sorted(errors))
+        self.assertEqual(2, result['written'])
+        self.assertEqual(2, result['errors'])
+
+    def test_failing_error_handler(self):
+        def transform(item):
+            if item == 1:
+                raise ValueError('bad document')
+            return item
+
+        def write(data):
+            if data == 2:
+                raise IOError('solr down')
+
+        def on_error(item, stage, exception):
+            raise AttributeError('no publisher_id')
+
+        indexer = self._engine(transform, write, on_error=on_error)
+        result = indexer.run(range(4))
+
+        self.assertEqual(
+            {'fetched': 4, 'transformed': 3, 'written': 2, 'errors': 2}, result)
+        self.assertIn('Error handling the transform error: no publisher_id', self.lines)
+
+    def test_none_is_not_written(self):
+        written = []
+
+        indexer = self._engine(lambda item: None, written.append)
+        result = indexer.run(range(3))
+
+        self.assertEqual([], written)
+        self.assertEqual(0, result['transformed'])
+
+    def test_fetch_errors_are_raised(self):
+        def items():
+            yield 1
+            raise IOError('articlemeta down')
+
+        indexer = self._engine(double, lambda data: None)
+
+        with self.assertRaises(IOError):
+            indexer.run(items())
+
+    def test_slow_writer_blocks_fetch(self):
+        release = threading.Event()
+        fetched = []
+
+        def items():
+            for i in range(20):
+                fetched.append(i)
+                yield i
+
+        indexer = self._engine(
+            double, lambda data: release.wait(), transformers=1, writers=1,
+            queue_size=2)
+        runner = threading.Thread(target=indexer.run, args=(items(),))
+        runner.start()
+
+        release.wait(0.2)
+        # 1 item being written, 1 being transformed and 2 in each queue.
+        self.assertLessEqual(len(fetched), 7)
+
+        release.set()
+        runner.join()
+        self.assertEqual(20, len(fetched))
+
+    def test_processes(self):
+        written = []
+
+        indexer = self._engine(double, written.append, processes=True, writers=1)
+        indexer.run(range(5))
+
+        self.assertEqual([0, 2, 4, 6, 8], sorted(written))
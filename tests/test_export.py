@@ -0,0 +1,152 @@
+# coding: utf-8
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from updatesearch import export
+from updatesearch import load
+
+
+def doc(document_id, *fields):
+    xml = '<doc><field name="id">%s</field>' % document_id
+    xml += ''.join('<field name="%s">%s</field>' % f for f in fields)
+    return (xml + '</doc>').encode('utf-8')
+
+
+class DocToJSONTests(unittest.TestCase):
+
+    def test_repeated_fields_become_lists(self):
+        result = export.doc_to_json(doc('S1-scl', ('au', 'A'), ('au', 'B'), ('la', 'pt')))
+
+        self.assertEqual({'id': 'S1-scl', 'au': ['A', 'B'], 'la': 'pt'}, result)
+
+    def test_atomic_update(self):
+        result = export.doc_to_json(
+            b'<doc><field name="id">S1-scl</field>'
+            b'<field name="total_access" update="set">10</field></doc>')
+
+        self.assertEqual({'id': 'S1-scl', 'total_access': {'set': '10'}}, result)
+
+
+class ExportWriterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmpdir, 'export')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_shards_and_manifest(self):
+        writer = export.ExportWriter(self.directory, shard_size=2)
+        for i in range(5):
+            writer.add(doc('S%d-scl' % i))
+        writer.close()
+
+        manifest = export.read_manifest(self.directory)
+
+        self.assertEqual('xml', manifest['format'])
+        self.assertIsNone(manifest['compression'])
+        self.assertEqual(5, manifest['documents'])
+        self.assertEqual(
+            [('shard-00001.xml', 2), ('shard-00002.xml', 2), ('shard-00003.xml', 1)],
+            [(s['file'], s['documents']) for s in manifest['shards']])
+
+        with open(os.path.join(self.directory, 'shard-00003.xml'), 'rb') as f:
+            self.assertEqual(b'<add>' + doc('S4-scl') + b'</add>', f.read())
+
+    def test_json_gzip(self):
+        writer = export.ExportWriter(
+            self.directory, fmt='json', shard_size=10, compress=True)
+        writer.add(doc('S1-scl', ('la', 'pt')))
+        writer.close()
+
+        shard, = export.read_manifest(self.directory)['shards']
+        self.assertEqual('shard-00001.json.gz', shard['file'])
+
+        with gzip.open(os.path.join(self.directory, shard['file'])) as f:
+            self.assertEqual([{'id': 'S1-scl', 'la': 'pt'}], json.loads(f.read()))
+
+    def test_invalid_format(self):
+        with self.assertRaises(ValueError):
+            export.ExportWriter(self.directory, fmt='csv')
+
+
+class LoadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        writer = export.ExportWriter(
+            self.tmpdir, fmt='json', shard_size=1, compress=True)
+        for i in range(3):
+            writer.add(doc('S%d-scl' % i))
+        writer.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _load(self, update):
+        loader = load.Load([self.tmpdir], solr_url='http://solr', workers=2)
+        loader.solr = MagicMock()
+        loader.solr.update.side_effect = update
+        loader.run()
+        return loader
+
+    def test_load_records_progress_and_commits_once(self):
+        def update(data, commit=False, headers=None, compressed=False):
+            if json.loads(gzip.decompress(data))[0]['id'] == 'S1-scl':
+                raise IOError('connection reset')
+
+        loader = self._load(update)
+
+        self.assertTrue(loader.solr.update.call_args[1]['compressed'])
+        self.assertEqual(1, loader.solr.commit.call_count)
+        self.assertEqual((2, 1), (loader.loaded, loader.failed))
+
+        shards = export.read_manifest(self.tmpdir)['shards']
+        self.assertEqual(
+            ['done', 'failed', 'done'], [s['status'] for s in shards])
+
+        # Resume loads only the failed file.
+        loader = self._load(lambda data, commit=False, headers=None, compressed=False: None)
+
+        self.assertEqual(1, loader.solr.update.call_count)
+        shards = export.read_manifest(self.tmpdir)['shards']
+        self.assertEqual(['done'] * 3, [s['status'] for s in shards])
+
+    def test_interrupted_commit_is_resumed(self):
+        loader = load.Load([self.tmpdir], solr_url='http://solr', workers=2)
+        loader.solr = MagicMock()
+        loader.solr.commit.side_effect = IOError('connection reset')
+
+        with self.assertRaises(IOError):
+            loader.run()
+
+        self.assertFalse(export.read_manifest(self.tmpdir)['committed'])
+
+        loader = self._load(lambda data, commit=False, headers=None, compressed=False: None)
+
+        self.assertFalse(loader.solr.update.called)
+        self.assertEqual(1, loader.solr.commit.call_count)
+        self.assertTrue(export.read_manifest(self.tmpdir)['committed'])
+
+        loader = self._load(lambda data, commit=False, headers=None, compressed=False: None)
+
+        self.assertFalse(loader.solr.commit.called)
+
+    def test_compression_refused(self):
+        from updatesearch import fakesolr
+
+        with fakesolr.FakeSolr(reject_gzip=True) as server:
+            loader = load.Load(
+                [self.tmpdir], solr_url=server.url + '/articles', workers=1)
+            loader.solr.backoff = 0
+            loader.run()
+
+            self.assertEqual(3, loader.loaded)
+            self.assertFalse(loader.solr.gzip_supported)
+            self.assertEqual(3, len(server.core('solr/articles').committed))
@@ -0,0 +1,110 @@
+# coding: utf-8
+import json
+import unittest
+
+from updatesearch import fakesolr
+from updatesearch import solrclient
+from updatesearch import writer
+
+
+def doc(document_id, *fields):
+    xml = '<doc><field name="id">%s</field>' % document_id
+    xml += ''.join('<field name="%s">%s</field>' % f for f in fields)
+    return xml + '</doc>'
+
+
+class FakeSolrTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = fakesolr.FakeSolr().start()
+        self.solr = solrclient.Solr(self.server.url + '/articles', backoff=0)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def select(self, **params):
+        return json.loads(self.solr.select(params))
+
+    def ids(self, **params):
+        return [d['id'] for d in self.select(**params)['response']['docs']]
+
+    def test_updates_are_visible_after_commit(self):
+        self.solr.update('<add>%s%s</add>' % (
+            doc('S1-scl', ('in', 'scl')), doc('S2-spa', ('in', 'spa'))))
+
+        self.assertEqual(0, self.select(q='*:*')['response']['numFound'])
+
+        self.solr.commit()
+
+        self.assertEqual(['S1-scl'], self.ids(q='in:scl', fl='id'))
+        self.assertEqual(2, self.select(q='*:*')['response']['numFound'])
+
+    def test_atomic_update_and_delete(self):
+        self.solr.update('<add>%s</add>' % doc('S1-scl', ('ti', 'A')))
+        self.solr.update(
+            '<add><doc><field name="id">S1-scl</field>'
+            '<field name="total_access" update="set">7</field></doc></add>')
+        self.solr.update(
+            json.dumps([{'id': 'S2-scl', 'ti': 'B'}]),
+            headers={'Content-Type': 'application/json'}, commit=True)
+
+        self.assertEqual(
+            [{'id': 'S1-scl', 'ti': 'A', 'total_access': '7'}],
+            self.select(q='id:S1-scl')['response']['docs'])
+
+        self.solr.delete('ti:B', commit=True)
+
+        self.assertEqual(['S1-scl'], self.ids(q='*:*'))
+
+    def test_cursor_mark_paging(self):
+        self.solr.update('<add>%s</add>' % ''.join(
+            doc('S%d-scl' % i) for i in range(5)), commit=True)
+
+        ids, mark = [], '*'
+        while True:
+            result = self.select(q='*:*', sort='id asc', rows=2, cursorMark=mark)
+            ids.extend(d['id'] for d in result['response']['docs'])
+            if result['nextCursorMark'] == mark:
+                break
+            mark = result['nextCursorMark']
+
+        self.assertEqual(['S%d-scl' % i for i in range(5)], ids)
+
+    def test_gzip_updates(self):
+        solr = solrclient.Solr(
+            self.server.url + '/articles', backoff=0, compress=True)
+
+        solr.update('<add>%s</add>' % doc('S1-scl'), commit=True)
+
+        self.assertEqual(['S1-scl'], self.ids(q='*:*'))
+
+    def test_rejected_gzip_falls_back_to_plain_updates(self):
+        self.server.reject_gzip = True
+        solr = solrclient.Solr(
+            self.server.url + '/articles', backoff=0, compress=True)
+
+        solr.update('<add>%s</add>' % doc('S1-scl'), commit=True)
+        solr.update('<add>%s</add>' % doc('S2-scl'), commit=True)
+
+        self.assertEqual(['S1-scl', 'S2-scl'], self.ids(q='*:*', sort='id asc'))
+        self.assertFalse(solr.compress)
+        self.assertEqual(3, self.server.requests['/update'])
+
+    def test_injected_errors(self):
+        self.server.error_rate = 1
+
+        with self.assertRaises(solrclient.SolrError) as cm:
+            self.solr.update('<add/>', retries=1)
+
+        self.assertEqual(503, cm.exception.status_code)
+        self.assertEqual(2, self.server.errors)
+
+    def test_writer(self):
+        solr_writer = writer.SolrWriter(self.solr, batch_size=3, max_concurrency=2)
+        for i in range(10):
+            solr_writer.add(doc('S%d-scl' % i).encode('utf-8'))
+        solr_writer.close()
+        self.solr.commit()
+
+        self.assertEqual(10, self.select(q='*:*')['response']['numFound'])
+        self.assertEqual(1, self.server.core('solr/articles').commits)
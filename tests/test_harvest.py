@@ -0,0 +1,345 @@
+# coding: utf-8
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from collections import namedtuple
+from datetime import datetime
+
+from sickle.oaiexceptions import NoRecordsMatch, BadResumptionToken
+
+from updatepreprint import harvest
+from updatepreprint import oai
+
+
+Header = namedtuple('Header', 'identifier datestamp deleted')
+Record = namedtuple('Record', 'header xml')
+
+
+def _record(identifier, datestamp='2020-05-01'):
+    return Record(Header(identifier, datestamp, False), None)
+
+
+class FakeIterator(object):
+    """
+    Mimics oai.RecordIterator, pages is a list of (page token, records).
+    """
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.page_token = None
+
+    def __iter__(self):
+        for token, records in self.pages:
+            self.page_token = token
+            for record in records:
+                yield record
+
+
+class FakeClient(object):
+
+    def __init__(self, windows, tokens=None):
+        self.windows = windows
+        self.tokens = tokens or {}
+
+    def Identify(self):
+        return type('Identify', (), {
+            'granularity': 'YYYY-MM-DD', 'earliestDatestamp': '2020-01-01'})
+
+    def ListRecords(self, **kwargs):
+        if 'resumptionToken' in kwargs:
+            if kwargs['resumptionToken'] not in self.tokens:
+                raise BadResumptionToken('expired')
+            return FakeIterator(
+                [(kwargs['resumptionToken'], self.tokens[kwargs['resumptionToken']])])
+
+        records = self.windows.get(kwargs.get('from'))
+
+        if not records:
+            raise NoRecordsMatch('No records')
+
+        return FakeIterator([(None, records)])
+
+
+class DateWindowsTests(unittest.TestCase):
+
+    def test_windows_cover_period(self):
+        result = harvest.date_windows(datetime(2020, 1, 1), datetime(2020, 1, 5), 4)
+
+        self.assertEqual(4, len(result))
+        self.assertEqual(datetime(2020, 1, 1), result[0][0])
+        self.assertEqual(datetime(2020, 1, 2), result[0][1])
+        self.assertEqual(datetime(2020, 1, 5), result[-1][1])
+
+    def test_single_window(self):
+        result = harvest.date_windows(datetime(2020, 1, 1), datetime(2020, 1, 5), 0)
+
+        self.assertEqual([(datetime(2020, 1, 1), datetime(2020, 1, 5))], result)
+
+    def test_parse_datestamp(self):
+        self.assertEqual(datetime(2020, 1, 2), harvest.parse_datestamp('2020-01-02'))
+        self.assertEqual(
+            datetime(2020, 1, 2, 3, 4, 5), harvest.parse_datestamp('2020-01-02T03:04:05Z'))
+
+
+class WindowedHarvesterTests(unittest.TestCase):
+
+    def test_records_are_merged_without_duplicates(self):
+        fake = FakeClient({
+            '2020-01-01': [_record('oai:1'), _record('oai:2')],
+            '2020-01-02': [_record('oai:2'), _record('oai:3')],
+        })
+        harvester = harvest.WindowedHarvester('http://oai', windows=2)
+        harvester.client = lambda: fake
+
+        records = harvester.records(
+            {'metadataPrefix': 'oai_dc'}, until_date=datetime(2020, 1, 3))
+
+        result = sorted(r.header.identifier for r in records)
+
+        self.assertEqual(['oai:1', 'oai:2', 'oai:3'], result)
+
+    def test_errors_are_raised(self):
+        fake = FakeClient({})
+
+        def fail(**kwargs):
+            raise IOError('connection refused')
+
+        fake.ListRecords = fail
+        harvester = harvest.WindowedHarvester('http://oai', windows=2)
+        harvester.client = lambda: fake
+
+        records = harvester.records(
+            {'metadataPrefix': 'oai_dc'}, until_date=datetime(2020, 1, 3))
+
+        with self.assertRaises(IOError):
+            list(records)
+
+
+class PrefetchTests(unittest.TestCase):
+
+    def test_pages_keep_their_tokens(self):
+        fake = FakeClient({})
+        fake.ListRecords = lambda **kwargs: FakeIterator([
+            (None, [_record('oai:1'), _record('oai:2')]),
+            ('t1', [_record('oai:3')]),
+            ('t2', [_record('oai:4')]),
+        ])
+        harvester = harvest.WindowedHarvester('http://oai', prefetch=1)
+        harvester.client = lambda: fake
+
+        result = [(t, r.header.identifier) for w, t, r in harvester.harvest(
+            [{'metadataPrefix': 'oai_dc'}])]
+
+        self.assertEqual(
+            [(None, 'oai:1'), (None, 'oai:2'), ('t1', 'oai:3'), ('t2', 'oai:4')], result)
+        self.assertGreaterEqual(harvester.wait, 0)
+
+    def test_records_are_read_ahead_up_to_prefetch_pages(self):
+        read = []
+
+        def records():
+            for i in range(10):
+                read.append(i)
+                yield _record('oai:%d' % i)
+
+        fake = FakeClient({})
+        fake.ListRecords = lambda **kwargs: FakeIterator([(None, records())])
+        harvester = harvest.WindowedHarvester('http://oai', prefetch=1, page_size=3)
+        harvester.client = lambda: fake
+
+        result = harvester.harvest([{'metadataPrefix': 'oai_dc'}])
+        next(result)
+        time.sleep(0.2)
+
+        # One record consumed, a page of three in the queue and one blocked.
+        self.assertEqual(5, len(read))
+        self.assertEqual(9, len(list(result)))
+
+
+class HarvestStateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_checkpoint_and_resume(self):
+        state = harvest.HarvestState(self.path)
+        self.assertFalse(state.running)
+
+        state.start([{'metadataPrefix': 'oai_dc'}])
+        state.checkpoint({0: 't1'}, '2020-05-02')
+        state.checkpoint({0: None}, '2020-05-01')
+
+        state = harvest.HarvestState(self.path)
+        self.assertTrue(state.running)
+        self.assertEqual({0: 't1'}, state.tokens)
+        self.assertEqual('2020-05-02', state.newest)
+        self.assertIsNone(state.high_water)
+
+    def test_complete_sets_high_water(self):
+        state = harvest.HarvestState(self.path)
+        state.start([{'metadataPrefix': 'oai_dc'}])
+        state.checkpoint({0: 't1'}, '2020-05-02')
+        state.complete()
+
+        state = harvest.HarvestState(self.path)
+        self.assertFalse(state.running)
+        self.assertEqual('2020-05-02', state.high_water)
+
+    def test_complete_caps_high_water_to_failed_records(self):
+        state = harvest.HarvestState(self.path)
+        state.start([{'metadataPrefix': 'oai_dc'}])
+        state.fail('2020-05-02')
+        state.checkpoint({0: 't2'}, '2020-05-04')
+        state.fail('2020-05-03')
+
+        state = harvest.HarvestState(self.path)
+        self.assertEqual('2020-05-02', state.oldest_failed)
+        state.complete()
+
+        state = harvest.HarvestState(self.path)
+        self.assertEqual('2020-05-02', state.high_water)
+        self.assertIsNone(state.oldest_failed)
+
+    def test_resume_harvest_from_token(self):
+        fake = FakeClient({None: [_record('oai:1')]}, tokens={'t1': [_record('oai:2')]})
+        harvester = harvest.WindowedHarvester('http://oai')
+        harvester.client = lambda: fake
+
+        result = [(w, t, r.header.identifier) for w, t, r in harvester.harvest(
+            [{'metadataPrefix': 'oai_dc'}], tokens={0: 't1'})]
+
+        self.assertEqual([(0, 't1', 'oai:2')], result)
+
+    def test_resume_expired_token_restarts_window(self):
+        fake = FakeClient({None: [_record('oai:1')]})
+        harvester = harvest.WindowedHarvester('http://oai')
+        harvester.client = lambda: fake
+
+        result = [(w, t, r.header.identifier) for w, t, r in harvester.harvest(
+            [{'metadataPrefix': 'oai_dc'}], tokens={0: 'expired'})]
+
+        self.assertEqual([(0, None, 'oai:1')], result)
+
+
+PAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+  <responseDate>2020-05-01T00:00:00Z</responseDate>
+  <request verb="ListRecords">http://oai</request>
+  <ListRecords>
+    {records}
+    {token}
+  </ListRecords>
+</OAI-PMH>
+"""
+
+RECORD = """<record>
+      <header{status}>
+        <identifier>{identifier}</identifier>
+        <datestamp>{datestamp}</datestamp>
+      </header>
+      <metadata>
+        <oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"
+                   xmlns:dc="http://purl.org/dc/elements/1.1/">
+          <dc:identifier>https://preprints.scielo.org/index.php/scielo/preprint/view/7</dc:identifier>
+        </oai_dc:dc>
+      </metadata>
+    </record>"""
+
+
+def _page(records, token=None):
+    return PAGE.format(
+        records=''.join(RECORD.format(
+            identifier=identifier, datestamp='2020-05-01',
+            status=' status="deleted"' if deleted else '')
+            for identifier, deleted in records),
+        token='<resumptionToken>%s</resumptionToken>' % token if token else '<resumptionToken/>'
+    ).encode('utf-8')
+
+
+class FakeResponse(object):
+
+    def __init__(self, content):
+        self.content = content
+        self.raw = io.BytesIO(content)
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeSession(object):
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def get(self, url, params=None, **kwargs):
+        self.requests.append(params)
+        return FakeResponse(self.pages[params.get('resumptionToken')])
+
+
+class OAIReaderTests(unittest.TestCase):
+
+    def _reader(self, pages):
+        reader = oai.OAIReader('http://oai')
+        reader.session = FakeSession(pages)
+        return reader
+
+    def test_list_records_follows_resumption_tokens(self):
+        reader = self._reader({
+            None: _page([('oai:1', False), ('oai:2', True)], token='t1'),
+            't1': _page([('oai:3', False)]),
+        })
+
+        iterator = reader.ListRecords(metadataPrefix='oai_dc')
+        result = []
+        for record in iterator:
+            result.append((iterator.page_token, record.header.identifier, record.header.deleted))
+
+        self.assertEqual(
+            [(None, 'oai:1', False), (None, 'oai:2', True), ('t1', 'oai:3', False)], result)
+        self.assertEqual(
+            [{'verb': 'ListRecords', 'metadataPrefix': 'oai_dc'},
+             {'verb': 'ListRecords', 'resumptionToken': 't1'}],
+            reader.session.requests)
+
+    def test_records_are_detached_from_the_page(self):
+        reader = self._reader({None: _page([('oai:1', False), ('oai:2', False)])})
+
+        records = list(reader.ListRecords(metadataPrefix='oai_dc'))
+
+        self.assertIsNone(records[0].xml.getparent())
+        self.assertEqual('2020-05-01', records[0].header.datestamp)
+        self.assertEqual(
+            'https://preprints.scielo.org/index.php/scielo/preprint/view/7',
+            records[0].xml.findtext('.//{http://purl.org/dc/elements/1.1/}identifier'))
+
+    def test_oai_error_is_raised_by_list_records(self):
+        reader = self._reader({None: b"""<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+            <error code="noRecordsMatch">No matching records</error>
+            </OAI-PMH>"""})
+
+        with self.assertRaises(NoRecordsMatch):
+            reader.ListRecords(metadataPrefix='oai_dc')
+
+    def test_identify(self):
+        reader = self._reader({None: b"""<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+            <Identify>
+              <earliestDatestamp>2020-01-01T00:00:00Z</earliestDatestamp>
+              <granularity>YYYY-MM-DDThh:mm:ssZ</granularity>
+            </Identify>
+            </OAI-PMH>"""})
+
+        result = reader.Identify()
+
+        self.assertEqual('YYYY-MM-DDThh:mm:ssZ', result.granularity)
+        self.assertEqual('2020-01-01T00:00:00Z', result.earliestDatestamp)
@@ -0,0 +1,72 @@
+# coding: utf-8
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from lxml import etree as ET
+
+from updatesearch import indicators
+
+
+class IndicatorsDumpTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt') as f:
+            f.write(content)
+        return path
+
+    def test_read_csv_events(self):
+        path = self._write('accesses.csv', 'pid,collection\nS1,scl\nS1,scl\nS2,scl\n')
+
+        result = indicators.aggregate(indicators.read_dump(path))
+
+        self.assertEqual({'S1-scl': 2, 'S2-scl': 1}, dict(result))
+
+    def test_read_jsonl_gz_totals(self):
+        path = self._write(
+            'citations.jsonl.gz',
+            '{"pid": "S1", "total": 3}\n\n{"pid": "S1", "total": 4}\n'
+        )
+
+        result = indicators.aggregate(indicators.read_dump(path))
+
+        self.assertEqual({'S1': 7}, dict(result))
+
+    def test_aggregate_skips_invalid_rows(self):
+        rows = [{'pid': 'S1', 'collection': 'scl'}] * 5 + [
+            {'pid': ''}, {'pid': 'S1', 'collection': 'scl', 'total': '2'},
+            {'pid': 'S2', 'total': 'n/a'}]
+
+        with self.assertLogs(indicators.logger, 'WARNING'):
+            result = indicators.aggregate(rows)
+
+        self.assertEqual({'S1-scl': 7}, dict(result))
+
+    def test_join_solr_ids(self):
+        totals = {'S1-scl': 2, 'S2': 5, 'S3-scl': 1}
+        available_ids = set(['S1-scl', 'S2-scl', 'S2-arg'])
+
+        result = indicators.join_solr_ids(totals, available_ids)
+
+        self.assertEqual({'S1-scl': 2, 'S2-scl': 5, 'S2-arg': 5}, result)
+
+    def test_atomic_update_xml(self):
+        result = ET.fromstring(
+            indicators.atomic_update_xml('total_access', [('S1-scl', 2), ('S2-scl', 5)]))
+
+        docs = result.findall('./doc')
+        self.assertEqual(2, len(docs))
+        self.assertEqual('S2-scl', docs[1].find('./field[@name="id"]').text)
+        field = docs[1].find('./field[@name="total_access"]')
+        self.assertEqual('5', field.text)
+        self.assertEqual('set', field.get('update'))
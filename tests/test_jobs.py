@@ -0,0 +1,167 @@
+# coding: utf-8
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from updatesearch import jobs
+from updatesearch import metadata
+
+
+def units(n):
+    return [{'collection': 'scl', 'issn': '0000-%04d' % i} for i in range(n)]
+
+
+class JobQueueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'jobs.sqlite')
+        self.queue = jobs.JobQueue(self.path, lease=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_fill_keeps_existing_units(self):
+        self.assertEqual(3, self.queue.fill(units(3)))
+        self.assertEqual(1, self.queue.fill(units(4)))
+
+    def test_each_unit_is_leased_once(self):
+        self.queue.fill(units(30))
+        leased = []
+
+        def worker(name):
+            while True:
+                job = self.queue.lease_next(name)
+                if job is None:
+                    break
+                leased.append(job.id)
+
+        threads = [threading.Thread(target=worker, args=('w%d' % i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(list(range(1, 31)), sorted(leased))
+
+    def test_expired_lease_is_leased_again(self):
+        self.queue.fill(units(1))
+        self.queue.lease = -1
+
+        crashed = self.queue.lease_next('w1')
+        job = self.queue.lease_next('w2')
+
+        self.assertEqual(crashed.id, job.id)
+        self.assertEqual(2, job.attempts)
+        # The first worker lost the unit.
+        self.assertFalse(self.queue.renew(crashed, 'w1'))
+
+    def test_expired_lease_fails_after_max_attempts(self):
+        self.queue.fill(units(1))
+        self.queue.lease = -1
+        self.queue.max_attempts = 2
+
+        self.assertEqual(1, self.queue.lease_next('w1').attempts)
+        self.assertEqual(2, self.queue.lease_next('w2').attempts)
+        self.assertIsNone(self.queue.lease_next('w3'))
+
+        self.assertEqual(['Units: 1 failed'], self.queue.report())
+
+    def test_failed_units_are_retried(self):
+        self.queue.fill(units(1))
+        self.queue.max_attempts = 2
+
+        def process(job):
+            raise IOError('ArticleMeta unavailable')
+
+        self.assertEqual(0, self.queue.work(process, worker='w1', log=lambda m: None))
+        self.assertEqual(['Units: 1 failed'], self.queue.report())
+
+    def test_work_and_report(self):
+        self.queue.fill(units(3))
+        self.queue.lease = 0.03
+        processed = []
+
+        def process(job):
+            # Longer than the lease, kept by the renewal.
+            time.sleep(0.05)
+            processed.append(job.issn)
+            return 10
+
+        self.assertEqual(3, self.queue.work(process, worker='w1', log=lambda m: None))
+        self.assertEqual(3, len(processed))
+
+        report = self.queue.report()
+        self.assertEqual('Units: 3 done', report[0])
+        self.assertTrue(report[1].startswith('Worker w1: 3 units, 30 documents'))
+
+    def test_finish_is_claimed_once(self):
+        self.queue.fill(units(2))
+        job = self.queue.lease_next('w1')
+
+        self.assertFalse(self.queue.finish('w2'))
+
+        self.queue.done(job, 'w1')
+        self.queue.done(self.queue.lease_next('w1'), 'w1')
+
+        self.assertTrue(self.queue.finish('w1'))
+        self.assertFalse(self.queue.finish('w2'))
+
+        self.queue.fill(units(3))
+        self.queue.done(self.queue.lease_next('w2'), 'w2')
+
+        self.assertTrue(self.queue.finish('w2'))
+
+
+class JobsModeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_units_by_year(self):
+        us = metadata.UpdateSearch(
+            collection='scl',
+            from_date=datetime(2018, 6, 1),
+            until_date=datetime(2020, 2, 1),
+            jobs_file=os.path.join(self.tmpdir, 'jobs.sqlite'),
+            fill='year',
+            solr_url='http://solr'
+        )
+        processed = []
+
+        def common_mode():
+            processed.append((us.collection, us.from_date, us.until_date))
+            return {'fetched': 1}
+
+        us.common_mode = common_mode
+        us.jobs_mode()
+
+        self.assertEqual([
+            ('scl', datetime(2018, 6, 1), datetime(2018, 12, 31)),
+            ('scl', datetime(2019, 1, 1), datetime(2019, 12, 31)),
+            ('scl', datetime(2020, 1, 1), datetime(2020, 2, 1)),
+        ], processed)
+
+    def test_only_the_last_worker_optimizes(self):
+        path = os.path.join(self.tmpdir, 'jobs.sqlite')
+        jobs.JobQueue(path).fill(units(1))
+        workers = []
+
+        for name in ('w1', 'w2'):
+            us = metadata.UpdateSearch(
+                jobs_file=path, worker=name, solr_url='http://solr')
+            us.solr = MagicMock()
+            us.common_mode = lambda: {'fetched': 1}
+            us.run()
+            workers.append(us)
+
+        self.assertEqual([1, 1], [us.solr.commit.call_count for us in workers])
+        self.assertEqual([1, 0], [us.solr.optimize.call_count for us in workers])
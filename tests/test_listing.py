@@ -0,0 +1,71 @@
+# coding: utf-8
+import time
+import random
+import threading
+import unittest
+from collections import namedtuple
+
+from updatesearch import listing
+
+Identifier = namedtuple('Identifier', 'code collection processing_date')
+
+
+class FakeThriftClient(object):
+    """
+    Lists ``sizes[year]`` identifiers by year, answering in random order.
+    """
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def dispatcher(self, method, collection, issn, from_date, until_date,
+                   limit, offset, extra_filter):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+        time.sleep(random.random() / 100)
+
+        with self._lock:
+            self.active -= 1
+
+        year = from_date[:4]
+        return [Identifier('%s-%05d' % (year, i), 'scl', from_date)
+                for i in range(offset, min(offset + limit, self.sizes.get(year, 0)))]
+
+    def document(self, code, collection, **kwargs):
+        time.sleep(random.random() / 100)
+        return code.upper()
+
+
+class ParallelClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.thrift = FakeThriftClient({'2018': 23, '2019': 0, '2020': 10})
+        self.client = listing.ParallelClient(self.thrift, workers=4, limit=5)
+
+    def expected(self):
+        return ['2018-%05d' % i for i in range(23)] + ['2020-%05d' % i for i in range(10)]
+
+    def test_identifiers_in_order(self):
+        identifiers = self.client.documents(
+            collection='scl', from_date='2018-01-01', until_date='2020-12-31',
+            only_identifiers=True)
+
+        self.assertEqual(self.expected(), [i.code for i in identifiers])
+        self.assertGreater(self.thrift.max_active, 1)
+
+    def test_documents_in_order(self):
+        documents = self.client.documents(
+            collection='scl', from_date='2018-01-01', until_date='2020-12-31')
+
+        self.assertEqual([c.upper() for c in self.expected()], list(documents))
+
+    def test_ordered_map(self):
+        with listing.ThreadPoolExecutor(max_workers=3) as executor:
+            result = listing.ordered_map(executor, lambda i: i * 2, iter(range(10)), 3)
+
+            self.assertEqual([i * 2 for i in range(10)], list(result))
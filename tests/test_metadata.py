@@ -0,0 +1,61 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from updatesearch import metadata
+from updatesearch import spool
+from updatesearch.solrclient import SolrError
+
+
+class UpdateSearchTests(unittest.TestCase):
+
+    def _updatesearch(self, **kwargs):
+        us = metadata.UpdateSearch(solr_url='http://solr', **kwargs)
+        us.solr = MagicMock()
+        return us
+
+    def test_including_skips_missing_documents(self):
+        us = self._updatesearch()
+        am = MagicMock()
+        am.document.return_value = None
+
+        documents = list(us.including(am, set(['S0102-311X2000000100001-scl-2020-01-01'])))
+
+        self.assertEqual([], documents)
+        self.assertEqual(1, am.document.call_count)
+
+    def test_loading_skips_missing_documents(self):
+        us = self._updatesearch()
+
+        self.assertEqual([], list(us.loading([None])))
+
+    def test_transform_error_without_document(self):
+        us = self._updatesearch()
+
+        us.transform_error(None, 'transform', ValueError('no document'))
+
+    def test_index_missing_documents(self):
+        us = self._updatesearch(transformers=1)
+        am = MagicMock()
+        am.document.return_value = None
+
+        counters = us.index(us.including(am, set(['S0102-311X2000000100001-scl-2020-01-01'])))
+
+        self.assertEqual(0, counters['fetched'])
+
+    def test_failed_removal_is_spooled(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'failed.jsonl')
+        us = self._updatesearch(spool_file=path)
+        us.solr.delete.side_effect = [SolrError('bad query', 400), None]
+
+        us.remove(['S1-scl', 'S2-scl'])
+
+        self.assertEqual(2, us.solr.delete.call_count)
+        self.assertEqual(
+            [('S1-scl', 'delete')],
+            [(e['id'], e['stage']) for e in spool.read(path)])
@@ -0,0 +1,99 @@
+# coding: utf-8
+import json
+import argparse
+import unittest
+from collections import namedtuple
+from unittest.mock import MagicMock
+
+from updatesearch import partition
+from updatesearch import metadata
+
+Identifier = namedtuple('Identifier', 'code collection processing_date')
+
+
+class PartitionTests(unittest.TestCase):
+
+    def test_every_document_in_exactly_one_shard(self):
+        ids = ['S0034-891020100004%05d-scl' % i for i in range(1000)]
+        shards = [partition.Partition(k, 4) for k in range(1, 5)]
+
+        counts = [sum(1 for i in ids if i in shard) for shard in shards]
+
+        self.assertEqual(1000, sum(counts))
+        for i in ids:
+            self.assertEqual(1, sum(1 for shard in shards if i in shard))
+        # Roughly balanced.
+        self.assertTrue(all(c > 200 for c in counts), counts)
+
+    def test_stable_hash(self):
+        self.assertIn('S0034-89102010000400007-scl', partition.Partition(3, 4))
+
+    def test_parse(self):
+        shard = partition.parse('2/4')
+
+        self.assertEqual((2, 4), (shard.k, shard.n))
+        for value in ('0/4', '5/4', '2', 'a/b'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                partition.parse(value)
+
+    def test_partitioned_client(self):
+        identifiers = [Identifier('S%d' % i, 'scl', '2020-01-01') for i in range(20)]
+        client = MagicMock()
+        client.documents.return_value = identifiers
+        client.document.side_effect = lambda code, collection: code
+
+        shard = partition.Partition(1, 2)
+        documents = list(partition.PartitionedClient(client, shard).documents())
+
+        self.assertEqual(
+            [i.code for i in identifiers if shard.accepts(i)], documents)
+        self.assertTrue(0 < len(documents) < 20)
+
+    def test_partitioned_restful_client(self):
+        class Article(object):
+            collection_acronym = 'scl'
+
+            def __init__(self, code):
+                self.publisher_id = code
+
+        class RestfulClient(object):
+            def documents(self, collection=None, issn=None, from_date=None,
+                          until_date=None, fmt='xylose', body=False):
+                return iter([Article('S%d' % i) for i in range(20)])
+
+        shard = partition.Partition(1, 2)
+        documents = list(partition.PartitionedClient(RestfulClient(), shard).documents())
+
+        self.assertEqual(
+            ['S%d' % i for i in range(20) if 'S%d-scl' % i in shard],
+            [a.publisher_id for a in documents])
+
+
+class PartitionedDeleteTests(unittest.TestCase):
+
+    def test_delete_only_the_partition(self):
+        shard = partition.Partition(1, 2)
+
+        class ThriftClient(object):
+            lists_identifiers = True
+
+            def documents(self, only_identifiers=False, **kwargs):
+                if not only_identifiers:
+                    return iter([])
+                return iter([Identifier('S%d' % i, 'scl', '2020-01-01') for i in range(10)])
+
+        us = metadata.UpdateSearch(
+            collection='scl', delete=True, partition=shard, solr_url='http://solr')
+        us.solr = MagicMock()
+        us.solr.select.return_value = json.dumps({'response': {'docs': [
+            {'id': 'S%d-scl' % i} for i in range(20)]}})
+        us.index = lambda documents: {'fetched': 0}
+        us.articlemeta = lambda: partition.PartitionedClient(ThriftClient(), shard)
+
+        us.common_mode()
+
+        deleted = sorted(c[0][0] for c in us.solr.delete.call_args_list)
+        self.assertEqual(
+            sorted('id:S%d-scl' % i for i in range(10, 20) if 'S%d-scl' % i in shard),
+            deleted)
+        self.assertTrue(deleted)
@@ -1,8 +1,16 @@
 # coding: utf-8
+import os
+import tempfile
 import unittest
+from unittest.mock import patch, MagicMock
+
+from langcodes import standardize_tag
 from lxml import etree as ET
 
 from updatepreprint import pipeline_xml
+from updatepreprint import updatepreprint
+from updatesearch import spool
+from updatesearch.solrclient import SolrError
 
 
 namespaces = {'dc': 'http://purl.org/dc/elements/1.1/',
@@ -21,6 +29,55 @@ class UpdatePrePrintTests(unittest.TestCase):
         pass
 
 
+class TestDublinCore(unittest.TestCase):
+
+    text = """<record xmlns="http://www.openarchives.org/OAI/2.0/">
+        <metadata>
+            <oai_dc:dc
+                xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"
+                xmlns:dc="http://purl.org/dc/elements/1.1/">
+                <dc:title xml:lang="en-US">Title</dc:title>
+                <dc:title xml:lang="pt-BR">Titulo</dc:title>
+                <dc:identifier>https://preprints.scielo.org/index.php/scielo/preprint/view/7</dc:identifier>
+                <dc:identifier>10.1590/scielopreprints.7</dc:identifier>
+                <dc:language>por</dc:language>
+            </oai_dc:dc>
+        </metadata>
+    </record>
+    """
+
+    def test_elements_grouped_by_name(self):
+        record = pipeline_xml.DublinCore(ET.fromstring(self.text))
+
+        self.assertEqual(
+            ['https://preprints.scielo.org/index.php/scielo/preprint/view/7',
+             '10.1590/scielopreprints.7'],
+            record.values('identifier'))
+        self.assertEqual([('por', None)], record.items('language'))
+        self.assertEqual([], record.values('creator'))
+
+    def test_by_language(self):
+        record = pipeline_xml.DublinCore(ET.fromstring(self.text))
+
+        self.assertEqual(
+            {'en-US': ['Title'], 'pt-BR': ['Titulo']}, record.by_language('title'))
+
+    def test_setup_document_parses_record(self):
+        raw, xml = pipeline_xml.SetupDocument().transform(ET.fromstring(self.text))
+
+        self.assertIsInstance(raw, pipeline_xml.DublinCore)
+        self.assertEqual(b'<doc/>', ET.tostring(xml))
+
+    def test_pipes_read_parsed_record(self):
+        raw, xml = pipeline_xml.SetupDocument().transform(ET.fromstring(self.text))
+
+        raw, xml = pipeline_xml.DocumentID().transform((raw, xml))
+        raw, xml = pipeline_xml.Titles().transform((raw, xml))
+
+        self.assertEqual('preprint_7', xml.find(".//field[@name='id']").text)
+        self.assertEqual('Titulo', xml.find(".//field[@name='ti_pt']").text)
+
+
 # <field name="id">art-S0102-695X2015000100053-scl</field>
 class TestDocumentID(unittest.TestCase):
 
@@ -466,3 +523,182 @@ class TestPermission(unittest.TestCase):
             xml.find(".//field[@name='use_license_uri']").text,
             "https://creativecommons.org/licenses/by/4.0"
         )
+
+
+def _doc(doc_id):
+    doc = ET.Element('doc')
+    ET.SubElement(doc, 'field', name='id').text = doc_id
+    return doc
+
+
+class TestBatchIndexing(unittest.TestCase):
+
+    def _updatepreprint(self, *args):
+        with patch('sys.argv', ['update_search_preprint'] + list(args)):
+            up = updatepreprint.UpdatePreprint()
+
+        up.solr = MagicMock()
+        up.writer.solr = up.solr
+        return up
+
+    def test_send_batch_commits_once(self):
+        up = self._updatepreprint('-b', '2')
+
+        up.send_batch([ET.Element('doc'), ET.Element('doc')])
+
+        self.assertEqual(1, up.solr.update.call_count)
+        data, = up.solr.update.call_args[0]
+        self.assertEqual(2, len(ET.fromstring(data).findall('doc')))
+        self.assertFalse(up.solr.update.call_args[1]['commit'])
+        self.assertEqual(1, up.solr.commit.call_count)
+
+    def test_send_batch_commit_within(self):
+        up = self._updatepreprint('-w', '5000')
+
+        up.send_batch([ET.Element('doc')])
+
+        data, = up.solr.update.call_args[0]
+        self.assertEqual('5000', ET.fromstring(data).get('commitWithin'))
+        self.assertFalse(up.solr.update.call_args[1]['commit'])
+        self.assertFalse(up.solr.commit.called)
+
+    def test_flush_empty_batch(self):
+        up = self._updatepreprint()
+
+        self.assertEqual((0, 0), up.flush([]))
+        self.assertFalse(up.solr.update.called)
+
+    def test_send_deletes(self):
+        up = self._updatepreprint()
+
+        up.send_deletes(['preprint_7', 'preprint_8'])
+
+        data, = up.solr.update.call_args[0]
+        delete = ET.fromstring(data)
+        self.assertEqual('delete', delete.tag)
+        self.assertEqual(['preprint_7', 'preprint_8'], [i.text for i in delete.findall('id')])
+
+    def test_flush_adds_and_deletes(self):
+        up = self._updatepreprint()
+
+        result = up.flush([ET.Element('doc')], ['preprint_7'])
+
+        self.assertEqual((1, 1), result)
+        self.assertEqual(2, up.solr.update.call_count)
+
+    def test_failed_batch_is_spooled(self):
+        path = os.path.join(tempfile.mkdtemp(), 'failed.jsonl')
+        up = self._updatepreprint('--spool', path)
+        up.solr.update.side_effect = IOError('solr down')
+
+        result = up.flush(
+            [_doc('preprint_7')], ['preprint_8'],
+            records=[('oai:ops.preprints.scielo.org:preprint/7', False, '2020-05-01'),
+                     ('oai:ops.preprints.scielo.org:preprint/8', True, '2020-05-01')])
+
+        self.assertEqual((0, 0), result)
+        self.assertEqual(
+            [('preprint_7', 'write'), ('preprint_8', 'delete')],
+            [(e['id'], e['stage']) for e in spool.read(path)])
+
+    def test_only_rejected_records_are_spooled(self):
+        path = os.path.join(tempfile.mkdtemp(), 'failed.jsonl')
+        up = self._updatepreprint('--spool', path)
+
+        def update(data, commit=False, retries=None):
+            if b'preprint_9' in data:
+                raise SolrError('bad doc', status_code=400)
+
+        up.solr.update.side_effect = update
+
+        result = up.flush(
+            [_doc('preprint_7'), _doc('preprint_9')], ['preprint_8'],
+            records=[('oai:ops.preprints.scielo.org:preprint/7', False, '2020-05-01'),
+                     ('oai:ops.preprints.scielo.org:preprint/8', True, '2020-05-01'),
+                     ('oai:ops.preprints.scielo.org:preprint/9', False, '2020-05-01')])
+
+        self.assertEqual((1, 1), result)
+        self.assertEqual(
+            [('preprint_9', 'write')],
+            [(e['id'], e['stage']) for e in spool.read(path)])
+
+    def test_rejected_record_keeps_high_water_before_it(self):
+        up = self._updatepreprint()
+        up.state = MagicMock()
+
+        def update(data, commit=False, retries=None):
+            if b'preprint_9' in data:
+                raise SolrError('bad doc', status_code=400)
+
+        up.solr.update.side_effect = update
+
+        result = up.flush(
+            [_doc('preprint_7'), _doc('preprint_9')], tokens={0: 't1'},
+            newest='2020-05-03',
+            records=[('oai:ops.preprints.scielo.org:preprint/7', False, '2020-05-01'),
+                     ('oai:ops.preprints.scielo.org:preprint/9', False, '2020-05-02')])
+
+        self.assertEqual((1, 0), result)
+        up.state.fail.assert_called_once_with('2020-05-02')
+        up.state.checkpoint.assert_called_once_with({0: 't1'}, '2020-05-03')
+
+    def test_spooled_record_does_not_keep_high_water(self):
+        up = self._updatepreprint(
+            '--spool', os.path.join(tempfile.mkdtemp(), 'failed.jsonl'))
+        up.state = MagicMock()
+        up.solr.update.side_effect = IOError('solr down')
+
+        up.flush(
+            [_doc('preprint_7')], tokens={0: 't1'}, newest='2020-05-03',
+            records=[('oai:ops.preprints.scielo.org:preprint/7', False, '2020-05-01')])
+
+        self.assertFalse(up.state.fail.called)
+        up.state.checkpoint.assert_called_once_with({0: 't1'}, '2020-05-03')
+
+    def test_transform_error_keeps_high_water_before_it(self):
+        up = self._updatepreprint()
+        up.state = MagicMock()
+
+        up.failed('oai:ops.preprints.scielo.org:preprint/7', 'transform',
+                  ValueError('bad record'), '2020-05-01')
+
+        up.state.fail.assert_called_once_with('2020-05-01')
+
+    def test_commit_within_saves_no_resumption_token(self):
+        up = self._updatepreprint('-w', '5000')
+        up.state = MagicMock()
+
+        up.flush([_doc('preprint_7')], tokens={0: 't1'}, newest='2020-05-03')
+
+        up.state.checkpoint.assert_called_once_with({}, '2020-05-03')
+
+    def test_run_closes_writer_on_error(self):
+        up = self._updatepreprint()
+        up.writer = MagicMock()
+        up.harvest = MagicMock(side_effect=IOError('OAI down'))
+
+        with self.assertRaises(IOError):
+            up.run()
+
+        self.assertTrue(up.writer.close.called)
+
+    def test_document_id(self):
+        self.assertEqual(
+            'preprint_7',
+            updatepreprint.document_id('oai:ops.preprints.scielo.org:preprint/7'))
+
+
+class TestLanguageNormalization(unittest.TestCase):
+
+    def test_table_matches_langcodes(self):
+        for tag, expected in pipeline_xml.LANGUAGE_TAGS.items():
+            self.assertEqual(standardize_tag(tag), expected)
+
+    def test_normalize_language(self):
+        self.assertEqual('pt', pipeline_xml.normalize_language('por'))
+        self.assertEqual('pt-BR', pipeline_xml.normalize_language('pt-BR'))
+        self.assertEqual('ru', pipeline_xml.normalize_language('rus'))
+
+    def test_primary_language(self):
+        self.assertEqual('pt', pipeline_xml.primary_language('pt-BR'))
+        self.assertEqual('en', pipeline_xml.primary_language('eng'))
@@ -0,0 +1,65 @@
+# coding: utf-8
+import time
+import unittest
+
+from updatesearch import readahead
+
+
+class ReadAheadTests(unittest.TestCase):
+
+    def test_items_are_read_in_background(self):
+        read = []
+
+        def pages():
+            for i in range(5):
+                read.append(i)
+                yield i
+
+        items = readahead.ReadAhead(pages(), depth=10)
+
+        deadline = time.time() + 5
+        while len(read) < 5 and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(5, len(read))
+        self.assertEqual([0, 1, 2, 3, 4], list(items))
+
+    def test_depth_limits_the_buffer(self):
+        read = []
+
+        def pages():
+            for i in range(100):
+                read.append(i)
+                yield i
+
+        items = readahead.ReadAhead(pages(), depth=2)
+        time.sleep(0.1)
+
+        # Two items in the buffer and one waiting to be put.
+        self.assertEqual(3, len(read))
+        self.assertEqual(list(range(100)), list(items))
+
+    def test_errors_are_raised_after_the_items(self):
+        def pages():
+            yield 1
+            raise IOError('connection reset')
+
+        items = readahead.ReadAhead(pages())
+
+        self.assertEqual(1, next(items))
+        with self.assertRaises(IOError):
+            next(items)
+
+    def test_close_stops_the_reader(self):
+        items = readahead.ReadAhead(iter(range(1000)), depth=1)
+        next(items)
+        items.close()
+
+        items._thread.join(5)
+        self.assertFalse(items._thread.is_alive())
+        self.assertEqual([], list(items))
+
+    def test_disabled(self):
+        pages = [1, 2]
+
+        self.assertIs(pages, readahead.read_ahead(pages, 0))
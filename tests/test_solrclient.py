@@ -0,0 +1,239 @@
+# coding: utf-8
+import gzip
+import unittest
+
+import requests
+
+from updatesearch import solrclient
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code=200, text='{}', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class FakeSession(object):
+    """
+    Return the responses in order, exceptions are raised.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('data') is not None and not isinstance(kwargs['data'], (str, bytes)):
+            kwargs['data'] = b''.join(kwargs['data'])
+
+        self.requests.append((method, url, kwargs))
+        response = self.responses.pop(0)
+
+        if isinstance(response, Exception):
+            raise response
+
+        return response
+
+
+class SolrTests(unittest.TestCase):
+
+    def _solr(self, responses, **kwargs):
+        solr = solrclient.Solr('http://solr/articles', backoff=0, **kwargs)
+        solr.session = FakeSession(responses)
+        return solr
+
+    def test_select_returns_text(self):
+        solr = self._solr([FakeResponse(text='{"response": {}}')])
+
+        result = solr.select({'q': '*:*'})
+
+        self.assertEqual('{"response": {}}', result)
+        method, url, kwargs = solr.session.requests[0]
+        self.assertEqual(('GET', 'http://solr/articles/select'), (method, url))
+        self.assertEqual({'q': '*:*', 'wt': 'json'}, kwargs['params'])
+        self.assertEqual((solr.connect_timeout, solr.timeout), kwargs['timeout'])
+
+    def test_retry_transient_errors(self):
+        solr = self._solr([
+            requests.ConnectionError('reset'),
+            FakeResponse(503),
+            FakeResponse(text='ok'),
+        ])
+
+        self.assertEqual('ok', solr.update('<add/>'))
+        self.assertEqual(3, len(solr.session.requests))
+
+        counters = solr.stats.operations['update']
+        self.assertEqual((3, 2, 2), (
+            counters['requests'], counters['errors'], counters['retries']))
+
+    def test_non_idempotent_update_is_not_retried(self):
+        solr = self._solr([FakeResponse(503), FakeResponse(text='ok')])
+
+        with self.assertRaises(solrclient.SolrError) as cm:
+            solr.update('<add/>', idempotent=False)
+
+        self.assertEqual(503, cm.exception.status_code)
+        self.assertEqual(1, len(solr.session.requests))
+
+    def test_client_errors_are_not_retried(self):
+        solr = self._solr([FakeResponse(400, text='bad request')])
+
+        with self.assertRaises(solrclient.SolrError) as cm:
+            solr.delete('id:1')
+
+        self.assertEqual(400, cm.exception.status_code)
+
+    def test_retries_exhausted(self):
+        solr = self._solr([requests.Timeout('slow')] * 3, retries=2)
+
+        with self.assertRaises(solrclient.SolrError):
+            solr.commit()
+
+        self.assertEqual(3, len(solr.session.requests))
+
+    def test_optimize_is_not_retried(self):
+        solr = self._solr([requests.Timeout('merging'), FakeResponse()])
+
+        with self.assertRaises(solrclient.SolrError):
+            solr.optimize()
+
+        self.assertEqual(1, len(solr.session.requests))
+        method, url, kwargs = solr.session.requests[0]
+        self.assertEqual(
+            (solr.connect_timeout, solrclient.SOLR_OPTIMIZE_TIMEOUT), kwargs['timeout'])
+
+    def test_report(self):
+        solr = self._solr([FakeResponse(), FakeResponse()])
+        solr.commit()
+        solr.optimize()
+
+        lines = []
+        solr.log_stats(lines.append)
+
+        self.assertEqual(2, len(lines))
+        self.assertTrue(lines[0].startswith('Solr commit: 1 requests, 0 errors'))
+
+
+class GzipTests(unittest.TestCase):
+
+    def _solr(self, responses):
+        solr = solrclient.Solr('http://solr/articles', backoff=0, compress=True)
+        solr.session = FakeSession(responses)
+        return solr
+
+    def test_update_is_compressed(self):
+        solr = self._solr([FakeResponse()])
+        data = b'<add>' + b'<doc><field name="id">S1</field></doc>' * 5000 + b'</add>'
+
+        solr.update(data)
+
+        method, url, kwargs = solr.session.requests[0]
+        self.assertEqual('gzip', kwargs['headers']['Content-Encoding'])
+        self.assertEqual(data, gzip.decompress(kwargs['data']))
+
+        stats = solr.stats.gzip
+        self.assertEqual((1, len(data), len(kwargs['data'])), (
+            stats['updates'], stats['bytes'], stats['sent_bytes']))
+        self.assertTrue(solr.stats.report()[-1].startswith('gzip: 1 updates'))
+
+    def test_retry_compresses_again(self):
+        solr = self._solr([FakeResponse(503), FakeResponse()])
+
+        solr.update('<add/>')
+
+        bodies = [kwargs['data'] for m, u, kwargs in solr.session.requests]
+        self.assertEqual([b'<add/>', b'<add/>'], [gzip.decompress(b) for b in bodies])
+
+    def test_unsupported_falls_back_to_plain_updates(self):
+        solr = self._solr([FakeResponse(415), FakeResponse()])
+
+        solr.update('<add/>')
+
+        method, url, kwargs = solr.session.requests[-1]
+        self.assertEqual('<add/>', kwargs['data'])
+        self.assertNotIn('Content-Encoding', kwargs['headers'])
+        self.assertFalse(solr.compress)
+
+    def test_first_bad_request_falls_back_to_plain_updates(self):
+        solr = self._solr([FakeResponse(400), FakeResponse()])
+
+        solr.update('<add/>')
+
+        method, url, kwargs = solr.session.requests[-1]
+        self.assertEqual('<add/>', kwargs['data'])
+        self.assertFalse(solr.compress)
+        self.assertFalse(solr.gzip_supported)
+
+    def test_bad_document_keeps_compression(self):
+        solr = self._solr([FakeResponse(400), FakeResponse(400)])
+
+        with self.assertRaises(solrclient.SolrError):
+            solr.update('<add/>')
+
+        self.assertEqual(2, len(solr.session.requests))
+        self.assertTrue(solr.compress)
+
+    def test_bad_request_after_compressed_update_is_raised(self):
+        solr = self._solr([FakeResponse(), FakeResponse(400)])
+
+        solr.update('<add/>')
+        with self.assertRaises(solrclient.SolrError):
+            solr.update('<add/>')
+
+        self.assertEqual(2, len(solr.session.requests))
+        self.assertTrue(solr.gzip_supported)
+
+    def test_encoded_body_is_not_compressed_again(self):
+        solr = self._solr([FakeResponse()])
+        data = gzip.compress(b'<add/>')
+
+        solr.update(data, headers={'Content-Type': 'text/xml'}, compressed=True)
+
+        method, url, kwargs = solr.session.requests[0]
+        self.assertEqual(data, kwargs['data'])
+        self.assertEqual('gzip', kwargs['headers']['Content-Encoding'])
+
+    def test_encoded_body_is_decompressed_for_plain_updates(self):
+        solr = self._solr([FakeResponse(415), FakeResponse(), FakeResponse()])
+        data = gzip.compress(b'<add/>')
+
+        solr.update(data, compressed=True)
+        solr.update(data, compressed=True)
+
+        bodies = [kwargs['data'] for m, u, kwargs in solr.session.requests]
+        self.assertEqual([data, b'<add/>', b'<add/>'], bodies)
+
+
+class FanoutTests(unittest.TestCase):
+
+    def test_connect(self):
+        self.assertIsInstance(solrclient.connect('http://a/solr'), solrclient.Solr)
+
+        fanout = solrclient.connect('http://a/solr, http://b/solr')
+        self.assertEqual(['http://a/solr', 'http://b/solr'], [t.url for t in fanout.targets])
+
+    def test_updates_go_to_all_targets_and_queries_to_the_first(self):
+        fanout = solrclient.connect('http://a/solr,http://b/solr', backoff=0)
+        primary, mirror = fanout.targets
+        primary.session = FakeSession([FakeResponse(text='a'), FakeResponse(text='a')])
+        mirror.session = FakeSession([FakeResponse(text='b')])
+
+        self.assertEqual('a', fanout.update('<add/>'))
+        self.assertEqual('a', fanout.select({'q': '*:*'}))
+
+        self.assertEqual(2, len(primary.session.requests))
+        self.assertEqual(1, len(mirror.session.requests))
+
+    def test_error_in_one_target_is_raised(self):
+        fanout = solrclient.connect('http://a/solr,http://b/solr', retries=0)
+        primary, mirror = fanout.targets
+        primary.session = FakeSession([FakeResponse()])
+        mirror.session = FakeSession([FakeResponse(500)])
+
+        with self.assertRaises(solrclient.SolrError) as cm:
+            fanout.commit()
+
+        self.assertIn('http://b/solr', str(cm.exception))
@@ -0,0 +1,105 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from updatesearch import spool
+from updatesearch import replay
+from updatepreprint import oai
+
+
+class SpoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'failed.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_append_and_read(self):
+        failures = spool.Spool(self.path)
+        failures.append(
+            'S1-scl', 'transform', ValueError('bad date'), 'articlemeta',
+            code='S1', collection='scl')
+
+        entry, = spool.read(self.path)
+
+        self.assertEqual('S1-scl', entry['id'])
+        self.assertEqual('transform', entry['stage'])
+        self.assertEqual('ValueError: bad date', entry['error'])
+        self.assertEqual({'code': 'S1', 'collection': 'scl'}, entry['reference'])
+        self.assertEqual(1, failures.count)
+
+    def test_take_keeps_last_failure_of_each_document(self):
+        failures = spool.Spool(self.path)
+        failures.append('S1-scl', 'transform', ValueError('a'), 'articlemeta')
+        failures.append('S1-scl', 'write', IOError('b'), 'articlemeta')
+        failures.append('preprint_7', 'write', IOError('c'), 'oai')
+
+        entries, replaying = spool.take(self.path)
+
+        self.assertEqual(
+            [('S1-scl', 'write'), ('preprint_7', 'write')],
+            [(e['id'], e['stage']) for e in entries])
+        self.assertFalse(os.path.exists(self.path))
+        self.assertTrue(os.path.exists(replaying))
+
+    def test_take_includes_unfinished_replay(self):
+        spool.Spool(self.path + '.replaying').append(
+            'S1-scl', 'write', IOError('a'), 'articlemeta')
+        spool.Spool(self.path).append(
+            'S2-scl', 'write', IOError('b'), 'articlemeta')
+
+        entries, replaying = spool.take(self.path)
+
+        self.assertEqual(['S1-scl', 'S2-scl'], sorted(e['id'] for e in entries))
+
+
+class ReplayTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'failed.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_replay(self):
+        failures = spool.Spool(self.path)
+        failures.append(
+            'S1-scl', 'transform', ValueError('a'), 'articlemeta',
+            code='S1', collection='scl')
+        failures.append(
+            'preprint_7', 'write', IOError('b'), 'oai',
+            identifier='oai:ops.preprints.scielo.org:preprint/7')
+        failures.append(
+            'preprint_8', 'delete', IOError('c'), 'oai',
+            identifier='oai:ops.preprints.scielo.org:preprint/8')
+        failures.append(
+            'S2-scl', 'delete', IOError('d'), 'articlemeta',
+            code='S2', collection='scl')
+
+        replayer = replay.Replay(self.path, solr_url='http://solr', threads=2)
+        replayer.solr = MagicMock()
+        replayer.articlemeta = MagicMock()
+        replayer.articlemeta.document.return_value = None
+
+        reader = MagicMock()
+        reader.GetRecord.return_value = oai.Record(
+            oai.Header('oai:ops.preprints.scielo.org:preprint/7', '2020-05-01', True), None)
+        replayer.oai_reader = lambda: reader
+
+        replayer.run()
+
+        delete, = replayer.solr.update.call_args[0]
+        self.assertIn('<id>preprint_7</id>', delete)
+        self.assertIn('<id>preprint_8</id>', delete)
+        self.assertIn('<id>S2-scl</id>', delete)
+        self.assertTrue(replayer.solr.commit.called)
+
+        entry, = spool.read(self.path)
+        self.assertEqual('S1-scl', entry['id'])
+        self.assertFalse(os.path.exists(self.path + '.replaying'))
@@ -0,0 +1,161 @@
+# coding: utf-8
+import threading
+import unittest
+
+from lxml import etree as ET
+
+from updatesearch import writer
+from updatesearch.solrclient import SolrError
+
+
+def _doc(identifier):
+    doc = ET.Element('doc')
+    ET.SubElement(doc, 'field', name='id').text = identifier
+    return doc
+
+
+class FakeSolr(object):
+    """
+    Record the ids of each update, ``errors`` are raised in order and the
+    updates with a ``rejected`` id fail with a 400.
+    """
+
+    def __init__(self, errors=None, rejected=()):
+        self.errors = list(errors or [])
+        self.rejected = set(rejected)
+        self.updates = []
+        self.lock = threading.Lock()
+
+    def update(self, data, commit=False, retries=None):
+        with self.lock:
+            if self.errors:
+                raise self.errors.pop(0)
+
+            add = ET.fromstring(data)
+            if self.rejected & set(d.findtext('field') for d in add):
+                raise SolrError('bad doc', status_code=400)
+
+            self.updates.append(
+                (add.get('commitWithin'), [d.findtext('field') for d in add]))
+
+
+class SolrWriterTests(unittest.TestCase):
+
+    def test_batches(self):
+        solr = FakeSolr()
+        solr_writer = writer.SolrWriter(
+            solr, batch_size=2, max_batch=2, commit_within=5000)
+
+        for i in range(5):
+            solr_writer.add(_doc(str(i)))
+        solr_writer.flush()
+
+        ids = sorted(i for commit_within, ids in solr.updates for i in ids)
+        self.assertEqual(['0', '1', '2', '3', '4'], ids)
+        self.assertEqual(3, len(solr.updates))
+        self.assertEqual('5000', solr.updates[0][0])
+        self.assertEqual(5, solr_writer.documents)
+
+    def test_fast_updates_grow_batch_then_concurrency(self):
+        solr_writer = writer.SolrWriter(
+            FakeSolr(), batch_size=10, max_batch=20, increase=10,
+            max_concurrency=4, target_latency=1)
+
+        solr_writer._adjust(0.1)
+        self.assertEqual((20, 1), (solr_writer.batch_size, solr_writer.concurrency))
+
+        solr_writer._adjust(0.1)
+        self.assertEqual((20, 2), (solr_writer.batch_size, solr_writer.concurrency))
+
+    def test_slow_updates_shrink_batch(self):
+        solr_writer = writer.SolrWriter(
+            FakeSolr(), batch_size=100, concurrency=4, target_latency=1)
+
+        solr_writer._adjust(3)
+
+        self.assertEqual((50, 4), (solr_writer.batch_size, solr_writer.concurrency))
+
+    def test_overload_backs_off_and_retries(self):
+        solr = FakeSolr(errors=[SolrError('busy', status_code=503)])
+        solr_writer = writer.SolrWriter(
+            solr, batch_size=4, concurrency=2, increase=0, backoff=0)
+
+        for i in range(4):
+            solr_writer.add(_doc(str(i)))
+        solr_writer.flush()
+
+        self.assertEqual((2, 1), (solr_writer.batch_size, solr_writer.concurrency))
+        self.assertEqual([['0', '1'], ['2', '3']], [ids for c, ids in solr.updates])
+
+    def test_bad_request_is_not_retried(self):
+        errors = []
+        solr = FakeSolr(rejected=['1'])
+        solr_writer = writer.SolrWriter(
+            solr, batch_size=1, backoff=0,
+            on_error=lambda docs, e: errors.append(writer.document_ids(docs)))
+
+        solr_writer.add(_doc('1'))
+        solr_writer.close()
+
+        self.assertEqual([['1']], errors)
+        self.assertEqual([], solr.updates)
+        self.assertEqual(1, solr_writer.batch_size)
+
+    def test_rejected_document_is_isolated(self):
+        errors = []
+        solr = FakeSolr(rejected=['5'])
+        solr_writer = writer.SolrWriter(
+            solr, batch_size=8, max_batch=8, backoff=0,
+            on_error=lambda docs, e: errors.append(writer.document_ids(docs)))
+
+        for i in range(8):
+            solr_writer.add(_doc(str(i)))
+        solr_writer.close()
+
+        self.assertEqual([['5']], errors)
+        ids = sorted(i for commit_within, ids in solr.updates for i in ids)
+        self.assertEqual(['0', '1', '2', '3', '4', '6', '7'], ids)
+        self.assertEqual(7, solr_writer.documents)
+        self.assertEqual(1, solr_writer.errors)
+        self.assertEqual(8, solr_writer.batch_size)
+
+    def test_flush_raises_without_on_error(self):
+        solr = FakeSolr(errors=[SolrError('bad doc', status_code=400)])
+        solr_writer = writer.SolrWriter(solr)
+
+        solr_writer.add(_doc('1'))
+
+        with self.assertRaises(SolrError):
+            solr_writer.flush()
+
+
+class FanoutWriterTests(unittest.TestCase):
+
+    def test_targets_are_independent(self):
+        errors = []
+        primary = FakeSolr()
+        mirror = FakeSolr(rejected=['1'])
+        fanout = writer.FanoutWriter([
+            ('http://a', writer.SolrWriter(primary, batch_size=2)),
+            ('http://b', writer.SolrWriter(
+                mirror, batch_size=2, on_error=lambda docs, e: errors.append(e))),
+        ])
+
+        for i in range(4):
+            fanout.add(_doc(str(i)))
+        fanout.close()
+
+        self.assertEqual(2, len(primary.updates))
+        self.assertEqual(2, len(mirror.updates))
+        self.assertEqual(1, len(errors))
+
+        report = fanout.report().split('\n')
+        self.assertTrue(report[0].startswith('http://a: Sent 4 documents'))
+        self.assertTrue(report[1].startswith('http://b: Sent 3 documents in 2 updates, 1 failed'))
+
+    def test_open_writer(self):
+        from updatesearch import solrclient
+
+        fanout = writer.open_writer(solrclient.connect('http://a,http://b'))
+
+        self.assertEqual(['http://a', 'http://b'], [url for url, w in fanout.writers])
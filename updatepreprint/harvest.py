@@ -0,0 +1,329 @@
+# coding: utf-8
+
+from __future__ import print_function
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+from sickle.oaiexceptions import NoRecordsMatch, BadResumptionToken
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from . import oai
+except ImportError:
+    import oai
+
+
+DATE_FORMATS = {
+    'YYYY-MM-DD': '%Y-%m-%d',
+    'YYYY-MM-DDThh:mm:ssZ': '%Y-%m-%dT%H:%M:%SZ',
+}
+
+# Records by ListRecords page of the OJS OAI server.
+OAI_PAGE_SIZE = 100
+
+_DONE = object()
+
+
+def date_windows(from_date, until_date, windows):
+    """
+    Split the period between ``from_date`` and ``until_date`` in ``windows``
+    consecutive windows of the same size.
+
+    :param from_date: datetime start of the period.
+    :param until_date: datetime end of the period.
+    :param windows: number of windows.
+
+    :returns: list of (from, until) datetime tuples.
+    """
+    windows = max(int(windows), 1)
+    step = (until_date - from_date) / windows
+
+    result = []
+    for i in range(windows):
+        start = from_date + step * i
+        end = until_date if i == windows - 1 else from_date + step * (i + 1)
+        result.append((start, end))
+
+    return result
+
+
+def parse_datestamp(datestamp):
+    """
+    Parse an OAI datestamp with day or seconds granularity.
+    """
+    for fmt in DATE_FORMATS.values():
+        try:
+            return datetime.strptime(datestamp, fmt)
+        except ValueError:
+            continue
+
+    raise ValueError('Invalid OAI datestamp: %s' % datestamp)
+
+
+class HarvestState(object):
+    """
+    Harvest checkpoints stored in a local JSON file.
+
+    While a harvest is running the file keeps the filters of each window and
+    the resumption token of the last indexed page of each window. When the
+    harvest completes, the newest datestamp indexed becomes the high-water
+    mark used as ``from`` by the next incremental harvest. The mark never
+    passes the oldest datestamp of the records that failed to be indexed
+    and were not recorded in a spool, so the next harvest gets them again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.high_water = None
+        self.windows = None
+        self.tokens = {}
+        self.newest = None
+        self.oldest_failed = None
+
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+
+            self.high_water = state.get('high_water')
+            running = state.get('running') or {}
+            self.windows = running.get('windows')
+            self.tokens = {int(k): v for k, v in running.get('tokens', {}).items()}
+            self.newest = running.get('newest')
+            self.oldest_failed = running.get('oldest_failed')
+
+    @property
+    def running(self):
+        return self.windows is not None
+
+    def save(self):
+        state = {'high_water': self.high_water, 'running': None}
+
+        if self.running:
+            state['running'] = {
+                'windows': self.windows,
+                'tokens': {str(k): v for k, v in self.tokens.items()},
+                'newest': self.newest,
+                'oldest_failed': self.oldest_failed,
+            }
+
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def start(self, windows):
+        """
+        Register the windows of a new harvest.
+
+        :param windows: list of ListRecords filters, one by window.
+        """
+        self.windows = windows
+        self.tokens = {}
+        self.newest = None
+        self.oldest_failed = None
+        self.save()
+
+    def checkpoint(self, tokens, newest):
+        """
+        Record the resumption tokens of the pages already indexed and the
+        newest datestamp indexed.
+
+        :param tokens: dict {window index: page token}
+        :param newest: newest datestamp of the indexed records.
+        """
+        self.tokens.update({k: v for k, v in tokens.items() if v is not None})
+
+        if newest and (self.newest is None or newest > self.newest):
+            self.newest = newest
+
+        self.save()
+
+    def fail(self, oldest):
+        """
+        Record the oldest datestamp of records that failed to be indexed.
+
+        :param oldest: oldest datestamp of the failed records.
+        """
+        if oldest and (self.oldest_failed is None or oldest < self.oldest_failed):
+            self.oldest_failed = oldest
+            self.save()
+
+    def complete(self):
+        """
+        Finish the running harvest promoting the newest indexed datestamp to
+        high-water mark, capped to the oldest datestamp of the failed records.
+        """
+        mark = self.newest
+        if self.oldest_failed and (mark is None or self.oldest_failed < mark):
+            mark = self.oldest_failed
+
+        if mark and (self.high_water is None or mark > self.high_water):
+            self.high_water = mark
+
+        self.windows = None
+        self.tokens = {}
+        self.newest = None
+        self.oldest_failed = None
+        self.save()
+
+
+class WindowedHarvester(object):
+    """
+    Harvest ``ListRecords`` splitting the period in date windows harvested
+    concurrently, each one with its own OAI client.
+
+    The records of all windows are merged in a single stream. Records
+    harvested in more than one window, which happens at the window
+    boundaries, are yielded only once.
+
+    Records are read by background threads into a queue bounded to
+    ``prefetch`` pages of ``page_size`` records, so the next pages are
+    requested while the current records are being indexed. Each record is
+    queued as soon as it is parsed and released once consumed, pages are
+    never held whole. ``wait`` accumulates the seconds the consumer spent
+    waiting for the OAI server.
+    """
+
+    def __init__(self, oai_url, windows=1, prefetch=2, page_size=OAI_PAGE_SIZE,
+                 **request_args):
+        self.oai_url = oai_url
+        self.windows = windows
+        self.prefetch = max(prefetch, 1)
+        self.page_size = max(page_size, 1)
+        self.request_args = request_args
+        self.wait = 0.0
+
+    def client(self):
+        return oai.OAIReader(self.oai_url, **self.request_args)
+
+    def granularity(self):
+        """
+        Return the (earliest datestamp, strftime format) of the repository.
+        """
+        identify = self.client().Identify()
+        fmt = DATE_FORMATS.get(
+            getattr(identify, 'granularity', None), DATE_FORMATS['YYYY-MM-DD'])
+
+        return parse_datestamp(identify.earliestDatestamp), fmt
+
+    def plan(self, filters, from_date=None, until_date=None):
+        """
+        Return the ListRecords filters of each window.
+
+        :param filters: ListRecords arguments.
+        :param from_date: datetime start of the harvest, default is the
+                          earliest datestamp of the repository.
+        :param until_date: datetime end of the harvest, default now.
+        """
+        if self.windows <= 1 and not from_date and not until_date:
+            return [dict(filters)]
+
+        earliest, fmt = self.granularity()
+
+        if self.windows <= 1:
+            window_filters = dict(filters)
+            if from_date:
+                window_filters['from'] = from_date.strftime(fmt)
+            if until_date:
+                window_filters['until'] = until_date.strftime(fmt)
+            return [window_filters]
+
+        from_date = from_date or earliest
+        until_date = until_date or datetime.utcnow()
+
+        windows = []
+        for start, end in date_windows(from_date, until_date, self.windows):
+            window_filters = dict(filters)
+            window_filters['from'] = start.strftime(fmt)
+            window_filters['until'] = end.strftime(fmt)
+            windows.append(window_filters)
+
+        return windows
+
+    def _list_records(self, filters, token):
+        if token:
+            try:
+                return self.client().ListRecords(resumptionToken=token)
+            except BadResumptionToken:
+                print("Resumption token expired, restarting window {0}".format(filters))
+
+        return self.client().ListRecords(**filters)
+
+    def _harvest_window(self, index, filters, token, records):
+        try:
+            iterator = self._list_records(filters, token)
+
+            for record in iterator:
+                records.put((index, iterator.page_token, record))
+        except NoRecordsMatch:
+            pass
+        except Exception as e:
+            records.put(e)
+        finally:
+            records.put(_DONE)
+
+    def harvest(self, windows, tokens=None):
+        """
+        Iterate over the records of all the windows.
+
+        :param windows: list of ListRecords filters, as returned by ``plan``.
+        :param tokens: dict {window index: resumption token} to resume an
+                       interrupted harvest.
+
+        :returns: iterator of (window index, page token, record), the page
+                  token is the resumption token of the page of the record,
+                  a safe point to resume the harvest once it is indexed.
+        """
+        tokens = tokens or {}
+        records = queue.Queue(maxsize=self.prefetch * self.page_size)
+        threads = []
+
+        for index, filters in enumerate(windows):
+            print("Harvesting window {0}".format(filters))
+
+            thread = threading.Thread(
+                target=self._harvest_window,
+                args=(index, filters, tokens.get(index), records))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        seen = set()
+        running = len(threads)
+
+        while running:
+            start = time.time()
+            item = records.get()
+            self.wait += time.time() - start
+
+            if item is _DONE:
+                running -= 1
+                continue
+
+            if isinstance(item, Exception):
+                raise item
+
+            index, page_token, record = item
+            identifier = record.header.identifier
+            if identifier in seen:
+                continue
+
+            seen.add(identifier)
+            yield index, page_token, record
+
+    def records(self, filters, from_date=None, until_date=None):
+        """
+        Iterate over the records harvested from the period.
+        """
+        windows = self.plan(filters, from_date=from_date, until_date=until_date)
+
+        for index, page_token, record in self.harvest(windows):
+            yield record
@@ -0,0 +1,180 @@
+# coding: utf-8
+from collections import namedtuple
+
+import requests
+from lxml import etree as ET
+from sickle import oaiexceptions
+
+
+OAI = '{http://www.openarchives.org/OAI/2.0/}'
+
+Header = namedtuple('Header', 'identifier datestamp deleted')
+Record = namedtuple('Record', 'header xml')
+ResumptionToken = namedtuple(
+    'ResumptionToken', 'token cursor complete_list_size expiration_date')
+Identify = namedtuple('Identify', 'granularity earliestDatestamp')
+
+
+def oai_error(element):
+    """
+    Return the Sickle exception corresponding to an OAI ``<error>`` element.
+    """
+    code = element.get('code') or ''
+    name = code[:1].upper() + code[1:]
+    exception = getattr(oaiexceptions, name, oaiexceptions.OAIError)
+
+    return exception(element.text)
+
+
+def read_header(record):
+    """
+    Read the identifier, datestamp and deleted status of a ``<record>``.
+    """
+    header = record.find(OAI + 'header')
+
+    return Header(
+        header.findtext(OAI + 'identifier'),
+        header.findtext(OAI + 'datestamp'),
+        header.get('status') == 'deleted'
+    )
+
+
+class RecordIterator(object):
+    """
+    Iterator over the records of a ``ListRecords`` request, following the
+    resumption tokens.
+
+    ``page_token`` is the resumption token used to request the page of the
+    last record yielded (None for the first page of a harvest) and
+    ``resumption_token`` the token of the next page, once it was read.
+    """
+
+    def __init__(self, reader, params):
+        self.reader = reader
+        self.params = params
+        self.page_token = params.get('resumptionToken')
+        self.resumption_token = None
+        self._records = self._iter_records()
+
+        # Request the first page right away, as Sickle does, so OAI errors
+        # like noRecordsMatch are raised by ListRecords.
+        self._first = next(self._records, None)
+
+    def __iter__(self):
+        if self._first is None:
+            return
+
+        first, self._first = self._first, None
+        yield first
+
+        for record in self._records:
+            yield record
+
+    def _iter_records(self):
+        params = dict(self.params, verb='ListRecords')
+
+        while True:
+            self.resumption_token = None
+
+            for record in self.reader.iter_page(params, self):
+                yield record
+
+            token = getattr(self.resumption_token, 'token', None)
+            if not token:
+                break
+
+            self.page_token = token
+            params = {'verb': 'ListRecords', 'resumptionToken': token}
+
+
+class OAIReader(object):
+    """
+    Streaming OAI-PMH client.
+
+    Each ``ListRecords`` page is parsed with ``lxml.etree.iterparse`` while it
+    is downloaded. Every ``<record>`` is yielded as soon as its end tag is
+    read and removed from the page tree when the next one is complete, so
+    memory holds only the records still referenced by the caller instead
+    of the whole page.
+
+    The interface follows Sickle (``ListRecords``, ``Identify``, records with
+    ``header`` and ``xml``) and raises the Sickle OAI exceptions.
+    """
+
+    def __init__(self, oai_url, timeout=60, **request_args):
+        self.oai_url = oai_url
+        self.timeout = timeout
+        self.request_args = request_args
+        self.session = requests.Session()
+
+    def _get(self, params, stream=False):
+        response = self.session.get(
+            self.oai_url, params=params, timeout=self.timeout, stream=stream,
+            **self.request_args)
+        response.raise_for_status()
+
+        return response
+
+    def Identify(self):
+        tree = ET.fromstring(self._get({'verb': 'Identify'}).content)
+
+        error = tree.find(OAI + 'error')
+        if error is not None:
+            raise oai_error(error)
+
+        return Identify(
+            tree.findtext('.//' + OAI + 'granularity'),
+            tree.findtext('.//' + OAI + 'earliestDatestamp')
+        )
+
+    def ListRecords(self, **kwargs):
+        return RecordIterator(self, kwargs)
+
+    def GetRecord(self, **kwargs):
+        params = dict(kwargs, verb='GetRecord')
+        tree = ET.fromstring(self._get(params).content)
+
+        error = tree.find(OAI + 'error')
+        if error is not None:
+            raise oai_error(error)
+
+        record = tree.find('.//' + OAI + 'record')
+
+        return Record(read_header(record), record)
+
+    def iter_page(self, params, iterator):
+        """
+        Stream the records of one ``ListRecords`` page.
+
+        :param params: request parameters.
+        :param iterator: ``RecordIterator`` receiving the resumption token.
+        """
+        response = self._get(params, stream=True)
+        response.raw.decode_content = True
+
+        context = ET.iterparse(
+            response.raw, events=('end',),
+            tag=(OAI + 'record', OAI + 'resumptionToken', OAI + 'error'))
+
+        try:
+            for event, element in context:
+                if element.tag == OAI + 'error':
+                    raise oai_error(element)
+
+                if element.tag == OAI + 'resumptionToken':
+                    iterator.resumption_token = ResumptionToken(
+                        element.text,
+                        element.get('cursor'),
+                        element.get('completeListSize'),
+                        element.get('expirationDate')
+                    )
+                    continue
+
+                # Detach the records already yielded, they stay alive only
+                # while the caller holds them.
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+                yield Record(read_header(element), element)
+        finally:
+            response.close()
@@ -1,4 +1,6 @@
 # coding: utf-8
+import functools
+
 from lxml import etree as ET
 
 import plumber
@@ -43,34 +45,121 @@ ns = {'dc': 'http://purl.org/dc/elements/1.1/',
       'xsi': 'http://www.w3.org/2001/XMLSchema-instance',
       'oai': 'http://www.openarchives.org/OAI/2.0/'}
 
+DC = '{%s}' % ns['dc']
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+# Result of ``standardize_tag`` for the language tags found in the preprint
+# server records, avoiding the langcodes parser for the common cases.
+LANGUAGE_TAGS = {
+    'pt': 'pt', 'pt-BR': 'pt-BR', 'pt-PT': 'pt-PT', 'por': 'pt',
+    'en': 'en', 'en-US': 'en-US', 'en-GB': 'en-GB', 'eng': 'en',
+    'es': 'es', 'es-ES': 'es-ES', 'spa': 'es',
+    'fr': 'fr', 'fr-FR': 'fr-FR', 'fra': 'fr', 'fre': 'fr',
+    'it': 'it', 'ita': 'it',
+    'de': 'de', 'deu': 'de', 'ger': 'de',
+}
+
+
+@functools.lru_cache(maxsize=256)
+def normalize_language(tag):
+    """
+    Standardize a language tag, ex.: ``por`` -> ``pt``.
+
+    Known tags come from ``LANGUAGE_TAGS``, others are parsed by langcodes
+    and kept in a bounded cache.
+    """
+    try:
+        return LANGUAGE_TAGS[tag]
+    except KeyError:
+        return standardize_tag(tag)
+
+
+@functools.lru_cache(maxsize=256)
+def primary_language(tag):
+    """
+    Standardize the primary subtag of a language tag, ex.: ``pt-BR`` -> ``pt``.
+    """
+    if "-" in tag:
+        tag = tag.split("-")[0]
+
+    return normalize_language(tag)
+
+
+class DublinCore(object):
+    """
+    Dublin Core elements of an OAI record extracted in a single walk over the
+    record, grouped by element name.
+
+    Each element is kept as a list of (text, xml:lang) tuples in document
+    order.
+    """
+
+    def __init__(self, raw):
+        self.elements = {}
+
+        for element in raw.iter(DC + '*'):
+            self.elements.setdefault(element.tag[len(DC):], []).append(
+                (element.text, element.get(XML_LANG)))
+
+    def items(self, name):
+        """
+        Return the (text, xml:lang) tuples of the element ``name``.
+        """
+        return self.elements.get(name, [])
+
+    def values(self, name):
+        """
+        Return the texts of the element ``name``.
+        """
+        return [text for text, lang in self.items(name)]
+
+    def by_language(self, name):
+        """
+        Return the texts of the element ``name`` grouped by xml:lang.
+        """
+        grouped = {}
+        for text, lang in self.items(name):
+            grouped.setdefault(lang, []).append(text)
+
+        return grouped
+
+
+def dublin_core(raw):
+    """
+    Return the ``DublinCore`` of the record, parsing it only when the pipeline
+    did not start with ``SetupDocument``.
+    """
+    if isinstance(raw, DublinCore):
+        return raw
+
+    return DublinCore(raw)
+
 
 class SetupDocument(plumber.Pipe):
 
     def transform(self, data):
         xml = ET.Element('doc')
 
-        return data, xml
+        return DublinCore(data), xml
 
 
 # <field name="id">art-S0102-695X2015000100053-scl</field>
 class DocumentID(plumber.Pipe):
 
     def precond(data):
-        xpath = ".//dc:identifier"
         raw, xml = data
 
-        if not raw.findall(xpath, namespaces=ns):
+        if not dublin_core(raw).values('identifier'):
             raise plumber.UnmetPrecondition()
 
     @plumber.precondition(precond)
     def transform(self, data):
-        xpath = ".//dc:identifier"
         raw, xml = data
 
-        for identifier in raw.findall(xpath, namespaces=ns):
-            if identifier.text.startswith('http'):
+        for identifier in dublin_core(raw).values('identifier'):
+            if identifier.startswith('http'):
                 field = ET.Element('field')
-                field.text = "preprint_%s" % (identifier.text.split('/')[-1])
+                field.text = "preprint_%s" % (identifier.split('/')[-1])
                 field.set('name', 'id')
                 xml.find('.').append(field)
 
@@ -81,21 +170,19 @@ class DocumentID(plumber.Pipe):
 class URL(plumber.Pipe):
 
     def precond(data):
-        xpath = ".//dc:identifier"
         raw, xml = data
 
-        if not raw.findall(xpath, namespaces=ns):
+        if not dublin_core(raw).values('identifier'):
             raise plumber.UnmetPrecondition()
 
     @plumber.precondition(precond)
     def transform(self, data):
-        xpath = ".//dc:identifier"
         raw, xml = data
 
-        for url in raw.findall(xpath, namespaces=ns):
-            if url.text.startswith('http'):
+        for url in dublin_core(raw).values('identifier'):
+            if url.startswith('http'):
                 field = ET.Element('field')
-                field.text = url.text
+                field.text = url
                 field.set('name', 'ur')
                 xml.find('.').append(field)
 
@@ -106,21 +193,19 @@ class URL(plumber.Pipe):
 class DOI(plumber.Pipe):
 
     def precond(data):
-        xpath = ".//dc:identifier"
         raw, xml = data
 
-        if not raw.findall(xpath, namespaces=ns):
+        if not dublin_core(raw).values('identifier'):
             raise plumber.UnmetPrecondition()
 
     @plumber.precondition(precond)
     def transform(self, data):
-        xpath = ".//dc:identifier"
         raw, xml = data
 
-        for doi in raw.findall(xpath, namespaces=ns):
-            if not doi.text.startswith('http'):
+        for doi in dublin_core(raw).values('identifier'):
+            if not doi.startswith('http'):
                 field = ET.Element('field')
-                field.text = doi.text
+                field.text = doi
                 field.set('name', 'doi')
                 xml.find('.').append(field)
 
@@ -130,21 +215,19 @@ class DOI(plumber.Pipe):
 class Languages(plumber.Pipe):
 
     def precond(data):
-        xpath = ".//dc:language"
         raw, xml = data
 
-        if not raw.findall(xpath, namespaces=ns):
+        if not dublin_core(raw).values('language'):
             raise plumber.UnmetPrecondition()
 
     @plumber.precondition(precond)
     def transform(self, data):
-        xpath = ".//dc:language"
         raw, xml = data
 
-        for lang in raw.findall(xpath, namespaces=ns):
+        for lang in dublin_core(raw).values('language'):
             field = ET.Element('field')
 
-            field.text = standardize_tag(lang.text)
+            field.text = normalize_language(lang)
             field.set('name', 'la')
             xml.find('.').append(field)
 
@@ -155,23 +238,24 @@ class Languages(plumber.Pipe):
 class Fulltexts(plumber.Pipe):
 
     def precond(data):
-        xpath = ".//dc:identifier"
         raw, xml = data
 
-        if not raw.findall(xpath, namespaces=ns):
+        if not dublin_core(raw).values('identifier'):
             raise plumber.UnmetPrecondition()
 
     @plumber.precondition(precond)
     def transform(self, data):
-        xpath = ".//dc:identifier"
         raw, xml = data
+        record = dublin_core(raw)
+
+        languages = [normalize_language(lang) for lang in record.values('language')]
 
-        for url in raw.findall(xpath, namespaces=ns):
-            if url.text.startswith('http'):
-                for lang in raw.findall(".//dc:language", namespaces=ns):
+        for url in record.values('identifier'):
+            if url.startswith('http'):
+                for lang in languages:
                     field = ET.Element('field')
-                    field.text = url.text
-                    field.set('name', 'fulltext_html_%s' % standardize_tag(lang.text))
+                    field.text = url
+                    field.set('name', 'fulltext_html_%s' % lang)
                     xml.find('.').append(field)
         return data
 
@@ -180,20 +264,18 @@ class Fulltexts(plumber.Pipe):
 class PublicationDate(plumber.Pipe):
 
     def precond(data):
-        xpath = ".//dc:date"
         raw, xml = data
 
-        if not raw.findall(xpath, namespaces=ns):
+        if not dublin_core(raw).values('date'):
             raise plumber.UnmetPrecondition()
 
     @plumber.precondition(precond)
     def transform(self, data):
-        xpath = ".//dc:date"
         raw, xml = data
 
-        for date in raw.findall(xpath, namespaces=ns):
+        for date in dublin_core(raw).values('date'):
             field = ET.Element('field')
-            field.text = date.text
+            field.text = date
             field.set('name', 'da')
             xml.find('.').append(field)
         return data
@@ -203,24 +285,19 @@ class PublicationDate(plumber.Pipe):
 class Abstract(plumber.Pipe):
 
     def precond(data):
-        xpath = ".//dc:description"
         raw, xml = data
 
-        if not raw.findall(xpath, namespaces=ns):
+        if not dublin_core(raw).values('description'):
             raise plumber.UnmetPrecondition()
 
     @plumber.precondition(precond)
     def transform(self, data):
         raw, xml = data
-        xpath = ".//dc:description"
 
-        for item in raw.findall(xpath, namespaces=ns):
-            lang = item.get('{http://www.w3.org/XML/1998/namespace}lang')
-            if "-" in lang:
-                lang = lang.split("-")[0]
+        for text, lang in dublin_core(raw).items('description'):
             field = ET.Element('field')
-            field.text = item.text
-            field.set('name', 'ab_{}'.format(standardize_tag(lang)))
+            field.text = text
+            field.set('name', 'ab_{}'.format(primary_language(lang)))
             xml.find('.').append(field)
         return data
 
@@ -230,14 +307,10 @@ class AvailableLanguages(plumber.Pipe):
 
     def transform(self, data):
         raw, xml = data
-        xpath = ".//dc:description"
 
         langs = set()
-        for item in raw.findall(xpath, namespaces=ns):
-            lang = item.get('{http://www.w3.org/XML/1998/namespace}lang')
-            if "-" in lang:
-                lang = lang.split("-")[0]
-            langs.add(standardize_tag(lang))
+        for lang in dublin_core(raw).by_language('description'):
+            langs.add(primary_language(lang))
 
         for language in langs:
             field = ET.Element('field')
@@ -252,22 +325,19 @@ class AvailableLanguages(plumber.Pipe):
 class Keywords(plumber.Pipe):
 
     def precond(data):
-        xpath = ".//dc:subject"
         raw, xml = data
 
-        if not raw.findall(xpath, namespaces=ns):
+        if not dublin_core(raw).values('subject'):
             raise plumber.UnmetPrecondition()
 
     @plumber.precondition(precond)
     def transform(self, data):
         raw, xml = data
-        xpath = ".//dc:subject"
 
-        for item in raw.findall(xpath, namespaces=ns):
-            lang = item.get('{http://www.w3.org/XML/1998/namespace}lang')
+        for text, lang in dublin_core(raw).items('subject'):
             field = ET.Element('field')
-            field.text = item.text
-            field.set('name', 'keyword_{}'.format(standardize_tag(lang[0:2])))
+            field.text = text
+            field.set('name', 'keyword_{}'.format(normalize_language(lang[0:2])))
             xml.find('.').append(field)
         return data
 
@@ -288,30 +358,28 @@ class IsCitable(plumber.Pipe):
 class Permission(plumber.Pipe):
 
     def precond(data):
-        xpath = ".//dc:rights"
         raw, xml = data
 
-        if not raw.findall(xpath, namespaces=ns):
+        if not dublin_core(raw).values('rights'):
             raise plumber.UnmetPrecondition()
 
     @plumber.precondition(precond)
     def transform(self, data):
         raw, xml = data
-        xpath = ".//dc:rights"
 
-        for item in raw.findall(xpath, namespaces=ns):
-            if not item.text.startswith('http'):
+        for item in dublin_core(raw).values('rights'):
+            if not item.startswith('http'):
                 field = ET.Element('field')
-                field.text = item.text
+                field.text = item
                 field.set('name', 'use_license_text')
                 xml.find('.').append(field)
             else:
                 field = ET.Element('field')
-                field.text = item.text
+                field.text = item
                 field.set('name', 'use_license_uri')
                 xml.find('.').append(field)
                 field = ET.Element('field')
-                field.text = item.text
+                field.text = item
                 field.set('name', 'use_license_ur')
                 xml.find('.').append(field)
         return data
@@ -345,20 +413,18 @@ class DocumentType(plumber.Pipe):
 class Authors(plumber.Pipe):
 
     def precond(data):
-        xpath = ".//dc:creator"
         raw, xml = data
 
-        if not raw.findall(xpath, namespaces=ns):
+        if not dublin_core(raw).values('creator'):
             raise plumber.UnmetPrecondition()
 
     @plumber.precondition(precond)
     def transform(self, data):
         raw, xml = data
-        xpath = ".//dc:creator"
 
-        for author in raw.findall(xpath, namespaces=ns):
+        for author in dublin_core(raw).values('creator'):
             field = ET.Element('field')
-            field.text = author.text
+            field.text = author
             field.set('name', 'au')
             xml.find('.').append(field)
         return data
@@ -368,23 +434,20 @@ class Authors(plumber.Pipe):
 class Titles(plumber.Pipe):
 
     def precond(data):
-        xpath = ".//dc:title"
         raw, xml = data
 
-        if not raw.findall(xpath, namespaces=ns):
+        if not dublin_core(raw).values('title'):
             raise plumber.UnmetPrecondition()
 
     @plumber.precondition(precond)
     def transform(self, data):
         raw, xml = data
-        xpath = ".//dc:title"
 
-        for item in raw.findall(xpath, namespaces=ns):
-            lang = item.get('{http://www.w3.org/XML/1998/namespace}lang')
+        for text, lang in dublin_core(raw).items('title'):
             if "-" in lang:
                 lang = lang.split("-")[0]
             field = ET.Element('field')
-            field.text = item.text
+            field.text = text
             field.set('name', 'ti_{}'.format(lang))
             xml.find('.').append(field)
         return data
@@ -7,15 +7,64 @@ import argparse
 import os
 import sys
 import textwrap
+import threading
 import time
 from datetime import datetime, timedelta
 
-import pipeline_xml
 import plumber
 from lxml import etree as ET
-from sickle import Sickle
-from sickle.oaiexceptions import NoRecordsMatch
-from SolrAPI import Solr
+from updatesearch.solrclient import connect
+from updatesearch.writer import open_writer, document_ids
+from updatesearch.spool import Spool
+
+try:
+    from . import pipeline_xml
+    from . import harvest
+except ImportError:
+    import pipeline_xml
+    import harvest
+
+
+def document_id(oai_identifier):
+    """
+    Return the Solr id of a preprint from its OAI identifier.
+
+    The id is built from the last segment of the identifier, as done by
+    ``pipeline_xml.DocumentID`` with the preprint URL, ex.:
+    ``oai:ops.preprints.scielo.org:preprint/7`` -> ``preprint_7``.
+    """
+    return "preprint_%s" % oai_identifier.split('/')[-1]
+
+
+def pipeline_to_docs(article):
+    """
+    Pipeline to tranform an OAI record in Solr ``<doc>`` elements.
+
+    :param article: OAI record XML element.
+    """
+
+    ppl = plumber.Pipeline(
+        pipeline_xml.SetupDocument(),
+
+        pipeline_xml.DocumentID(),
+        pipeline_xml.URL(),
+        pipeline_xml.DOI(),
+        pipeline_xml.Languages(),
+        pipeline_xml.Fulltexts(),
+        pipeline_xml.PublicationDate(),
+        pipeline_xml.Keywords(),
+        pipeline_xml.Collection(),
+        pipeline_xml.DocumentType(),
+        pipeline_xml.Titles(),
+        pipeline_xml.Abstract(),
+        pipeline_xml.Authors(),
+        pipeline_xml.AvailableLanguages(),
+        pipeline_xml.Networks(),
+
+        pipeline_xml.TearDown()
+    )
+
+    return list(ppl.run([article]))
 
 
 class UpdatePreprint(object):
@@ -33,6 +82,28 @@ class UpdatePreprint(object):
                         type=int,
                         help='index articles from specific period, use number of hours.')
 
+    parser.add_argument('-f', '--from_date',
+                        type=lambda x: datetime.strptime(x, '%Y-%m-%d'),
+                        help='index articles from specific date. YYYY-MM-DD.')
+
+    parser.add_argument('-u', '--until_date',
+                        type=lambda x: datetime.strptime(x, '%Y-%m-%d'),
+                        help='index articles until this specific date. YYYY-MM-DD (default now).')
+
+    parser.add_argument('-n', '--windows',
+                        type=int,
+                        default=1,
+                        help='split the harvest period in this number of date windows harvested concurrently.')
+
+    parser.add_argument('-p', '--prefetch',
+                        type=int,
+                        default=2,
+                        help='number of OAI pages of records read ahead in background while the current records are indexed.')
+
+    parser.add_argument('-s', '--state_file',
+                        dest='state_file',
+                        help='local file where the harvest position is saved after each committed batch, used to resume an interrupted harvest and as the starting date of the next one. With --commit_within only the starting date of the next harvest is saved.')
+
     parser.add_argument('-d', '--delete',
                         dest='delete',
                         help='delete query ex.: q=type:"preprint (Lucene Syntax).')
@@ -40,13 +111,25 @@ class UpdatePreprint(object):
     parser.add_argument('-solr_url', '--solr_url',
                         dest='solr_url',
                         default="http://solr.scielo.org/solr/articles",
-                        help='Solr RESTFul URL, processing try to get the variable from environment ``SOLR_URL`` otherwise use --solr_url to set the solr_url (preferable).')
+                        help='Solr RESTFul URL, processing try to get the variable from environment ``SOLR_URL`` otherwise use --solr_url to set the solr_url (preferable). Use comma separated URLs to index in several Solr at once.')
 
     parser.add_argument('-oai_url', '--oai_url',
                         dest='oai_url',
                         default="http://preprints.scielo.org/index.php/scielo/oai",
                         help='OAI URL, processing try to get the variable from environment ``OAI_URL`` otherwise use --oai_url to set the oai_url (preferable).')
 
+    parser.add_argument('-b', '--batch_size',
+                        type=int,
+                        default=100,
+                        help='initial number of records sent to Solr in each update request, adjusted from the Solr response time.')
+
+    parser.add_argument('-w', '--commit_within',
+                        type=int,
+                        help='let Solr commit the updates within this number of milliseconds instead of committing after each batch.')
+
+    parser.add_argument('--spool',
+                        help='dead-letter spool file where the records that fail to be indexed are recorded, reprocess them with update_search_replay.')
+
     parser.add_argument('-v', '--version',
                         action='version',
                         version='version: 0.1-beta')
@@ -65,13 +148,39 @@ class UpdatePreprint(object):
             raise argparse.ArgumentTypeError('--oai_url or ``OAI_URL`` enviroment variable must be the set, use --help.')
 
         if not solr_url:
-            self.solr = Solr(self.args.solr_url, timeout=10)
+            self.solr = connect(self.args.solr_url)
         else:
-            self.solr = Solr(solr_url, timeout=10)
+            self.solr = connect(solr_url)
+
+        # Solr ids of the documents rejected by Solr, by the writer threads.
+        self.rejected = {}
+        self._lock = threading.Lock()
+
+        self.writer = open_writer(
+            self.solr, batch_size=self.args.batch_size,
+            commit_within=self.args.commit_within,
+            on_error=self.write_error)
+
+        self.spool = Spool(self.args.spool) if self.args.spool else None
+
+        self.state = None
+        if self.args.state_file:
+            self.state = harvest.HarvestState(self.args.state_file)
+
+        self.from_date = self.args.from_date
+        self.until_date = self.args.until_date
 
         if self.args.time:
             self.from_date = datetime.now() - timedelta(hours=self.args.time)
 
+    def pipeline_to_docs(self, article):
+        """
+        Pipeline to tranform an OAI record in Solr ``<doc>`` elements.
+
+        :param article: OAI record XML element.
+        """
+        return pipeline_to_docs(article)
+
     def pipeline_to_xml(self, article):
         """
         Pipeline to tranform a dictionary to XML format
@@ -79,28 +188,7 @@ class UpdatePreprint(object):
         :param list_dict: List of dictionary content key tronsform in a XML.
         """
 
-        ppl = plumber.Pipeline(
-            pipeline_xml.SetupDocument(),
-
-            pipeline_xml.DocumentID(),
-            pipeline_xml.URL(),
-            pipeline_xml.DOI(),
-            pipeline_xml.Languages(),
-            pipeline_xml.Fulltexts(),
-            pipeline_xml.PublicationDate(),
-            pipeline_xml.Keywords(),
-            pipeline_xml.Collection(),
-            pipeline_xml.DocumentType(),
-            pipeline_xml.Titles(),
-            pipeline_xml.Abstract(),
-            pipeline_xml.Authors(),
-            pipeline_xml.AvailableLanguages(),
-            pipeline_xml.Networks(),
-
-            pipeline_xml.TearDown()
-        )
-
-        xmls = ppl.run([article])
+        xmls = self.pipeline_to_docs(article)
 
         # Add root document
         add = ET.Element('add')
@@ -110,6 +198,170 @@ class UpdatePreprint(object):
 
         return ET.tostring(add, encoding="utf-8", method="xml")
 
+    def send_batch(self, batch):
+        """
+        Send a batch of documents to Solr and wait for the updates.
+
+        The writer splits the batch in concurrent update requests sized from
+        the Solr response time. Commits the batch unless ``--commit_within``
+        is set, in this case the commit is left to Solr.
+
+        :param batch: list of ``<doc>`` elements from ``pipeline_to_docs``.
+        """
+        for doc in batch:
+            self.writer.add(doc)
+
+        self.writer.flush()
+
+        if not self.args.commit_within:
+            self.solr.commit()
+
+    def send_deletes(self, deleted):
+        """
+        Remove documents from Solr in a single delete by id request.
+
+        :param deleted: list of Solr document ids.
+        """
+        delete = ET.Element('delete')
+
+        if self.args.commit_within:
+            delete.set('commitWithin', str(self.args.commit_within))
+
+        for document_id in deleted:
+            ET.SubElement(delete, 'id').text = document_id
+
+        self.solr.update(
+            ET.tostring(delete, encoding="utf-8", method="xml"),
+            commit=not self.args.commit_within
+        )
+
+    def failed(self, identifier, stage, exception, datestamp=None):
+        """
+        Report a record that could not be indexed and record it in the
+        dead-letter spool, when ``--spool`` is set. Without the spool the
+        high-water mark of ``--state_file`` is kept before the record, so the
+        next harvest gets it again.
+
+        :param identifier: OAI identifier of the record.
+        :param datestamp: OAI datestamp of the record.
+        """
+        print("Error: {0}".format(exception))
+
+        if self.spool is not None:
+            self.spool.append(
+                document_id(identifier), stage, exception, 'oai',
+                identifier=identifier)
+        elif self.state is not None:
+            self.state.fail(datestamp)
+
+    def write_error(self, docs, exception):
+        """
+        Record the documents the writer failed to send to Solr.
+        """
+        with self._lock:
+            for doc_id in document_ids(docs):
+                self.rejected[doc_id] = exception
+
+    def flush(self, batch, deleted=None, tokens=None, newest=None, records=None):
+        """
+        Send the batch to Solr and return the number of indexed and removed
+        records.
+
+        With ``--state_file`` the harvest position of the batch is saved once
+        it is committed, the failed records are handled by ``failed``. With
+        ``--commit_within`` the batch is not committed yet, only its newest
+        datestamp is saved and an interrupted harvest restarts from the
+        beginning of its windows.
+
+        :param batch: list of ``<doc>`` elements.
+        :param deleted: list of Solr ids of the records deleted in the OAI.
+        :param tokens: dict {window: page token} of the records in the batch.
+        :param newest: newest datestamp of the records in the batch.
+        :param records: list of (OAI identifier, deleted, datestamp) of the
+                        records in the batch.
+        """
+        deleted = deleted or []
+        records = records or []
+
+        if not batch and not deleted:
+            return 0, 0
+
+        # Solr id: exception of the failed documents.
+        failed = {}
+
+        if batch:
+            try:
+                self.send_batch(batch)
+            except Exception as e:
+                failed.update(
+                    (document_id(identifier), e)
+                    for identifier, is_deleted, datestamp in records
+                    if not is_deleted)
+
+            with self._lock:
+                failed.update(self.rejected)
+                self.rejected = {}
+
+        if deleted:
+            try:
+                self.send_deletes(deleted)
+            except Exception as e:
+                failed.update((doc_id, e) for doc_id in deleted)
+
+        identifiers = set()
+        for identifier, is_deleted, datestamp in records:
+            identifiers.add(document_id(identifier))
+            exception = failed.get(document_id(identifier))
+            if exception is not None:
+                self.failed(
+                    identifier, 'delete' if is_deleted else 'write',
+                    exception, datestamp)
+
+        for doc_id, exception in failed.items():
+            if doc_id not in identifiers:
+                print("Error: {0}: {1}".format(doc_id, exception))
+
+        # The failed records are spooled or keep the high-water mark.
+        if self.state is not None:
+            if self.args.commit_within:
+                tokens = {}
+            self.state.checkpoint(tokens or {}, newest)
+
+        added = len([doc for doc in batch
+                     if doc.findtext('field[@name="id"]') not in failed])
+        return added, len([i for i in deleted if i not in failed])
+
+    def harvest(self, filters):
+        """
+        Return the iterator of (window, page token, record) to be indexed.
+
+        With ``--windows`` greater than 1 the period is split in date windows
+        harvested concurrently. With ``--state_file`` an interrupted harvest
+        is resumed from the last indexed page, and a new harvest without
+        ``-t``/``--from_date`` starts from the stored high-water mark.
+
+        :param filters: ListRecords arguments.
+        """
+        self.harvester = harvest.WindowedHarvester(
+            self.args.oai_url, windows=self.args.windows,
+            prefetch=self.args.prefetch, verify=False)
+
+        if self.state is not None and self.state.running:
+            print("Resuming harvest from {0}".format(self.state.path))
+            return self.harvester.harvest(self.state.windows, self.state.tokens)
+
+        from_date = self.from_date
+        if from_date is None and self.state is not None and self.state.high_water:
+            from_date = harvest.parse_datestamp(self.state.high_water)
+            print("Harvesting from high-water mark {0}".format(self.state.high_water))
+
+        windows = self.harvester.plan(filters, from_date=from_date, until_date=self.until_date)
+
+        if self.state is not None:
+            self.state.start(windows)
+
+        return self.harvester.harvest(windows)
+
     def run(self):
         """
         Run the process for update Pre-prints in Solr.
@@ -123,38 +375,80 @@ class UpdatePreprint(object):
 
             print("Indexing in {0}".format(self.solr.url))
 
-            sickle = Sickle(self.args.oai_url, verify=False)
-
             filters = {'metadataPrefix': 'oai_dc'}
 
-            if self.args.time:
-                filters['from'] = self.from_date.strftime("%Y-%m-%dT%H:%M:%SZ")
+            start = time.time()
+            indexed = 0
+            removed = 0
+            batch = []
+            deleted = []
+            records = []
+            tokens = {}
+            newest = None
 
             try:
-                records = sickle.ListRecords(**filters)
-            except NoRecordsMatch as e:
-                print(e)
-                sys.exit(0)
-            else:
-
-                for i, record in enumerate(records):
-                    try:
-                        xml = self.pipeline_to_xml(record.xml)
-                        print("Indexing record %s with oai id: %s" % (i, record.header.identifier))
-                        self.solr.update(xml, commit=True)
-                    except ValueError as e:
-                        print("ValueError: {0}".format(e))
-                        print(e)
-                        continue
-                    except Exception as e:
-                        print("Error: {0}".format(e))
-                        print(e)
-                        continue
+                for i, (window, token, record) in enumerate(self.harvest(filters)):
+                    if record.header.deleted:
+                        print("Removing record %s with oai id: %s" % (i, record.header.identifier))
+                        deleted.append(document_id(record.header.identifier))
+                    else:
+                        try:
+                            docs = self.pipeline_to_docs(record.xml)
+                            print("Indexing record %s with oai id: %s" % (i, record.header.identifier))
+                            batch.extend(docs)
+                        except Exception as e:
+                            self.failed(
+                                record.header.identifier, 'transform', e,
+                                record.header.datestamp)
+                            continue
+
+                    records.append((
+                        record.header.identifier, record.header.deleted,
+                        record.header.datestamp))
+                    tokens[window] = token
+                    if newest is None or record.header.datestamp > newest:
+                        newest = record.header.datestamp
+
+                    if len(batch) + len(deleted) >= self.writer.batch_size * self.writer.concurrency:
+                        added, dropped = self.flush(batch, deleted, tokens, newest, records)
+                        indexed += added
+                        removed += dropped
+                        batch = []
+                        deleted = []
+                        records = []
+                        tokens = {}
+                        newest = None
+
+                added, dropped = self.flush(batch, deleted, tokens, newest, records)
+                indexed += added
+                removed += dropped
+            finally:
+                # Stop the sender threads of the writer.
+                self.writer.close()
+
+            if self.state is not None:
+                if self.args.commit_within:
+                    # The updates are committed by Solr in background, the
+                    # high-water mark is saved only after an explicit commit.
+                    self.solr.commit()
+                self.state.complete()
+
+            duration = time.time() - start
+            print("Indexed {0} and removed {1} records in {2:.2f} seconds ({3:.2f} records/s).".format(
+                indexed, removed, duration, (indexed + removed) / duration if duration else 0))
+            print("Waited {0:.2f} seconds for the OAI server.".format(self.harvester.wait))
+            print(self.writer.report())
+
+            if self.spool is not None and self.spool.count:
+                print("Recorded {0} failed records in {1}".format(
+                    self.spool.count, self.spool.path))
 
         # optimize the index
         self.solr.commit()
         self.solr.optimize()
 
+        self.solr.log_stats(print)
+
 
 def main():
 
@@ -11,12 +11,19 @@ import textwrap
 import itertools
 from datetime import datetime, timedelta
 
-from lxml import etree as ET
-from SolrAPI import Solr
 import plumber
 from articlemeta.client import ThriftClient as ArticleMetaThriftClient
 from accessstats.client import ThriftClient as AccessThriftClient
 
+try:
+    from . import indicators
+    from . import writer
+    from .solrclient import connect
+except ImportError:
+    import indicators
+    import writer
+    from solrclient import connect
+
 logger = logging.getLogger(__name__)
 
 SOLR_URL = os.environ.get('SOLR_URL', 'http://127.0.0.1/solr')
@@ -66,31 +73,21 @@ class UpdateSearch(object):
     Process to get article in article meta and index in Solr.
     """
 
-    def __init__(self, collection=None, issn=None):
+    def __init__(self, collection=None, issn=None, dumps=None, batch_size=1000):
         self.collection = collection
         self.issn = issn
-        self.solr = Solr(SOLR_URL, timeout=10)
+        self.dumps = dumps
+        self.batch_size = batch_size
+        self.solr = connect(SOLR_URL)
+        self.writer = writer.open_writer(
+            self.solr, batch_size=batch_size, on_error=self.write_error)
 
     def set_accesses(self, document_id, accesses):
 
-        xml = ET.Element('add')
-
-        doc = ET.Element('doc')
-
-        identifier = ET.Element('field')
-        identifier.set('name', 'id')
-        identifier.text = document_id
-
-        total_accesses = ET.Element('field')
-        total_accesses.set('name', 'total_access')
-        total_accesses.text = str(accesses)
-        total_accesses.set('update', 'set')
-        doc.append(identifier)
-        doc.append(total_accesses)
+        return indicators.atomic_update_doc(document_id, 'total_access', accesses)
 
-        xml.append(doc)
-
-        return ET.tostring(xml, encoding="utf-8", method="xml")
+    def write_error(self, docs, exception):
+        logger.error("Error: {0}".format(exception))
 
     def run(self):
         """
@@ -114,6 +111,17 @@ class UpdateSearch(object):
         available_ids = set([i['id'] for i in json.loads(self.solr.select(
             {'q': query, 'fl': 'id', 'rows': 1000000}))['response']['docs']])
 
+        if self.dumps:
+            logger.info("Recording accesses from dumps for documents in {0}".format(self.solr.url))
+            indicators.load_dumps(
+                self.writer, self.dumps, 'total_access', available_ids)
+            self.writer.close()
+            logger.info(self.writer.report())
+            self.solr.commit()
+            self.solr.optimize()
+            self.solr.log_stats()
+            return
+
         logger.info("Recording accesses for documents in {0}".format(self.solr.url))
 
         for document in art_meta.documents(
@@ -133,26 +141,20 @@ class UpdateSearch(object):
                 document.collection_acronym
             ).get('access_total', {'value': 0})['value'])
 
-            xml = self.set_accesses(
+            self.writer.add(self.set_accesses(
                 solr_id,
                 total_accesses
-            )
+            ))
 
-            try:
-                result = self.solr.update(xml, commit=False)
-            except ValueError as e:
-                logger.error("ValueError: {0}".format(e))
-                logger.exception(e)
-                continue
-            except Exception as e:
-                logger.error("Error: {0}".format(e))
-                logger.exception(e)
-                continue
+        self.writer.close()
+        logger.info(self.writer.report())
 
         # optimize the index
         self.solr.commit()
         self.solr.optimize()
 
+        self.solr.log_stats()
+
 
 def main():
 
@@ -176,6 +178,21 @@ def main():
         help='journal issn.'
     )
 
+    parser.add_argument(
+        '-f', '--dump',
+        dest='dumps',
+        nargs='+',
+        default=None,
+        help='load accesses from CSV or JSONL dump files (optionally .gz) instead of the accesses server. Columns: pid, collection (optional) and total (optional, each row counts as one event when absent).'
+    )
+
+    parser.add_argument(
+        '-b', '--batch_size',
+        type=int,
+        default=1000,
+        help='initial number of documents per Solr update request, adjusted from the Solr response time.'
+    )
+
     parser.add_argument(
         '--logging_level',
         '-l',
@@ -194,7 +211,12 @@ def main():
     start = time.time()
 
     try:
-        us = UpdateSearch(collection=args.collection, issn=args.issn)
+        us = UpdateSearch(
+            collection=args.collection,
+            issn=args.issn,
+            dumps=args.dumps,
+            batch_size=args.batch_size
+        )
         us.run()
     except KeyboardInterrupt:
         logger.critical("Interrupt by user")
@@ -0,0 +1,243 @@
+# coding: utf-8
+import os
+import gzip
+import json
+import glob
+import threading
+
+from xylose.scielodocument import Article
+
+try:
+    from .readahead import read_ahead, READ_AHEAD
+    from .listing import lists_identifiers
+except ImportError:
+    from readahead import read_ahead, READ_AHEAD
+    from listing import lists_identifiers
+
+ARTICLEMETA_CACHE_SIZE = int(os.environ.get('ARTICLEMETA_CACHE_SIZE', 2048))
+
+# Fraction of the maximum size kept after an eviction, so the cache is not
+# scanned again at every new document.
+EVICTION_TARGET = 0.9
+
+SUFFIX = '.json.gz'
+
+
+class DocumentCache(object):
+    """
+    On disk cache of the ArticleMeta documents, gzip compressed JSON keyed
+    by collection, pid and processing date.
+
+    A document reprocessed in ArticleMeta gets a new processing date, so a
+    cached document is never stale: the older versions of the document are
+    removed when the new one is stored.
+
+    When the files exceed ``max_size`` megabytes the least recently used
+    ones are removed.
+
+    :param directory: cache directory, created when missing.
+    :param max_size: maximum size in megabytes.
+    """
+
+    def __init__(self, directory, max_size=ARTICLEMETA_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.size = sum(size for path, mtime, size in self._files())
+
+    def _files(self):
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(SUFFIX):
+                    continue
+
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                yield path, stat.st_mtime, stat.st_size
+
+    def path(self, collection, code, processing_date):
+        # Grouped by journal, the ISSN is part of the pid.
+        return os.path.join(
+            self.directory, collection, code[1:10],
+            '{0}-{1}{2}'.format(code, processing_date, SUFFIX))
+
+    def get(self, collection, code, processing_date):
+        """
+        Return the cached xylose Article, or None.
+        """
+        path = self.path(collection, code, processing_date)
+
+        try:
+            with gzip.open(path, 'rb') as f:
+                data = json.loads(f.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # The modification time tracks the last use for the eviction.
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+
+        return Article(data)
+
+    def put(self, article, processing_date=None):
+        """
+        Store a xylose Article, replacing its older versions.
+
+        :param processing_date: key of the document, default the processing
+                                date of the article.
+        """
+        collection = article.collection_acronym
+        code = article.publisher_id
+        processing_date = processing_date or article.processing_date
+        path = self.path(collection, code, processing_date)
+
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        tmp = '{0}.{1}.tmp'.format(path, threading.current_thread().ident)
+        with gzip.open(tmp, 'wb') as f:
+            f.write(json.dumps(article.data).encode('utf-8'))
+        os.replace(tmp, path)
+
+        removed = 0
+        for old in glob.glob(os.path.join(directory, glob.escape(code) + '-*' + SUFFIX)):
+            if old != path:
+                removed += self._remove(old)
+
+        with self._lock:
+            self.size += os.path.getsize(path) - removed
+            full = self.size > self.max_size
+
+        if full:
+            self.evict()
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return 0
+
+        return size
+
+    def evict(self):
+        """
+        Remove the least recently used documents until the cache is under
+        ``EVICTION_TARGET`` of its maximum size.
+        """
+        files = sorted(self._files(), key=lambda f: f[1])
+        size = sum(f[2] for f in files)
+        target = self.max_size * EVICTION_TARGET
+
+        for path, mtime, file_size in files:
+            if size <= target:
+                break
+            size -= self._remove(path)
+            self.evicted += 1
+
+        with self._lock:
+            self.size = size
+
+    def report(self):
+        return (
+            'ArticleMeta cache: {0} hits, {1} misses, {2} evicted, '
+            '{3:.1f} MB'.format(
+                self.hits, self.misses, self.evicted,
+                self.size / 1024.0 / 1024.0))
+
+
+class CachedClient(object):
+    """
+    ArticleMeta client reading the documents from a ``DocumentCache`` before
+    requesting them.
+
+    ``documents`` lists the identifiers, with their processing dates, and
+    requests only the documents missing in the cache. Clients that cannot
+    list identifiers, as the REST client, list the full documents, which
+    are only stored in the cache.
+
+    :param client: ArticleMeta client.
+    :param cache: DocumentCache instance.
+    :param read_ahead: number of identifiers listed ahead, 0 disables it.
+    """
+
+    def __init__(self, client, cache, read_ahead=READ_AHEAD):
+        self.client = client
+        self.cache = cache
+        self.read_ahead = read_ahead
+
+    @property
+    def lists_identifiers(self):
+        return lists_identifiers(self.client)
+
+    def document(self, code, collection, processing_date=None):
+        """
+        :param processing_date: processing date of the document listed in
+                                ArticleMeta, without it the cache is only
+                                updated.
+        """
+        if processing_date:
+            article = self.cache.get(collection, code, processing_date)
+            if article is not None:
+                return article
+
+        article = self.client.document(code=code, collection=collection)
+
+        if article:
+            self.cache.put(article, processing_date)
+
+        return article
+
+    def documents(self, collection=None, issn=None, from_date=None,
+                  until_date=None, only_identifiers=False):
+        if not only_identifiers and not self.lists_identifiers:
+            for article in self.client.documents(
+                collection=collection,
+                issn=issn,
+                from_date=from_date,
+                until_date=until_date
+            ):
+                if article:
+                    self.cache.put(article)
+                    yield article
+            return
+
+        identifiers = self.client.documents(
+            collection=collection,
+            issn=issn,
+            from_date=from_date,
+            until_date=until_date,
+            only_identifiers=True
+        )
+
+        if only_identifiers:
+            for identifier in identifiers:
+                yield identifier
+            return
+
+        for identifier in read_ahead(identifiers, self.read_ahead):
+            article = self.document(
+                identifier.code, identifier.collection,
+                processing_date=identifier.processing_date)
+
+            if article:
+                yield article
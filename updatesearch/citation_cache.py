@@ -0,0 +1,169 @@
+# coding: utf-8
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+
+# Maximum age of a cached value according to the age of the document in
+# years: (max document age, max cache age in seconds). Older documents
+# fall in the last entry.
+REFRESH_POLICY = (
+    (1, 1 * DAY),
+    (3, 7 * DAY),
+    (10, 30 * DAY),
+    (None, 90 * DAY),
+)
+
+# Documents with at least this number of received citations are refreshed
+# twice as often as the policy above.
+FREQUENTLY_CITED = 20
+
+
+def publication_year(date):
+    """
+    Extract the year of a ISO like date ``YYYY[-MM[-DD]]``.
+
+    :param date: str date or None.
+
+    :returns: int or None
+    """
+    try:
+        return int((date or '')[:4])
+    except ValueError:
+        return None
+
+
+def max_age(year, total, now=None):
+    """
+    Return the maximum age in seconds of a cached citation count.
+
+    :param year: publication year of the document or None when unknown.
+    :param total: cached number of received citations.
+    :param now: timestamp used as reference, default ``time.time()``.
+    """
+    now = now or time.time()
+
+    age = 0
+    if year:
+        age = max(time.gmtime(now).tm_year - year, 0)
+
+    for limit, seconds in REFRESH_POLICY:
+        if limit is None or age <= limit:
+            break
+
+    if total >= FREQUENTLY_CITED:
+        seconds = seconds / 2
+
+    return seconds
+
+
+class CitationCache(object):
+    """
+    Local SQLite cache of received citations keyed by PID.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS citations ('
+            'pid TEXT PRIMARY KEY, '
+            'total INTEGER NOT NULL, '
+            'year INTEGER, '
+            'fetched_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pid, now=None):
+        """
+        Return the cached total of received citations for the PID when it is
+        still fresh according to the refresh policy, otherwise None.
+
+        :param pid: document PID.
+        :param now: timestamp used as reference, default ``time.time()``.
+        """
+        now = now or time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT total, year, fetched_at FROM citations WHERE pid = ?',
+                (pid,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        total, year, fetched_at = row
+
+        if now - fetched_at > max_age(year, total, now):
+            return None
+
+        return total
+
+    def set(self, pid, total, year=None, now=None):
+        """
+        Store the total of received citations of a PID.
+
+        :param pid: document PID.
+        :param total: number of received citations.
+        :param year: publication year of the document.
+        :param now: fetch timestamp, default ``time.time()``.
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO citations (pid, total, year, fetched_at) '
+                'VALUES (?, ?, ?, ?)',
+                (pid, int(total), year, now or time.time())
+            )
+            self._conn.commit()
+
+    def total_received(self, pid, fetch, publication_date=None):
+        """
+        Return the total of received citations of a PID, calling ``fetch`` only
+        when the cached value is missing or stale.
+
+        :param pid: document PID.
+        :param fetch: callable receiving the PID and returning the total.
+        :param publication_date: publication date of the document, used by
+                                 the refresh policy.
+        """
+        total = self.get(pid)
+
+        if total is not None:
+            self.hits += 1
+            return total
+
+        self.misses += 1
+        total = fetch(pid)
+        self.set(pid, total, publication_year(publication_date))
+
+        return total
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_cache(path=None):
+    """
+    Open the citation cache at ``path`` or at the ``CITATION_CACHE``
+    environment variable. Returns None when no path is configured.
+    """
+    path = path or os.environ.get('CITATION_CACHE', None)
+
+    if not path:
+        return None
+
+    logger.info("Using citation cache %s", path)
+
+    return CitationCache(path)
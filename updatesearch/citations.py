@@ -11,12 +11,21 @@ import textwrap
 import itertools
 from datetime import datetime, timedelta
 
-from lxml import etree as ET
-from SolrAPI import Solr
 import plumber
 from articlemeta.client import ThriftClient as ArticleMetaThriftClient
 from citedby.client import ThriftClient as CitedbyThriftClient
 
+try:
+    from . import indicators
+    from . import citation_cache
+    from . import writer
+    from .solrclient import connect
+except ImportError:
+    import indicators
+    import citation_cache
+    import writer
+    from solrclient import connect
+
 logger = logging.getLogger(__name__)
 
 SOLR_URL = os.environ.get('SOLR_URL', 'http://127.0.0.1/solr')
@@ -66,31 +75,23 @@ class UpdateSearch(object):
     Process to get article in article meta and index in Solr.
     """
 
-    def __init__(self, collection=None, issn=None):
+    def __init__(self, collection=None, issn=None, dumps=None, batch_size=1000,
+                 cache=None):
         self.collection = collection
         self.issn = issn
-        self.solr = Solr(SOLR_URL, timeout=10)
+        self.dumps = dumps
+        self.batch_size = batch_size
+        self.cache = citation_cache.open_cache(cache)
+        self.solr = connect(SOLR_URL)
+        self.writer = writer.open_writer(
+            self.solr, batch_size=batch_size, on_error=self.write_error)
 
     def set_citations(self, document_id, citations):
 
-        xml = ET.Element('add')
-
-        doc = ET.Element('doc')
-
-        identifier = ET.Element('field')
-        identifier.set('name', 'id')
-        identifier.text = document_id
-
-        total_citations = ET.Element('field')
-        total_citations.set('name', 'total_received')
-        total_citations.text = str(citations)
-        total_citations.set('update', 'set')
-        doc.append(identifier)
-        doc.append(total_citations)
+        return indicators.atomic_update_doc(document_id, 'total_received', citations)
 
-        xml.append(doc)
-
-        return ET.tostring(xml, encoding="utf-8", method="xml")
+    def write_error(self, docs, exception):
+        logger.error("Error: {0}".format(exception))
 
     def run(self):
         """
@@ -100,6 +101,11 @@ class UpdateSearch(object):
         art_meta = ArticleMetaThriftClient()
         art_citations = CitedbyThriftClient(domain="citedby.scielo.org:11610")
 
+        def fetch_total_received(pid):
+            result = art_citations.citedby_pid(pid, metaonly=True)
+
+            return result.get('article', {'total_received': 0})['total_received']
+
         logger.info("Loading Solr available document ids")
         itens_query = []
 
@@ -114,6 +120,17 @@ class UpdateSearch(object):
         available_ids = set([i['id'] for i in json.loads(self.solr.select(
             {'q': query, 'fl': 'id', 'rows': 1000000}))['response']['docs']])
 
+        if self.dumps:
+            logger.info("Recording citations from dumps for documents in {0}".format(self.solr.url))
+            indicators.load_dumps(
+                self.writer, self.dumps, 'total_received', available_ids)
+            self.writer.close()
+            logger.info(self.writer.report())
+            self.solr.commit()
+            self.solr.optimize()
+            self.solr.log_stats()
+            return
+
         logger.info("Recording citations for documents in {0}".format(self.solr.url))
 
         for document in art_meta.documents(
@@ -128,31 +145,35 @@ class UpdateSearch(object):
 
             logger.debug("Loading citations for document %s" % solr_id)
 
-            result = art_citations.citedby_pid(document.publisher_id, metaonly=True)
-
-            total_citations = result.get(
-                'article', {'total_received': 0})['total_received']
+            if self.cache is not None:
+                total_citations = self.cache.total_received(
+                    document.publisher_id,
+                    fetch_total_received,
+                    publication_date=document.publication_date
+                )
+            else:
+                total_citations = fetch_total_received(document.publisher_id)
 
-            xml = self.set_citations(
+            self.writer.add(self.set_citations(
                 solr_id,
                 total_citations
-            )
+            ))
 
-            try:
-                result = self.solr.update(xml, commit=False)
-            except ValueError as e:
-                logger.error("ValueError: {0}".format(e))
-                logger.exception(e)
-                continue
-            except Exception as e:
-                logger.error("Error: {0}".format(e))
-                logger.exception(e)
-                continue
+        self.writer.close()
+        logger.info(self.writer.report())
+
+        if self.cache is not None:
+            logger.info(
+                "Citation cache hits: %d, misses: %d",
+                self.cache.hits, self.cache.misses
+            )
 
         # optimize the index
         self.solr.commit()
         self.solr.optimize()
 
+        self.solr.log_stats()
+
 
 def main():
 
@@ -176,6 +197,27 @@ def main():
         help='journal issn.'
     )
 
+    parser.add_argument(
+        '-f', '--dump',
+        dest='dumps',
+        nargs='+',
+        default=None,
+        help='load citations from CSV or JSONL dump files (optionally .gz) instead of the citedby server. Columns: pid, collection (optional) and total (optional, each row counts as one event when absent).'
+    )
+
+    parser.add_argument(
+        '-b', '--batch_size',
+        type=int,
+        default=1000,
+        help='initial number of documents per Solr update request, adjusted from the Solr response time.'
+    )
+
+    parser.add_argument(
+        '--cache',
+        default=None,
+        help='path to the local citation cache (SQLite), default from the environment variable ``CITATION_CACHE``. Cached totals are refreshed according to the document age and number of citations.'
+    )
+
     parser.add_argument(
         '--logging_level',
         '-l',
@@ -194,7 +236,13 @@ def main():
     start = time.time()
 
     try:
-        us = UpdateSearch(collection=args.collection, issn=args.issn)
+        us = UpdateSearch(
+            collection=args.collection,
+            issn=args.issn,
+            dumps=args.dumps,
+            batch_size=args.batch_size,
+            cache=args.cache
+        )
         us.run()
     except KeyboardInterrupt:
         logger.critical("Interrupt by user")
@@ -0,0 +1,88 @@
+# coding: utf-8
+import gzip
+import json
+import threading
+
+from xylose.scielodocument import Article
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+_DONE = object()
+
+
+def read_dump(path):
+    """
+    Read the ArticleMeta documents of a JSONL dump, one raw document by line,
+    gzip compressed when the file name ends with ``.gz``.
+
+    Invalid lines are reported and skipped.
+
+    :returns: generator of xylose.scielodocument.Article
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                yield Article(json.loads(line))
+            except ValueError as e:
+                print("Error: {0}:{1}: {2}".format(path, number, e))
+
+
+def read_dumps(paths, readers=4, queue_size=1000):
+    """
+    Read several dumps in parallel, ``readers`` files at a time, merged in a
+    single stream in no particular order.
+
+    :param paths: dump files.
+    :param readers: number of files read concurrently.
+    :param queue_size: maximum number of documents read ahead.
+    """
+    documents = queue.Queue(maxsize=queue_size)
+    files = queue.Queue()
+    errors = []
+
+    for path in paths:
+        files.put(path)
+
+    def reader():
+        try:
+            while True:
+                try:
+                    path = files.get_nowait()
+                except queue.Empty:
+                    break
+
+                print("Reading dump {0}".format(path))
+                for article in read_dump(path):
+                    documents.put(article)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            documents.put(_DONE)
+
+    threads = [threading.Thread(target=reader)
+               for _ in range(max(1, min(readers, len(paths))))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    running = len(threads)
+    while running:
+        article = documents.get()
+
+        if article is _DONE:
+            running -= 1
+            continue
+
+        yield article
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,205 @@
+# coding: utf-8
+import logging
+import threading
+import multiprocessing
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+REPORT_INTERVAL = 30
+
+_DONE = object()
+
+
+class Engine(object):
+    """
+    Staged indexing engine.
+
+    Items are read by a fetch thread, transformed by ``transformers``
+    workers and written by ``writers`` threads. The stages are connected by
+    queues bounded to ``queue_size`` items, so when the writers slow down
+    the queues fill up and the fetch thread blocks instead of reading ahead
+    without limit.
+
+    Transformations run in threads or, with ``processes``, in a pool of
+    processes. In that case ``transform`` must be a module level function
+    and the items must be picklable.
+
+    Failed transformations and writes are passed to ``on_error(item, stage,
+    exception)`` and the engine moves on, errors of ``on_error`` itself are
+    logged. Errors reading the items stop the engine and are raised by
+    ``run``.
+
+    The depth of each queue is reported every ``report_interval`` seconds;
+    a full queue points to the stage after it as the bottleneck.
+
+    :param transform: function(item) returning the data to write, items
+                      transformed to None are skipped.
+    :param write: function(data) writing to Solr.
+    """
+
+    def __init__(self, transform, write, transformers=2, writers=4,
+                 queue_size=QUEUE_SIZE, processes=False,
+                 report_interval=REPORT_INTERVAL, on_error=None, log=None):
+        self.transform = transform
+        self.write = write
+        self.transformers = max(transformers, 1)
+        self.writers = max(writers, 1)
+        self.queue_size = queue_size
+        self.processes = processes
+        self.report_interval = report_interval
+        self.on_error = on_error or self._log_error
+        self.log = log or logger.info
+
+        self._lock = threading.Lock()
+        self.counters = {
+            'fetched': 0, 'transformed': 0, 'written': 0, 'errors': 0}
+
+    def _log_error(self, item, stage, exception):
+        self.log("Error on {0}: {1}".format(stage, exception))
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _error(self, item, stage, exception):
+        self._count('errors')
+
+        # A failing handler must not stop the stage thread.
+        try:
+            self.on_error(item, stage, exception)
+        except Exception as e:
+            self._log_error(item, stage, exception)
+            self.log("Error handling the {0} error: {1}".format(stage, e))
+
+    def _fetch(self, items, fetched, failure):
+        try:
+            for item in items:
+                fetched.put(item)
+                self._count('fetched')
+        except Exception as e:
+            failure.append(e)
+        finally:
+            for _ in range(self.transformers):
+                fetched.put(_DONE)
+
+    def _transform(self, fetched, transformed, pool, running):
+        try:
+            while True:
+                item = fetched.get()
+                if item is _DONE:
+                    break
+
+                try:
+                    if pool is not None:
+                        data = pool.apply(self.transform, (item,))
+                    else:
+                        data = self.transform(item)
+                except Exception as e:
+                    self._error(item, 'transform', e)
+                    continue
+
+                if data is None:
+                    continue
+
+                transformed.put((item, data))
+                self._count('transformed')
+        finally:
+            # The writers stop after the last transformer, even a failed one.
+            with self._lock:
+                running[0] -= 1
+                last = running[0] == 0
+
+            if last:
+                for _ in range(self.writers):
+                    transformed.put(_DONE)
+
+    def _write(self, transformed):
+        while True:
+            item = transformed.get()
+            if item is _DONE:
+                break
+
+            item, data = item
+            try:
+                self.write(data)
+            except Exception as e:
+                self._error(item, 'write', e)
+                continue
+
+            self._count('written')
+
+    def report(self, fetched=None, transformed=None):
+        """
+        Log the stage counters and, while running, the queue depths.
+        """
+        line = ', '.join(
+            '{0}: {1}'.format(k, self.counters[k])
+            for k in ('fetched', 'transformed', 'written', 'errors'))
+
+        if fetched is not None:
+            line += '; queues fetch->transform: {0}/{2}, transform->write: {1}/{2}'.format(
+                fetched.qsize(), transformed.qsize(), self.queue_size)
+
+        self.log(line)
+
+    def _report(self, fetched, transformed, stop):
+        while not stop.wait(self.report_interval):
+            self.report(fetched, transformed)
+
+    def _start(self, target, *args):
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def run(self, items):
+        """
+        Process all the items and wait for the writes to finish.
+
+        :param items: iterable of items to index.
+
+        :returns: dict with the number of items fetched, transformed,
+                  written and the errors.
+        """
+        fetched = queue.Queue(maxsize=self.queue_size)
+        transformed = queue.Queue(maxsize=self.queue_size)
+        failure = []
+        running = [self.transformers]
+        stop = threading.Event()
+
+        pool = None
+        if self.processes:
+            # spawn, forking a process with running threads is not safe.
+            pool = multiprocessing.get_context('spawn').Pool(self.transformers)
+
+        try:
+            threads = [self._start(self._fetch, items, fetched, failure)]
+            threads += [
+                self._start(self._transform, fetched, transformed, pool, running)
+                for _ in range(self.transformers)]
+            threads += [
+                self._start(self._write, transformed)
+                for _ in range(self.writers)]
+            reporter = self._start(self._report, fetched, transformed, stop)
+
+            for thread in threads:
+                thread.join()
+        finally:
+            stop.set()
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        reporter.join()
+        self.report()
+
+        if failure:
+            raise failure[0]
+
+        return dict(self.counters)
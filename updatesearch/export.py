@@ -0,0 +1,165 @@
+# coding: utf-8
+import os
+import gzip
+import json
+import threading
+from datetime import datetime
+
+from lxml import etree as ET
+
+try:
+    from .writer import serialize
+except ImportError:
+    from writer import serialize
+
+MANIFEST = 'manifest.json'
+FORMATS = ('xml', 'json')
+SHARD_SIZE = 1000
+
+
+def doc_to_json(doc):
+    """
+    Convert a Solr XML ``<doc>`` to a Solr JSON document.
+
+    Repeated fields become lists and atomic updates (``update="set"``)
+    become ``{"set": value}``.
+
+    :param doc: ``<doc>`` element or its serialization.
+    """
+    if isinstance(doc, bytes):
+        doc = ET.fromstring(doc)
+
+    result = {}
+    modifiers = {}
+    for field in doc.iter('field'):
+        name = field.get('name')
+        value = field.text or ''
+
+        if field.get('update'):
+            modifiers[name] = field.get('update')
+
+        if name in result:
+            if not isinstance(result[name], list):
+                result[name] = [result[name]]
+            result[name].append(value)
+        else:
+            result[name] = value
+
+    for name, modifier in modifiers.items():
+        result[name] = {modifier: result[name]}
+
+    return result
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    tmp = path + '.tmp'
+
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+class ExportWriter(object):
+    """
+    Write the ``<doc>`` elements to update files instead of sending them to
+    Solr, with the same interface as ``SolrWriter``.
+
+    Every ``shard_size`` documents are written to a new file in
+    ``directory``, as a Solr XML ``<add>`` or a Solr JSON list, optionally
+    gzip compressed. ``close`` writes the ``manifest.json`` with the format
+    and the list of files, used by ``update_search_load``.
+
+    :param directory: destination directory, created when missing.
+    :param fmt: ``xml`` or ``json``.
+    :param shard_size: number of documents by file.
+    :param compress: gzip the files.
+    :param prefix: prefix of the file names.
+    """
+
+    def __init__(self, directory, fmt='xml', shard_size=SHARD_SIZE,
+                 compress=False, prefix='shard'):
+        if fmt not in FORMATS:
+            raise ValueError('Invalid export format: %s' % fmt)
+
+        self.directory = directory
+        self.fmt = fmt
+        self.batch_size = max(shard_size, 1)
+        self.concurrency = 1
+        self.compress = compress
+        self.prefix = prefix
+        self.shards = []
+        self.documents = 0
+        self.errors = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def add(self, doc):
+        doc = serialize(doc)
+
+        with self._lock:
+            self._buffer.append(doc)
+            if len(self._buffer) >= self.batch_size:
+                self._write()
+
+    def payload(self, docs):
+        if self.fmt == 'json':
+            return json.dumps(
+                [doc_to_json(doc) for doc in docs], ensure_ascii=False
+            ).encode('utf-8')
+
+        return b'<add>' + b''.join(docs) + b'</add>'
+
+    def _write(self):
+        docs, self._buffer = self._buffer, []
+
+        if not docs:
+            return
+
+        name = '{0}-{1:05d}.{2}'.format(self.prefix, len(self.shards) + 1, self.fmt)
+        if self.compress:
+            name += '.gz'
+
+        data = self.payload(docs)
+        path = os.path.join(self.directory, name)
+
+        opener = gzip.open if self.compress else open
+        with opener(path, 'wb') as f:
+            f.write(data)
+
+        self.shards.append({
+            'file': name,
+            'documents': len(docs),
+            'bytes': os.path.getsize(path),
+        })
+        self.documents += len(docs)
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def close(self):
+        """
+        Write the pending documents and the manifest.
+        """
+        self.flush()
+
+        write_manifest(self.directory, {
+            'format': self.fmt,
+            'compression': 'gzip' if self.compress else None,
+            'created': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S'),
+            'documents': self.documents,
+            'shards': self.shards,
+        })
+
+    def report(self):
+        return 'Exported {0} documents in {1} files to {2}'.format(
+            self.documents, len(self.shards), self.directory)
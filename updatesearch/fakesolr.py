@@ -0,0 +1,568 @@
+#!/usr/bin/python
+# coding: utf-8
+import json
+import time
+import gzip
+import base64
+import random
+import fnmatch
+import argparse
+import textwrap
+import functools
+import threading
+
+from lxml import etree as ET
+
+try:
+    from socketserver import ThreadingMixIn
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from SocketServer import ThreadingMixIn
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from urlparse import urlparse, parse_qs
+
+try:
+    from .export import doc_to_json
+except ImportError:
+    from export import doc_to_json
+
+
+class BadRequest(Exception):
+    pass
+
+
+def parse_query(query):
+    """
+    Parse the subset of the Lucene syntax used by the indexers: ``*:*`` and
+    ``field:value`` clauses joined by ``AND``, values may be quoted or use
+    ``*`` wildcards.
+
+    :returns: list of (field, value), empty for ``*:*``.
+    """
+    clauses = []
+
+    for clause in query.split(' AND '):
+        clause = clause.strip()
+        if clause in ('', '*:*'):
+            continue
+
+        if ':' not in clause:
+            raise BadRequest('Unsupported query: %s' % query)
+
+        field, value = clause.split(':', 1)
+        clauses.append((field.strip(), value.strip().strip('"')))
+
+    return clauses
+
+
+def values(doc, field):
+    value = doc.get(field)
+    if value is None:
+        return []
+
+    return value if isinstance(value, list) else [value]
+
+
+def matches(doc, clauses):
+    for field, pattern in clauses:
+        if not any(fnmatch.fnmatchcase(str(v), pattern) for v in values(doc, field)):
+            return False
+
+    return True
+
+
+def compare(sort, a, b):
+    """
+    Compare two documents by the ``sort`` list of (field, descending),
+    missing values sort last.
+    """
+    for field, descending in sort:
+        x, y = a.get(field), b.get(field)
+        if x == y:
+            continue
+        if x is None:
+            return 1
+        if y is None:
+            return -1
+
+        result = -1 if x < y else 1
+        return -result if descending else result
+
+    return 0
+
+
+def parse_sort(sort):
+    result = []
+    for item in sort.split(','):
+        parts = item.split()
+        if not parts:
+            continue
+        descending = len(parts) > 1 and parts[1].lower() == 'desc'
+        result.append((parts[0], descending))
+
+    return result
+
+
+def encode_cursor(doc, sort):
+    mark = json.dumps([doc.get(field) for field, descending in sort])
+    return base64.urlsafe_b64encode(mark.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(mark, sort):
+    try:
+        mark = json.loads(base64.urlsafe_b64decode(mark.encode('ascii')).decode('utf-8'))
+    except ValueError:
+        raise BadRequest('Invalid cursorMark: %s' % mark)
+
+    return dict((field, value) for (field, descending), value in zip(sort, mark))
+
+
+class Core(object):
+    """
+    In memory Solr core.
+
+    Updates change the pending documents, queries see the documents of the
+    last commit, as in Solr.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.committed = {}
+        self.commits = 0
+        self.optimizes = 0
+        self.added = 0
+        self.deleted = 0
+        self._lock = threading.Lock()
+
+    def add(self, doc):
+        with self._lock:
+            self.added += 1
+
+            modifiers = dict(
+                (f, v) for f, v in doc.items() if isinstance(v, dict))
+
+            if not modifiers:
+                self.pending[doc['id']] = doc
+                return
+
+            current = dict(self.pending.get(doc['id'], {'id': doc['id']}))
+
+            for field, value in doc.items():
+                if field not in modifiers:
+                    current[field] = value
+                    continue
+
+                for modifier, operand in value.items():
+                    if modifier == 'set':
+                        if operand is None:
+                            current.pop(field, None)
+                        else:
+                            current[field] = operand
+                    elif modifier == 'add':
+                        operand = operand if isinstance(operand, list) else [operand]
+                        current[field] = values(current, field) + operand
+                    elif modifier == 'inc':
+                        number = float(current.get(field, 0)) + float(operand)
+                        current[field] = int(number) if number.is_integer() else number
+                    else:
+                        raise BadRequest('Unsupported atomic update: %s' % modifier)
+
+            self.pending[doc['id']] = current
+
+    def delete_id(self, document_id):
+        with self._lock:
+            if self.pending.pop(document_id, None) is not None:
+                self.deleted += 1
+
+    def delete_query(self, query):
+        clauses = parse_query(query)
+
+        with self._lock:
+            for document_id, doc in list(self.pending.items()):
+                if matches(doc, clauses):
+                    del self.pending[document_id]
+                    self.deleted += 1
+
+    def commit(self):
+        with self._lock:
+            self.committed = dict(self.pending)
+            self.commits += 1
+
+    def optimize(self):
+        self.commit()
+        self.optimizes += 1
+
+    def select(self, params):
+        """
+        Answer a query, ``q``, ``fq``, ``fl``, ``start``, ``rows``, ``sort``
+        and ``cursorMark`` are supported.
+        """
+        clauses = parse_query(params.get('q', ['*:*'])[0])
+        for fq in params.get('fq', []):
+            clauses.extend(parse_query(fq))
+
+        start = int(params.get('start', [0])[0])
+        rows = int(params.get('rows', [10])[0])
+        sort = parse_sort(params.get('sort', [''])[0])
+        cursor = params.get('cursorMark', [None])[0]
+
+        with self._lock:
+            docs = [doc for doc in self.committed.values() if matches(doc, clauses)]
+
+        if sort:
+            docs.sort(key=functools.cmp_to_key(functools.partial(compare, sort)))
+
+        result = {'responseHeader': {'status': 0, 'QTime': 0}}
+
+        if cursor is not None:
+            if start:
+                raise BadRequest('Cursor functionality does not work with start')
+            if 'id' not in [field for field, descending in sort]:
+                raise BadRequest('Cursor functionality requires a sort containing the id')
+
+            page = docs
+            if cursor != '*':
+                mark = decode_cursor(cursor, sort)
+                page = [doc for doc in docs if compare(sort, doc, mark) > 0]
+            page = page[:rows]
+
+            result['nextCursorMark'] = (
+                encode_cursor(page[-1], sort) if page else cursor)
+        else:
+            page = docs[start:start + rows]
+
+        fl = params.get('fl', ['*'])[0]
+        fields = [f.strip() for f in fl.split(',') if f.strip()]
+        if '*' not in fields:
+            page = [dict((f, doc[f]) for f in fields if f in doc) for doc in page]
+
+        result['response'] = {'numFound': len(docs), 'start': start, 'docs': page}
+
+        return result
+
+    def xml_update(self, body):
+        root = ET.fromstring(body)
+        commands = [root] if root.tag != 'update' else list(root)
+
+        for command in commands:
+            if command.tag == 'add':
+                for doc in command.iter('doc'):
+                    self.add(doc_to_json(doc))
+                if command.get('commitWithin'):
+                    self.commit()
+            elif command.tag == 'delete':
+                for element in command:
+                    if element.tag == 'id':
+                        self.delete_id(element.text)
+                    elif element.tag == 'query':
+                        self.delete_query(element.text)
+            elif command.tag == 'commit':
+                self.commit()
+            elif command.tag == 'optimize':
+                self.optimize()
+            else:
+                raise BadRequest('Unknown update command: %s' % command.tag)
+
+    def json_update(self, body):
+        data = json.loads(body)
+
+        if isinstance(data, list):
+            for doc in data:
+                self.add(doc)
+            return
+
+        for command, value in data.items():
+            if command == 'add':
+                self.add(value['doc'] if 'doc' in value else value)
+            elif command == 'delete':
+                for item in (value if isinstance(value, list) else [value]):
+                    if isinstance(item, dict) and 'query' in item:
+                        self.delete_query(item['query'])
+                    else:
+                        self.delete_id(item['id'] if isinstance(item, dict) else item)
+            elif command == 'commit':
+                self.commit()
+            elif command == 'optimize':
+                self.optimize()
+            else:
+                raise BadRequest('Unknown update command: %s' % command)
+
+
+class FakeSolr(object):
+    """
+    Local stand-in for Solr, an HTTP server with in memory cores, used to
+    benchmark and test the indexers without a real Solr.
+
+    Every path ending with ``/select``, ``/update`` or ``/update/json`` is
+    served, the path before it names the core, so
+    ``http://127.0.0.1:8983/solr/articles`` and
+    ``http://127.0.0.1:8983/solr/mirror`` are two cores of the same server.
+
+    :param latency: seconds added to every request.
+    :param document_latency: seconds added by document in the updates.
+    :param error_rate: fraction of the requests answered with
+                       ``error_status``.
+    :param seed: seed of the error injection.
+    :param reject_gzip: read the compressed bodies without inflating them,
+                        the updates fail with a 400 as in a Solr without
+                        request inflation.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, document_latency=0,
+                 error_rate=0, error_status=503, seed=None, reject_gzip=False):
+        self.latency = latency
+        self.document_latency = document_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reject_gzip = reject_gzip
+        self.requests = {}
+        self.errors = 0
+        self.cores = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = FakeSolrServer((host, port), FakeSolrHandler)
+        self.server.solr = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%d/solr' % (host, port)
+
+    def core(self, name='solr'):
+        with self._lock:
+            return self.cores.setdefault(name, Core())
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def count(self, handler):
+        with self._lock:
+            self.requests[handler] = self.requests.get(handler, 0) + 1
+
+    def fail(self):
+        """
+        Whether the current request gets an injected error.
+        """
+        if not self.error_rate:
+            return False
+
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+
+        return failed
+
+    def report(self):
+        lines = ['{0} requests: {1}'.format(handler, n)
+                 for handler, n in sorted(self.requests.items())]
+        lines.append('injected errors: {0}'.format(self.errors))
+
+        for name, core in sorted(self.cores.items()):
+            lines.append(
+                '{0}: {1} documents, {2} added, {3} deleted, {4} commits, '
+                '{5} optimizes'.format(
+                    name, len(core.committed), core.added, core.deleted,
+                    core.commits, core.optimizes))
+
+        return lines
+
+
+class FakeSolrServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSolrHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            body = b''.join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        if self.headers.get('Content-Encoding', '').lower() == 'gzip' \
+                and not self.server.solr.reject_gzip:
+            body = gzip.decompress(body)
+
+        return body
+
+    def respond(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, body=None):
+        solr = self.server.solr
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        for handler in ('/select', '/update/json', '/update'):
+            if url.path.endswith(handler):
+                name = url.path[:-len(handler)].strip('/') or 'solr'
+                break
+        else:
+            self.respond(404, {'error': {'msg': 'Not found: %s' % url.path, 'code': 404}})
+            return
+
+        solr.count(handler)
+        core = solr.core(name)
+
+        if solr.latency:
+            time.sleep(solr.latency)
+
+        if solr.fail():
+            self.respond(solr.error_status, {'error': {
+                'msg': 'Injected error', 'code': solr.error_status}})
+            return
+
+        try:
+            if handler == '/select':
+                self.respond(200, core.select(params))
+                return
+
+            if body:
+                content_type = self.headers.get('Content-Type', '')
+                added = core.added
+                if 'json' in content_type or handler == '/update/json':
+                    core.json_update(body)
+                else:
+                    core.xml_update(body)
+
+                if solr.document_latency:
+                    time.sleep(solr.document_latency * (core.added - added))
+
+            if params.get('commit', ['false'])[0] == 'true' or 'commitWithin' in params:
+                core.commit()
+            if params.get('optimize', ['false'])[0] == 'true':
+                core.optimize()
+        except (BadRequest, ValueError, ET.XMLSyntaxError, KeyError) as e:
+            self.respond(400, {'error': {'msg': str(e), 'code': 400}})
+            return
+
+        self.respond(200, {'responseHeader': {'status': 0, 'QTime': 0}})
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request(self.read_body())
+
+
+def main():
+
+    usage = """\
+    Local fake Solr server to benchmark and test the indexers.
+
+    Serves /select and /update (XML and JSON) from in memory cores, named by
+    the path before the handler. Latency and errors can be injected.
+    """
+
+    parser = argparse.ArgumentParser(textwrap.dedent(usage))
+
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='address to listen.'
+    )
+
+    parser.add_argument(
+        '-p', '--port',
+        type=int,
+        default=8983,
+        help='port to listen.'
+    )
+
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0,
+        help='seconds added to every request.'
+    )
+
+    parser.add_argument(
+        '--document_latency',
+        type=float,
+        default=0,
+        help='seconds added by document in the updates.'
+    )
+
+    parser.add_argument(
+        '--error_rate',
+        type=float,
+        default=0,
+        help='fraction of the requests answered with an error, ex.: 0.01.'
+    )
+
+    parser.add_argument(
+        '--error_status',
+        type=int,
+        default=503,
+        help='HTTP status of the injected errors.'
+    )
+
+    parser.add_argument(
+        '--reject_gzip',
+        action='store_true',
+        help='answer 400 to the compressed updates, as Solr without request inflation.'
+    )
+
+    args = parser.parse_args()
+
+    solr = FakeSolr(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        document_latency=args.document_latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        reject_gzip=args.reject_gzip
+    )
+
+    print("Fake Solr listening at {0}/<core>".format(solr.url))
+
+    try:
+        solr.server.serve_forever()
+    except KeyboardInterrupt:
+        print("Interrupt by user")
+    finally:
+        solr.server.server_close()
+        for line in solr.report():
+            print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# coding: utf-8
+import os
+import csv
+import json
+import gzip
+import logging
+from collections import Counter
+
+from lxml import etree as ET
+
+logger = logging.getLogger(__name__)
+
+
+def _open(path):
+    """
+    Open a dump file for reading as text, transparently handling ``.gz``.
+
+    :param path: path to a CSV or JSONL dump, optionally gzip compressed.
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+
+    return open(path, 'r', encoding='utf-8')
+
+
+def read_dump(path):
+    """
+    Stream the rows of an indicator dump as dictionaries.
+
+    CSV dumps must have a header line, JSONL dumps have one JSON object per
+    line. The format is guessed from the file extension (``.csv``,
+    ``.jsonl``, optionally followed by ``.gz``).
+
+    Expected keys: ``pid``, ``collection`` (optional) and ``total``
+    (optional). Rows without ``total`` are considered single events.
+
+    :param path: path to the dump file.
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+
+    with _open(path) as handler:
+        if name.endswith('.csv'):
+            for row in csv.DictReader(handler):
+                yield row
+        else:
+            for line in handler:
+                line = line.strip()
+                if not line:
+                    continue
+                yield json.loads(line)
+
+
+def _row_key(row):
+    pid = (row.get('pid') or '').strip()
+
+    if not pid:
+        return None
+
+    collection = (row.get('collection') or '').strip()
+
+    return '-'.join([pid, collection]) if collection else pid
+
+
+def aggregate(rows):
+    """
+    Aggregate dump rows into a ``Counter`` keyed by ``pid-collection`` (or
+    ``pid`` when the dump has no collection column).
+
+    Rows are read one at a time, so memory is bounded by the number of
+    distinct documents and not by the number of events. Rows with a
+    malformed ``total`` are skipped with a warning.
+
+    :param rows: iterable of dictionaries as returned by ``read_dump``.
+    """
+    totals = Counter()
+
+    for row in rows:
+        key = _row_key(row)
+
+        if key is None:
+            continue
+
+        total = row.get('total')
+
+        if total in (None, ''):
+            totals[key] += 1
+            continue
+
+        try:
+            totals[key] += int(total)
+        except (TypeError, ValueError):
+            logger.warning("Skipping %s, invalid total: %r", key, total)
+
+    return totals
+
+
+def join_solr_ids(totals, available_ids):
+    """
+    Map aggregated totals to the Solr ids available in the index.
+
+    Keys with the collection (``pid-collection``) match the Solr id
+    directly, keys with only the ``pid`` are applied to every collection
+    where the document is indexed.
+
+    :param totals: dict like mapping keys to totals.
+    :param available_ids: set of Solr ids.
+
+    :returns: dict {solr_id: total}
+    """
+    by_pid = None
+
+    joined = {}
+    for key, total in totals.items():
+        if key in available_ids:
+            joined[key] = joined.get(key, 0) + total
+            continue
+
+        if by_pid is None:
+            by_pid = {}
+            for solr_id in available_ids:
+                by_pid.setdefault(solr_id.rsplit('-', 1)[0], []).append(solr_id)
+
+        for solr_id in by_pid.get(key, []):
+            joined[solr_id] = joined.get(solr_id, 0) + total
+
+    return joined
+
+
+def atomic_update_doc(document_id, field_name, value):
+    """
+    Build a Solr ``<doc>`` setting ``field_name`` of one document.
+
+    :param document_id: Solr id of the document.
+    :param field_name: name of the Solr field to be set.
+    :param value: value of the field.
+    """
+    doc = ET.Element('doc')
+
+    identifier = ET.Element('field')
+    identifier.set('name', 'id')
+    identifier.text = document_id
+
+    field = ET.Element('field')
+    field.set('name', field_name)
+    field.text = str(value)
+    field.set('update', 'set')
+
+    doc.append(identifier)
+    doc.append(field)
+
+    return doc
+
+
+def atomic_update_xml(field_name, values):
+    """
+    Build one Solr XML update setting ``field_name`` for several documents.
+
+    :param field_name: name of the Solr field to be set.
+    :param values: iterable of (solr_id, value) tuples.
+    """
+    xml = ET.Element('add')
+
+    for document_id, value in values:
+        xml.append(atomic_update_doc(document_id, field_name, value))
+
+    return ET.tostring(xml, encoding="utf-8", method="xml")
+
+
+def load_dumps(solr_writer, dumps, field_name, available_ids):
+    """
+    Read indicator dumps and push the totals to Solr with batched atomic
+    updates.
+
+    :param solr_writer: updatesearch.writer.SolrWriter instance.
+    :param dumps: list of dump file paths.
+    :param field_name: Solr field receiving the totals.
+    :param available_ids: set of Solr ids available in the index.
+
+    :returns: number of documents sent.
+    """
+    totals = Counter()
+    for dump in dumps:
+        logger.info("Reading dump %s", os.path.basename(dump))
+        totals.update(aggregate(read_dump(dump)))
+
+    joined = sorted(join_solr_ids(totals, available_ids).items())
+
+    logger.info("Updating (%d) documents from dumps", len(joined))
+
+    for document_id, value in joined:
+        solr_writer.add(atomic_update_doc(document_id, field_name, value))
+
+    solr_writer.flush()
+
+    return len(joined)
@@ -0,0 +1,286 @@
+# coding: utf-8
+import os
+import time
+import socket
+import sqlite3
+import threading
+from collections import namedtuple
+
+JOBS_LEASE = int(os.environ.get('JOBS_LEASE', 1800))
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 3))
+
+Job = namedtuple('Job', 'id collection issn from_date until_date attempts')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL DEFAULT '',
+    issn TEXT NOT NULL DEFAULT '',
+    from_date TEXT NOT NULL DEFAULT '',
+    until_date TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    leased_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    started REAL,
+    finished REAL,
+    documents INTEGER,
+    error TEXT,
+    UNIQUE (collection, issn, from_date, until_date)
+)
+"""
+
+FINISH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS finish (
+    worker TEXT NOT NULL,
+    finished REAL NOT NULL
+)
+"""
+
+
+def worker_name():
+    return '%s-%d' % (socket.gethostname(), os.getpid())
+
+
+class JobQueue(object):
+    """
+    Table of units of indexing work in a SQLite database, shared by any
+    number of ``update_search`` workers.
+
+    A worker leases the next pending unit for ``lease`` seconds and renews
+    the lease while it works. The units of a worker that stopped renewing,
+    because it crashed, are leased again by the others. A unit failing
+    ``max_attempts`` times is marked as failed.
+
+    A unit is a (collection, ISSN) or a (collection, date window), the
+    empty fields are not filtered.
+
+    :param path: SQLite database, local or in a shared file system.
+    :param lease: seconds a unit stays leased without renewal.
+    """
+
+    def __init__(self, path, lease=JOBS_LEASE, max_attempts=JOBS_MAX_ATTEMPTS):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+
+        with self._connect() as db:
+            db.execute(SCHEMA)
+            db.execute(FINISH_SCHEMA)
+
+    def _connect(self):
+        # One connection by operation, so the lease renewal thread and the
+        # worker never share one.
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        return Transaction(db)
+
+    def fill(self, units):
+        """
+        Add units of work, the units already in the table are kept.
+
+        :param units: iterable of dicts with collection, issn, from_date and
+                      until_date.
+        :returns: number of units added.
+        """
+        added = 0
+        with self._connect() as db:
+            for unit in units:
+                cursor = db.execute(
+                    'INSERT OR IGNORE INTO jobs (collection, issn, from_date, until_date) '
+                    'VALUES (?, ?, ?, ?)',
+                    (unit.get('collection') or '', unit.get('issn') or '',
+                     unit.get('from_date') or '', unit.get('until_date') or ''))
+                added += cursor.rowcount
+
+            if added:
+                db.execute('DELETE FROM finish')
+
+        return added
+
+    def lease_next(self, worker):
+        """
+        Lease the next pending unit, or an expired lease. Expired leases of
+        units leased ``max_attempts`` times, as units crashing their workers,
+        are marked as failed.
+
+        :returns: Job or None when there is no unit left.
+        """
+        now = time.time()
+
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, "
+                "error = 'Lease expired after ' || attempts || ' attempts' "
+                "WHERE status = 'leased' AND leased_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts))
+
+            row = db.execute(
+                "SELECT id, collection, issn, from_date, until_date, attempts FROM jobs "
+                "WHERE status = 'pending' "
+                "OR (status = 'leased' AND leased_until < ? AND attempts < ?) "
+                "ORDER BY id LIMIT 1", (now, self.max_attempts)).fetchone()
+
+            if row is None:
+                return None
+
+            db.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, leased_until = ?, "
+                "attempts = attempts + 1, started = ? WHERE id = ?",
+                (worker, now + self.lease, now, row[0]))
+
+        job = Job(*row)
+        return job._replace(attempts=job.attempts + 1)
+
+    def renew(self, job, worker):
+        """
+        Extend the lease of a unit.
+
+        :returns: False when the unit was leased by another worker.
+        """
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET leased_until = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + self.lease, job.id, worker))
+
+        return cursor.rowcount == 1
+
+    def done(self, job, worker, documents=0):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'done', finished = ?, documents = ?, "
+                "error = NULL WHERE id = ? AND worker = ?",
+                (time.time(), documents, job.id, worker))
+
+    def fail(self, job, worker, error):
+        status = 'failed' if job.attempts >= self.max_attempts else 'pending'
+
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, finished = ?, error = ? "
+                "WHERE id = ? AND worker = ?",
+                (status, time.time(), str(error), job.id, worker))
+
+    def finish(self, worker):
+        """
+        Claim the final step of the table, as the optimize of the index, run
+        once by all the workers.
+
+        :returns: True only for the first worker finding no unit pending or
+                  leased. The units added by ``fill`` open a new final step.
+        """
+        with self._connect() as db:
+            left = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'leased')"
+            ).fetchone()[0]
+            claimed = db.execute('SELECT COUNT(*) FROM finish').fetchone()[0]
+
+            if left or claimed:
+                return False
+
+            db.execute(
+                'INSERT INTO finish (worker, finished) VALUES (?, ?)',
+                (worker, time.time()))
+
+        return True
+
+    def report(self):
+        """
+        Lines with the units by status and the balance of the done units
+        across the workers.
+        """
+        with self._connect() as db:
+            statuses = db.execute(
+                'SELECT status, COUNT(*) FROM jobs GROUP BY status ORDER BY status'
+            ).fetchall()
+            workers = db.execute(
+                "SELECT worker, COUNT(*), SUM(documents), SUM(finished - started) "
+                "FROM jobs WHERE status = 'done' GROUP BY worker ORDER BY worker"
+            ).fetchall()
+
+        lines = ['Units: ' + ', '.join(
+            '{0} {1}'.format(n, status) for status, n in statuses)]
+
+        for worker, units, documents, seconds in workers:
+            lines.append(
+                'Worker {0}: {1} units, {2} documents, {3:.1f} seconds'.format(
+                    worker, units, documents or 0, seconds or 0))
+
+        return lines
+
+    def work(self, process, worker=None, log=print):
+        """
+        Lease and process units until there is none left. The lease is
+        renewed in background while ``process`` runs.
+
+        :param process: function(job) returning the number of documents.
+        :returns: number of units processed.
+        """
+        worker = worker or worker_name()
+        processed = 0
+
+        while True:
+            job = self.lease_next(worker)
+            if job is None:
+                break
+
+            log("Worker {0} processing unit {1}: {2}".format(
+                worker, job.id, describe(job)))
+
+            stop = threading.Event()
+            heartbeat = threading.Thread(
+                target=self._heartbeat, args=(job, worker, stop))
+            heartbeat.daemon = True
+            heartbeat.start()
+
+            try:
+                documents = process(job)
+            except Exception as e:
+                log("Error: unit {0}: {1}".format(job.id, e))
+                self.fail(job, worker, e)
+            else:
+                self.done(job, worker, documents or 0)
+                processed += 1
+            finally:
+                stop.set()
+                heartbeat.join()
+
+        return processed
+
+    def _heartbeat(self, job, worker, stop):
+        while not stop.wait(self.lease / 3.0):
+            try:
+                self.renew(job, worker)
+            except sqlite3.Error:
+                pass
+
+
+def describe(job):
+    return ', '.join(
+        '{0}: {1}'.format(name, getattr(job, name))
+        for name in ('collection', 'issn', 'from_date', 'until_date')
+        if getattr(job, name))
+
+
+class Transaction(object):
+    """
+    Context manager running the statements in one immediate transaction,
+    the write lock is taken at the start so concurrent workers never lease
+    the same unit.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.db.execute('COMMIT')
+            else:
+                self.db.execute('ROLLBACK')
+        finally:
+            self.db.close()
@@ -0,0 +1,131 @@
+# coding: utf-8
+import collections
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from articlemeta.client import dates_pagination, DEFAULT_FROM_DATE, LIMIT
+
+
+def lists_identifiers(client):
+    """
+    Whether the ArticleMeta client lists identifiers with
+    ``documents(only_identifiers=True)``: the Thrift client and the clients
+    wrapping it. The REST client lists only full documents.
+    """
+    return getattr(client, 'lists_identifiers', hasattr(client, 'dispatcher'))
+
+
+def ordered_map(executor, function, items, in_flight):
+    """
+    Like ``executor.map`` but reading ``items`` lazily, with at most
+    ``in_flight`` calls running, results in the order of the items.
+    """
+    pending = collections.deque()
+
+    for item in items:
+        pending.append(executor.submit(function, item))
+
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
+class ParallelClient(object):
+    """
+    ArticleMeta Thrift client listing the documents with several concurrent
+    requests.
+
+    ArticleMeta gives no count of the documents, the listing is paged by
+    year and by offset inside each year. The pages of a year are requested
+    ``workers`` at a time, ahead of the page being read; a page shorter
+    than ``limit`` ends the year and the requests ahead of it are
+    discarded. The documents are then requested concurrently too.
+
+    Identifiers and documents are yielded in the same order as the
+    sequential listing.
+
+    :param client: articlemeta.client.ThriftClient
+    :param workers: number of concurrent requests.
+    :param limit: number of identifiers by page.
+    :param accept: function filtering the listed identifiers.
+    """
+
+    lists_identifiers = True
+
+    def __init__(self, client, workers=4, limit=LIMIT, accept=None):
+        self.client = client
+        self.workers = max(workers, 1)
+        self.limit = limit
+        self.accept = accept
+        self.requests = 0
+        self.discarded = 0
+
+    def document(self, code, collection, **kwargs):
+        return self.client.document(code=code, collection=collection, **kwargs)
+
+    def page(self, request):
+        collection, issn, from_date, until_date, offset = request
+
+        return self.client.dispatcher(
+            'get_article_identifiers',
+            collection=collection, issn=issn,
+            from_date=from_date, until_date=until_date,
+            limit=self.limit, offset=offset,
+            extra_filter=None
+        ) or []
+
+    def identifiers(self, collection=None, issn=None, from_date=None,
+                    until_date=None):
+        fdate = from_date or DEFAULT_FROM_DATE
+        udate = until_date or datetime.today().isoformat()[:10]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for window in dates_pagination(fdate, udate):
+                pending = collections.deque()
+                offset = 0
+
+                while True:
+                    while len(pending) < self.workers:
+                        request = (collection, issn) + window + (offset,)
+                        pending.append(executor.submit(self.page, request))
+                        self.requests += 1
+                        offset += self.limit
+
+                    identifiers = pending.popleft().result()
+
+                    for identifier in identifiers:
+                        if self.accept is None or self.accept(identifier):
+                            yield identifier
+
+                    if len(identifiers) < self.limit:
+                        break
+
+                # Pages requested beyond the end of the year.
+                for future in pending:
+                    if not future.cancel():
+                        future.result()
+                    self.discarded += 1
+
+    def documents(self, collection=None, issn=None, from_date=None,
+                  until_date=None, only_identifiers=False):
+        identifiers = self.identifiers(
+            collection=collection,
+            issn=issn,
+            from_date=from_date,
+            until_date=until_date
+        )
+
+        if only_identifiers:
+            for identifier in identifiers:
+                yield identifier
+            return
+
+        def document(identifier):
+            return self.client.document(identifier.code, identifier.collection)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for article in ordered_map(executor, document, identifiers, self.workers):
+                if article:
+                    yield article
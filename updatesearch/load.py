@@ -0,0 +1,193 @@
+#!/usr/bin/python
+# coding: utf-8
+import os
+import time
+import argparse
+import textwrap
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from . import export
+    from .solrclient import connect, SOLR_POOL_SIZE
+except ImportError:
+    import export
+    from solrclient import connect, SOLR_POOL_SIZE
+
+
+SOLR_URL = os.environ.get('SOLR_URL', 'http://127.0.0.1/solr')
+
+CONTENT_TYPES = {
+    'xml': 'text/xml; charset=utf-8',
+    'json': 'application/json; charset=utf-8',
+}
+
+
+class Load(object):
+    """
+    Load in Solr the update files written by ``update_search --export``.
+
+    The shards of every directory are posted by ``workers`` concurrent
+    requests. The status of each shard is recorded in the ``manifest.json``
+    as soon as it is loaded, so an interrupted load is resumed from the
+    shards not loaded yet. Solr commits once, at the end.
+
+    :param directories: export directories, each with its manifest.
+    :param workers: number of concurrent update requests.
+    """
+
+    def __init__(self, directories, solr_url=SOLR_URL, workers=4,
+                 optimize=False):
+        self.directories = directories
+        self.workers = workers
+        self.optimize = optimize
+        self.solr = connect(solr_url, pool_size=max(workers, SOLR_POOL_SIZE))
+        self.documents = 0
+        self.loaded = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def post(self, directory, manifest, shard):
+        """
+        Send one shard to Solr. Compressed shards are sent as they are, with
+        ``Content-Encoding: gzip``, unless Solr refuses them.
+        """
+        headers = {'Content-Type': CONTENT_TYPES[manifest['format']]}
+
+        with open(os.path.join(directory, shard['file']), 'rb') as f:
+            data = f.read()
+
+        return self.solr.update(
+            data, commit=False, headers=headers,
+            compressed=manifest.get('compression') == 'gzip')
+
+    def load_shard(self, directory, manifest, shard):
+        try:
+            self.post(directory, manifest, shard)
+        except Exception as e:
+            print("Error: {0}: {1}".format(shard['file'], e))
+            status = {'status': 'failed', 'error': str(e)}
+        else:
+            status = {'status': 'done'}
+
+        status['time'] = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+
+        with self._lock:
+            shard.update(status)
+            if status['status'] == 'done':
+                shard.pop('error', None)
+                manifest['committed'] = False
+                self.loaded += 1
+                self.documents += shard['documents']
+                print("Loaded {0} ({1} documents)".format(
+                    shard['file'], shard['documents']))
+            else:
+                self.failed += 1
+
+            export.write_manifest(directory, manifest)
+
+    def run(self):
+        """
+        Load the files not loaded yet and commit. The commit is recorded in
+        the manifests, files loaded by an interrupted run before its commit
+        are committed by the next one.
+        """
+        pending = []
+        manifests = []
+        uncommitted = False
+        for directory in self.directories:
+            manifest = export.read_manifest(directory)
+            shards = [s for s in manifest['shards'] if s.get('status') != 'done']
+            manifests.append((directory, manifest))
+
+            if manifest.get('committed') is False:
+                uncommitted = True
+
+            print("{0}: {1} of {2} files to load".format(
+                directory, len(shards), len(manifest['shards'])))
+
+            pending.extend((directory, manifest, s) for s in shards)
+
+        if not pending and not uncommitted:
+            print("Nothing to load")
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for args in pending:
+                executor.submit(self.load_shard, *args)
+
+        if self.loaded or uncommitted:
+            self.solr.commit()
+
+            for directory, manifest in manifests:
+                if manifest.get('committed') is False:
+                    manifest['committed'] = True
+                    export.write_manifest(directory, manifest)
+
+            if self.optimize:
+                self.solr.optimize()
+
+        print("Loaded {0} documents in {1} files, {2} files failed.".format(
+            self.documents, self.loaded, self.failed))
+        self.solr.log_stats(print)
+
+
+def main():
+
+    usage = """\
+    Load in SciELO Solr the update files exported by update_search --export.
+
+    The files are posted by concurrent requests and Solr commits once at the
+    end. The loaded files and the commit are recorded in the manifest.json
+    of each directory, running it again loads only the files not loaded yet
+    and commits the files of an interrupted load.
+    """
+
+    parser = argparse.ArgumentParser(textwrap.dedent(usage))
+
+    parser.add_argument(
+        'directories',
+        nargs='+',
+        help='export directories.'
+    )
+
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=4,
+        help='number of files sent to Solr concurrently.'
+    )
+
+    parser.add_argument(
+        '-o', '--optimize',
+        default=False,
+        action='store_true',
+        help='optimize the index after the commit.'
+    )
+
+    parser.add_argument(
+        '--solr_url',
+        default=SOLR_URL,
+        help='Solr RESTFul URL, default is the environment variable ``SOLR_URL``. Use comma separated URLs to load several Solr at once.'
+    )
+
+    args = parser.parse_args()
+
+    start = time.time()
+
+    try:
+        Load(
+            args.directories,
+            solr_url=args.solr_url,
+            workers=args.workers,
+            optimize=args.optimize
+        ).run()
+    except KeyboardInterrupt:
+        print("Interrupt by user")
+    finally:
+        end = time.time()
+        print("Duration {0} seconds.".format(end-start))
+
+if __name__ == "__main__":
+    main()
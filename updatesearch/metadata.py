@@ -4,12 +4,13 @@ import os
 import time
 import json
 import argparse
+import functools
 import textwrap
 from datetime import datetime, timedelta
 
 from lxml import etree as ET
-from SolrAPI import Solr
 import plumber
+from articlemeta.client import dates_pagination, DEFAULT_FROM_DATE
 
 DEBUG = os.environ.get("DEBUG", "True") == "True"
 
@@ -21,12 +22,116 @@ else:
 
 try:
     from . import pipeline_xml
+    from . import engine
+    from . import writer
+    from . import spool
+    from . import export
+    from . import amcache
+    from . import dumps
+    from . import listing
+    from . import partition as partitioning
+    from . import jobs
+    from .readahead import read_ahead, READ_AHEAD
+    from .solrclient import connect, SOLR_POOL_SIZE
 except ImportError:
     import pipeline_xml
+    import engine
+    import writer
+    import spool
+    import export
+    import amcache
+    import dumps
+    import listing
+    import partition as partitioning
+    import jobs
+    from readahead import read_ahead, READ_AHEAD
+    from solrclient import connect, SOLR_POOL_SIZE
 
 
 SOLR_URL = os.environ.get('SOLR_URL', 'http://127.0.0.1/solr')
 
+
+def pipeline_to_docs(article, load_indicators=False):
+    """
+    Pipeline to tranform an article in serialized Solr ``<doc>`` elements.
+
+    Module level function so it can run in the processes of the indexing
+    engine.
+
+    :param article: xylose.scielodocument.Article
+    :param load_indicators: include the received citations.
+    """
+
+    pipeline_itens = [
+        pipeline_xml.SetupDocument(),
+        pipeline_xml.DocumentID(),
+        pipeline_xml.DOI(),
+        pipeline_xml.Collection(),
+        pipeline_xml.DocumentType(),
+        pipeline_xml.URL(),
+        pipeline_xml.Authors(),
+        pipeline_xml.Orcid(),
+        pipeline_xml.Titles(),
+        pipeline_xml.OriginalTitle(),
+        pipeline_xml.Pages(),
+        pipeline_xml.WOKCI(),
+        pipeline_xml.WOKSC(),
+        pipeline_xml.JournalAbbrevTitle(),
+        pipeline_xml.Languages(),
+        pipeline_xml.AvailableLanguages(),
+        pipeline_xml.HTMLLanguages(),
+        pipeline_xml.PDFLanguages(),
+        pipeline_xml.Fulltexts(),
+        pipeline_xml.PublicationDate(),
+        pipeline_xml.SciELOPublicationDate(),
+        pipeline_xml.SciELOProcessingDate(),
+        pipeline_xml.Abstract(),
+        pipeline_xml.AffiliationCountry(),
+        pipeline_xml.AffiliationInstitution(),
+        pipeline_xml.Sponsor(),
+        pipeline_xml.Volume(),
+        pipeline_xml.SupplementVolume(),
+        pipeline_xml.Issue(),
+        pipeline_xml.SupplementIssue(),
+        pipeline_xml.ElocationPage(),
+        pipeline_xml.StartPage(),
+        pipeline_xml.EndPage(),
+        pipeline_xml.JournalTitle(),
+        pipeline_xml.IsCitable(),
+        pipeline_xml.Permission(),
+        pipeline_xml.Keywords(),
+        pipeline_xml.JournalISSNs(),
+        pipeline_xml.SubjectAreas(),
+        pipeline_xml.Networks(),
+
+        pipeline_xml.NetworkClassification()
+    ]
+
+    if load_indicators is True:
+        pipeline_itens.append(pipeline_xml.ReceivedCitations())
+
+    pipeline_itens.append(pipeline_xml.TearDown())
+
+    ppl = plumber.Pipeline(*pipeline_itens)
+
+    return [ET.tostring(xml, encoding="utf-8", method="xml")
+            for xml in ppl.run([article])]
+
+
+def parse_date(date):
+    return datetime.strptime(date, '%Y-%m-%d') if date else None
+
+
+def pipeline_to_xml(article, load_indicators=False):
+    """
+    Pipeline to tranform a dictionary to XML format
+
+    :param article: xylose.scielodocument.Article
+    :param load_indicators: include the received citations.
+    """
+    return b'<add>' + b''.join(pipeline_to_docs(article, load_indicators)) + b'</add>'
+
+
 class UpdateSearch(object):
     """
     Process to get article in article meta and index in Solr.
@@ -34,7 +139,16 @@ class UpdateSearch(object):
 
     def __init__(self, period=None, from_date=None, until_date=None,
                  collection=None, issn=None, delete=False, differential=False,
-                 load_indicators=False):
+                 load_indicators=False, transformers=2,
+                 writers=writer.SOLR_MAX_CONCURRENCY,
+                 queue_size=engine.QUEUE_SIZE, processes=False,
+                 spool_file=None, solr_url=SOLR_URL, export_dir=None,
+                 export_format='xml', shard_size=export.SHARD_SIZE,
+                 export_compress=False, cache_dir=None,
+                 cache_size=amcache.ARTICLEMETA_CACHE_SIZE, dump_files=None,
+                 dump_readers=4, read_ahead=READ_AHEAD, listing_workers=1,
+                 partition=None, jobs_file=None, fill=None,
+                 lease=jobs.JOBS_LEASE, worker=None):
         self.delete = delete
         self.collection = collection
         self.from_date = from_date
@@ -42,7 +156,26 @@ class UpdateSearch(object):
         self.differential = differential
         self.load_indicators = load_indicators
         self.issn = issn
-        self.solr = Solr(SOLR_URL, timeout=10)
+        self.transformers = transformers
+        self.writers = writers
+        self.queue_size = queue_size
+        self.processes = processes
+        self.spool = spool.Spool(spool_file) if spool_file else None
+        self.export_dir = export_dir
+        self.export_format = export_format
+        self.shard_size = shard_size
+        self.export_compress = export_compress
+        self.cache = amcache.DocumentCache(cache_dir, cache_size) if cache_dir else None
+        self.dump_files = dump_files
+        self.dump_readers = dump_readers
+        self.read_ahead = read_ahead
+        self.listing_workers = listing_workers
+        self.partition = partition
+        self.jobs_file = jobs_file
+        self.fill = fill
+        self.lease = lease
+        self.worker = worker
+        self.solr = connect(solr_url, pool_size=max(writers, SOLR_POOL_SIZE))
         if period:
             self.from_date = datetime.now() - timedelta(days=period)
 
@@ -65,76 +198,50 @@ class UpdateSearch(object):
 
         :param list_dict: List of dictionary content key tronsform in a XML.
         """
+        return pipeline_to_xml(article, load_indicators=self.load_indicators)
 
-        pipeline_itens = [
-            pipeline_xml.SetupDocument(),
-            pipeline_xml.DocumentID(),
-            pipeline_xml.DOI(),
-            pipeline_xml.Collection(),
-            pipeline_xml.DocumentType(),
-            pipeline_xml.URL(),
-            pipeline_xml.Authors(),
-            pipeline_xml.Orcid(),
-            pipeline_xml.Titles(),
-            pipeline_xml.OriginalTitle(),
-            pipeline_xml.Pages(),
-            pipeline_xml.WOKCI(),
-            pipeline_xml.WOKSC(),
-            pipeline_xml.JournalAbbrevTitle(),
-            pipeline_xml.Languages(),
-            pipeline_xml.AvailableLanguages(),
-            pipeline_xml.HTMLLanguages(),
-            pipeline_xml.PDFLanguages(),
-            pipeline_xml.Fulltexts(),
-            pipeline_xml.PublicationDate(),
-            pipeline_xml.SciELOPublicationDate(),
-            pipeline_xml.SciELOProcessingDate(),
-            pipeline_xml.Abstract(),
-            pipeline_xml.AffiliationCountry(),
-            pipeline_xml.AffiliationInstitution(),
-            pipeline_xml.Sponsor(),
-            pipeline_xml.Volume(),
-            pipeline_xml.SupplementVolume(),
-            pipeline_xml.Issue(),
-            pipeline_xml.SupplementIssue(),
-            pipeline_xml.ElocationPage(),
-            pipeline_xml.StartPage(),
-            pipeline_xml.EndPage(),
-            pipeline_xml.JournalTitle(),
-            pipeline_xml.IsCitable(),
-            pipeline_xml.Permission(),
-            pipeline_xml.Keywords(),
-            pipeline_xml.JournalISSNs(),
-            pipeline_xml.SubjectAreas(),
-            pipeline_xml.Networks(),
-
-            pipeline_xml.NetworkClassification()
-        ]
-
-        if self.load_indicators is True:
-            pipeline_itens.append(pipeline_xml.ReceivedCitations())
-
-        pipeline_itens.append(pipeline_xml.TearDown())
-
-        ppl = plumber.Pipeline(*pipeline_itens)
-
-        xmls = ppl.run([article])
-
-        # Add root document
-        add = ET.Element('add')
-
-        for xml in xmls:
-            add.append(xml)
-
-        return ET.tostring(add, encoding="utf-8", method="xml")
+    def articlemeta(self):
+        """
+        Return the ArticleMeta client, listing with concurrent requests when
+        ``--listing_workers`` is set, only the documents of the partition when
+        ``--partition`` is set and reading the documents from the local cache
+        when ``--cache`` is set.
+        """
+        client = AMClient()
+        accept = self.partition.accepts if self.partition else None
+
+        if self.listing_workers > 1 and hasattr(client, 'dispatcher'):
+            client = listing.ParallelClient(
+                client, workers=self.listing_workers, accept=accept)
+        else:
+            if self.listing_workers > 1:
+                print("Concurrent listing is only available with the Thrift client")
+
+            if self.partition:
+                client = partitioning.PartitionedClient(client, self.partition)
+
+        if self.cache is not None:
+            return amcache.CachedClient(
+                client, self.cache, read_ahead=self.read_ahead)
+
+        return client
 
     def differential_mode(self):
-        art_meta = AMClient()
+        art_meta = self.articlemeta()
 
         print("Running with differential mode")
+        if self.partition:
+            print("Partition: {0}".format(self.partition))
         ind_ids = set()
         art_ids = set()
 
+        # ArticleMeta ids are read ahead while Solr answers
+        identifiers = read_ahead(art_meta.documents(
+            collection=self.collection,
+            issn=self.issn,
+            only_identifiers=True
+        ), self.read_ahead)
+
         # all ids in search index
         print("Loading Search Index ids.")
         itens_query = []
@@ -149,15 +256,13 @@ class UpdateSearch(object):
             {'q': query, 'fl': 'id,scielo_processing_date', 'rows': 1000000}))['response']['docs']
 
         for id in list_ids:
+            if self.partition and id['id'] not in self.partition:
+                continue
             ind_ids.add('%s-%s' % (id['id'], id.get('scielo_processing_date', '1900-01-01')))
 
         # all ids in articlemeta
         print("Loading ArticleMeta ids.")
-        for item in art_meta.documents(
-            collection=self.collection,
-            issn=self.issn,
-            only_identifiers=True
-        ):
+        for item in identifiers:
             art_ids.add('%s-%s-%s' % (item.code, item.collection, item.processing_date))
 
         # Ids to remove
@@ -165,11 +270,7 @@ class UpdateSearch(object):
             print("Running remove records process.")
             remove_ids = set([i[:27] for i in ind_ids]) - set([i[:27] for i in art_ids])
             print("Removing (%d) documents from search index." % len(remove_ids))
-            total_to_remove = len(remove_ids)
-            if total_to_remove > 0:
-                for ndx, to_remove_id in enumerate(remove_ids, 1):
-                    print("Removing (%d/%d): %s" % (ndx, total_to_remove, to_remove_id))
-                    self.solr.delete('id:%s' % to_remove_id, commit=False)
+            self.remove(remove_ids)
 
         # Ids to include
         print("Running include records process.")
@@ -177,52 +278,159 @@ class UpdateSearch(object):
         print("Including (%d) documents to search index." % len(include_ids))
         total_to_include = len(include_ids)
         if total_to_include > 0:
-            for ndx, to_include_id in enumerate(include_ids, 1):
-                print("Including (%d/%d): %s" % (ndx, total_to_include, to_include_id))
-                code = to_include_id[:23]
-                collection = to_include_id[24: 27]
-                processing_date = to_include_id[:-11]
-                document = art_meta.document(code=code, collection=collection)
-                try:
-                    xml = self.pipeline_to_xml(document)
-                    self.solr.update(xml, commit=False)
-                except ValueError as e:
-                    print("ValueError: {0}".format(e))
-                    print(e)
-                    continue
-                except Exception as e:
-                    print("Error: {0}".format(e))
-                    print(e)
-                    continue
+            self.index(self.including(art_meta, include_ids))
+
+    def remove(self, remove_ids):
+        """
+        Remove the documents from Solr by id, a failed removal is reported
+        and spooled without stopping the others.
+
+        :param remove_ids: Solr ids, ``pid-collection``.
+        """
+        total_to_remove = len(remove_ids)
+        for ndx, to_remove_id in enumerate(remove_ids, 1):
+            print("Removing (%d/%d): %s" % (ndx, total_to_remove, to_remove_id))
+            try:
+                self.solr.delete('id:%s' % to_remove_id, commit=False)
+            except Exception as e:
+                self.failed(to_remove_id, 'delete', e)
+
+    def including(self, art_meta, include_ids):
+        total_to_include = len(include_ids)
+        for ndx, to_include_id in enumerate(include_ids, 1):
+            print("Including (%d/%d): %s" % (ndx, total_to_include, to_include_id))
+            code = to_include_id[:23]
+            collection = to_include_id[24: 27]
+            try:
+                if self.cache is not None:
+                    document = art_meta.document(
+                        code=code, collection=collection,
+                        processing_date=to_include_id[28:])
+                else:
+                    document = art_meta.document(code=code, collection=collection)
+            except Exception as e:
+                self.failed('-'.join([code, collection]), 'fetch', e)
+                continue
+
+            # Removed from ArticleMeta after the listing.
+            if not document:
+                print("Document not found in ArticleMeta: %s" % to_include_id)
+                continue
+
+            yield document
+
+    def failed(self, document_id, stage, exception):
+        """
+        Report a document that could not be indexed and record it in the
+        dead-letter spool, when ``--spool`` is set.
+
+        :param document_id: Solr id of the document, ``pid-collection``.
+        """
+        print("Error: {0}".format(exception))
+
+        if self.spool is not None:
+            code, collection = document_id.rsplit('-', 1)
+            self.spool.append(
+                document_id, stage, exception, 'articlemeta',
+                code=code, collection=collection)
+
+    def transform_error(self, document, stage, exception):
+        if not document:
+            print("Error: {0}".format(exception))
+            return
+
+        self.failed(
+            '-'.join([document.publisher_id, document.collection_acronym]),
+            stage, exception)
+
+    def write_error(self, docs, exception):
+        for document_id in writer.document_ids(docs):
+            self.failed(document_id, 'write', exception)
+
+    def loading(self, documents):
+        for document in documents:
+            if not document:
+                continue
+            print("Loading document %s" % '_'.join([document.collection_acronym, document.publisher_id]))
+            yield document
+
+    def open_writer(self):
+        """
+        Return the writer of the documents: update files in ``export_dir``
+        in the export mode, otherwise the Solr writer.
+        """
+        if self.export_dir:
+            return export.ExportWriter(
+                self.export_dir,
+                fmt=self.export_format,
+                shard_size=self.shard_size,
+                compress=self.export_compress
+            )
+
+        return writer.open_writer(
+            self.solr,
+            max_concurrency=self.writers,
+            on_error=self.write_error
+        )
+
+    def index(self, documents):
+        """
+        Transform and send the documents to Solr with the staged engine.
+
+        :param documents: iterable of xylose.scielodocument.Article
+        """
+        transform = functools.partial(
+            pipeline_to_docs, load_indicators=self.load_indicators)
+
+        solr_writer = self.open_writer()
+
+        def write(docs):
+            for doc in docs:
+                solr_writer.add(doc)
+
+        indexer = engine.Engine(
+            transform,
+            write,
+            transformers=self.transformers,
+            writers=1,
+            queue_size=self.queue_size,
+            processes=self.processes,
+            on_error=self.transform_error,
+            log=print
+        )
+
+        try:
+            return indexer.run(documents)
+        finally:
+            solr_writer.close()
+            print(solr_writer.report())
+
+            if self.cache is not None:
+                print(self.cache.report())
+
+            if self.spool is not None and self.spool.count:
+                print("Recorded {0} failed documents in {1}".format(
+                    self.spool.count, self.spool.path))
 
     def common_mode(self):
-        art_meta = AMClient()
+        art_meta = self.articlemeta()
 
         print("Running without differential mode")
-        print("Indexing in {0}".format(self.solr.url))
+        print("Indexing in {0}".format(self.export_dir or self.solr.url))
         print("Collection: {0}".format(self.collection))
-        for document in art_meta.documents(
+        if self.partition:
+            print("Partition: {0}".format(self.partition))
+
+        documents = read_ahead(art_meta.documents(
             collection=self.collection,
             issn=self.issn,
             from_date=self.format_date(self.from_date),
             until_date=self.format_date(self.until_date)
-        ):
+        ), self.read_ahead)
 
-            print("Loading document %s" % '_'.join([document.collection_acronym, document.publisher_id]))
+        counters = self.index(self.loading(documents))
 
-            try:
-                xml = self.pipeline_to_xml(document)
-                self.solr.update(xml, commit=False)
-            except ValueError as e:
-                print("ValueError: {0}".format(e))
-                print(e)
-                continue
-            except Exception as e:
-                print("Error: {0}".format(e))
-                print(e)
-                continue
-
-        if self.delete is True:
+        if self.delete is True and not self.export_dir:
             print("Running remove records process.")
             ind_ids = set()
             art_ids = set()
@@ -240,35 +448,151 @@ class UpdateSearch(object):
                 {'q': query, 'fl': 'id', 'rows': 1000000}))['response']['docs']
 
             for id in list_ids:
+                if self.partition and id['id'] not in self.partition:
+                    continue
                 ind_ids.add(id['id'])
 
             # all ids in articlemeta
-            for item in art_meta.documents(
+            for item in read_ahead(art_meta.documents(
                 collection=self.collection,
                 issn=self.issn,
                 only_identifiers=True
-            ):
+            ), self.read_ahead):
                 art_ids.add('%s-%s' % (item.code, item.collection))
             # Ids to remove
-            total_to_remove = len(remove_ids)
-            print("Removing (%d) documents from search index." % len(remove_ids))
             remove_ids = ind_ids - art_ids
-            for ndx, to_remove_id in enumerate(remove_ids, 1):
-                print("Removing (%d/%d): %s" % (ndx, total_to_remove, to_remove_id))
-                self.solr.delete('id:%s' % to_remove_id, commit=False)
+            print("Removing (%d) documents from search index." % len(remove_ids))
+            self.remove(remove_ids)
+
+        return counters
+
+    def units(self, unit):
+        """
+        Units of work of the jobs mode, by journal or by year, within the
+        collection, ISSN and dates filters.
+
+        :param unit: ``issn`` or ``year``.
+        """
+        from_date = self.format_date(self.from_date)
+        until_date = self.format_date(self.until_date)
+
+        if unit == 'issn':
+            for journal in AMClient().journals(
+                collection=self.collection, issn=self.issn
+            ):
+                yield {
+                    'collection': journal.collection_acronym,
+                    'issn': journal.scielo_issn,
+                    'from_date': from_date,
+                    'until_date': until_date
+                }
+            return
+
+        for window in dates_pagination(
+            from_date or DEFAULT_FROM_DATE,
+            until_date or datetime.today().isoformat()[:10]
+        ):
+            yield {
+                'collection': self.collection,
+                'issn': self.issn,
+                'from_date': window[0],
+                'until_date': window[1]
+            }
+
+    def jobs_mode(self):
+        """
+        Index the units of work leased from the jobs table until there is
+        none left, filling the table first when ``--fill`` is set.
+
+        :returns: True when this worker is the first finding the table
+                  empty, the one optimizing the index.
+        """
+        queue = jobs.JobQueue(self.jobs_file, lease=self.lease)
+        worker = self.worker or jobs.worker_name()
+        export_dir = self.export_dir
+
+        if self.fill:
+            print("Added {0} units to {1}".format(
+                queue.fill(self.units(self.fill)), self.jobs_file))
+
+        def process(job):
+            self.collection = job.collection or None
+            self.issn = job.issn or None
+            self.from_date = parse_date(job.from_date)
+            self.until_date = parse_date(job.until_date)
+
+            # One export directory by unit, load them with update_search_load.
+            if export_dir:
+                self.export_dir = os.path.join(export_dir, 'unit-%05d' % job.id)
+
+            counters = self.common_mode()
+            return counters['fetched']
+
+        queue.work(process, worker=worker)
+
+        for line in queue.report():
+            print(line)
+
+        return queue.finish(worker)
+
+    def dump_mode(self):
+        """
+        Index the documents of ArticleMeta JSONL dumps instead of requesting
+        them to ArticleMeta.
+        """
+        print("Running with dumps: {0}".format(', '.join(self.dump_files)))
+        print("Indexing in {0}".format(self.export_dir or self.solr.url))
+
+        documents = dumps.read_dumps(
+            self.dump_files, readers=self.dump_readers,
+            queue_size=self.queue_size)
+
+        if self.partition:
+            documents = (d for d in documents if self.partition.accepts_article(d))
+
+        self.index(self.loading(documents))
 
     def run(self):
         """
         Run the process for update article in Solr.
+
+        In the export mode the documents are written to update files, load
+        them with update_search_load. Solr is not used, so the differential
+        mode and the removal of documents are not available, nor with dumps
+        and in the jobs mode.
+
+        In the jobs mode each worker commits its documents and only the
+        first worker finding the jobs table empty optimizes the index.
         """
-        if self.differential is True:
+        optimize = True
+
+        if self.jobs_file or self.dump_files or self.export_dir:
+            if self.differential or self.delete:
+                print("Differential mode and delete are ignored with jobs, dumps and in the export mode")
+                self.delete = False
+
+            if self.jobs_file:
+                optimize = self.jobs_mode()
+            elif self.dump_files:
+                self.dump_mode()
+            else:
+                self.common_mode()
+
+            if self.export_dir:
+                return
+        elif self.differential is True:
             self.differential_mode()
         else:
             self.common_mode()
 
         # optimize the index
         self.solr.commit()
-        self.solr.optimize()
+        if optimize:
+            self.solr.optimize()
+        else:
+            print("Units left to other workers, the index is optimized by the last one")
+
+        self.solr.log_stats(print)
 
 
 def main():
@@ -339,6 +663,139 @@ def main():
         help='delete query ex.: q=*:* (Lucene Syntax).'
     )
 
+    parser.add_argument(
+        '-t', '--transformers',
+        type=int,
+        default=2,
+        help='number of workers transforming documents to the Solr XML.'
+    )
+
+    parser.add_argument(
+        '-w', '--writers',
+        type=int,
+        default=writer.SOLR_MAX_CONCURRENCY,
+        help='maximum number of concurrent update requests sent to Solr. The batch size and the number of concurrent requests are adjusted from the Solr response time.'
+    )
+
+    parser.add_argument(
+        '-q', '--queue_size',
+        type=int,
+        default=engine.QUEUE_SIZE,
+        help='maximum number of documents waiting between the fetch, transform and write stages. When Solr slows down the queues fill up and the reading from ArticleMeta waits.'
+    )
+
+    parser.add_argument(
+        '-m', '--processes',
+        default=False,
+        action='store_true',
+        help='transform the documents in a pool of processes instead of threads.'
+    )
+
+    parser.add_argument(
+        '--solr_url',
+        default=SOLR_URL,
+        help='Solr URL, default is the environment variable ``SOLR_URL``. Use comma separated URLs to index in several Solr at once, each document is transformed once and sent to all of them; queries are answered by the first one.'
+    )
+
+    parser.add_argument(
+        '--spool',
+        help='dead-letter spool file where the documents that fail to be indexed are recorded, reprocess them with update_search_replay.'
+    )
+
+    parser.add_argument(
+        '-e', '--export',
+        help='export mode, write the Solr update files to this directory instead of sending the documents to Solr. The files and a manifest.json are loaded later with update_search_load.'
+    )
+
+    parser.add_argument(
+        '--export_format',
+        choices=export.FORMATS,
+        default='xml',
+        help='format of the exported update files.'
+    )
+
+    parser.add_argument(
+        '--shard_size',
+        type=int,
+        default=export.SHARD_SIZE,
+        help='number of documents by exported file.'
+    )
+
+    parser.add_argument(
+        '-z', '--compress',
+        default=False,
+        action='store_true',
+        help='gzip the exported files.'
+    )
+
+    parser.add_argument(
+        '--cache',
+        help='directory of the local cache of ArticleMeta documents. Documents whose processing date did not change are read from the cache instead of ArticleMeta.'
+    )
+
+    parser.add_argument(
+        '--cache_size',
+        type=int,
+        default=amcache.ARTICLEMETA_CACHE_SIZE,
+        help='maximum size of the cache in megabytes, the least recently used documents are removed. Default is the environment variable ``ARTICLEMETA_CACHE_SIZE`` or 2048.'
+    )
+
+    parser.add_argument(
+        '--dump',
+        nargs='+',
+        help='ArticleMeta JSONL dumps, one raw document by line, gzip compressed when ending with .gz. The documents are read from the dumps instead of ArticleMeta.'
+    )
+
+    parser.add_argument(
+        '--dump_readers',
+        type=int,
+        default=4,
+        help='number of dumps read concurrently.'
+    )
+
+    parser.add_argument(
+        '-r', '--read_ahead',
+        type=int,
+        default=READ_AHEAD,
+        help='number of ArticleMeta documents and identifiers requested ahead in background while the current ones are processed, 0 disables it.'
+    )
+
+    parser.add_argument(
+        '-l', '--listing_workers',
+        type=int,
+        default=1,
+        help='number of concurrent requests listing and fetching the ArticleMeta documents. The order of the documents is kept.'
+    )
+
+    parser.add_argument(
+        '--partition',
+        type=partitioning.parse,
+        help='handle only the shard K of N of the documents, ex.: 2/4, by a stable hash of the document id. Running N processes, one by shard, indexes every document exactly once. Applies to the indexing, the differential mode and the delete.'
+    )
+
+    parser.add_argument(
+        '--jobs',
+        help='jobs mode, SQLite database, local or shared, with the units of work. Any number of workers lease the units, index them and mark them done; the units of a crashed worker are leased again when its lease expires.'
+    )
+
+    parser.add_argument(
+        '--fill',
+        choices=('issn', 'year'),
+        help='fill the jobs table with units by journal or by year within the -c, -i, -f and -u filters before working. The units already in the table are kept.'
+    )
+
+    parser.add_argument(
+        '--lease',
+        type=int,
+        default=jobs.JOBS_LEASE,
+        help='seconds a unit stays leased without renewal, the worker renews it while indexing.'
+    )
+
+    parser.add_argument(
+        '--worker',
+        help='worker name in the jobs table, default hostname-pid.'
+    )
+
     args = parser.parse_args()
 
     start = time.time()
@@ -352,7 +809,28 @@ def main():
             issn=args.issn,
             delete=args.delete,
             differential=args.differential,
-            load_indicators=args.load_indicators
+            load_indicators=args.load_indicators,
+            transformers=args.transformers,
+            writers=args.writers,
+            queue_size=args.queue_size,
+            processes=args.processes,
+            spool_file=args.spool,
+            solr_url=args.solr_url,
+            export_dir=args.export,
+            export_format=args.export_format,
+            shard_size=args.shard_size,
+            export_compress=args.compress,
+            cache_dir=args.cache,
+            cache_size=args.cache_size,
+            dump_files=args.dump,
+            dump_readers=args.dump_readers,
+            read_ahead=args.read_ahead,
+            listing_workers=args.listing_workers,
+            partition=args.partition,
+            jobs_file=args.jobs,
+            fill=args.fill,
+            lease=args.lease,
+            worker=args.worker
         )
         us.run()
     except KeyboardInterrupt:
@@ -0,0 +1,115 @@
+# coding: utf-8
+import zlib
+import argparse
+
+try:
+    from .listing import lists_identifiers
+except ImportError:
+    from listing import lists_identifiers
+
+
+class Partition(object):
+    """
+    Shard ``k`` of ``n`` of the documents, by the CRC32 of their Solr id
+    (``pid-collection``). The hash does not depend on the process or the
+    machine, so ``n`` independent runs, one by shard, handle every document
+    exactly once.
+
+    :param k: shard number, from 1 to ``n``.
+    :param n: number of shards.
+    """
+
+    def __init__(self, k, n):
+        if n < 1 or not 1 <= k <= n:
+            raise ValueError('Invalid partition %d/%d' % (k, n))
+
+        self.k = k
+        self.n = n
+
+    def __contains__(self, document_id):
+        return zlib.crc32(document_id.encode('utf-8')) % self.n == self.k - 1
+
+    def __str__(self):
+        return '%d/%d' % (self.k, self.n)
+
+    def accepts(self, identifier):
+        """
+        Whether an ArticleMeta identifier belongs to the shard.
+        """
+        return '%s-%s' % (identifier.code, identifier.collection) in self
+
+    def accepts_article(self, article):
+        """
+        Whether a xylose Article belongs to the shard.
+        """
+        return '%s-%s' % (article.publisher_id, article.collection_acronym) in self
+
+
+def parse(value):
+    """
+    ``argparse`` type of the ``K/N`` partitions.
+    """
+    try:
+        k, n = [int(i) for i in value.split('/')]
+        return Partition(k, n)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'invalid partition %r, use K/N with 1 <= K <= N' % value)
+
+
+class PartitionedClient(object):
+    """
+    ArticleMeta client listing only the documents of a partition. The
+    identifiers are listed and filtered before the documents are requested.
+    Clients that cannot list identifiers, as the REST client, list the full
+    documents, filtered afterwards.
+
+    :param client: ArticleMeta client.
+    :param partition: Partition instance.
+    """
+
+    def __init__(self, client, partition):
+        self.client = client
+        self.partition = partition
+
+    @property
+    def lists_identifiers(self):
+        return lists_identifiers(self.client)
+
+    def document(self, code, collection, **kwargs):
+        return self.client.document(code=code, collection=collection, **kwargs)
+
+    def documents(self, collection=None, issn=None, from_date=None,
+                  until_date=None, only_identifiers=False):
+        if not only_identifiers and not self.lists_identifiers:
+            for article in self.client.documents(
+                collection=collection,
+                issn=issn,
+                from_date=from_date,
+                until_date=until_date
+            ):
+                if article and self.partition.accepts_article(article):
+                    yield article
+            return
+
+        identifiers = self.client.documents(
+            collection=collection,
+            issn=issn,
+            from_date=from_date,
+            until_date=until_date,
+            only_identifiers=True
+        )
+
+        for identifier in identifiers:
+            if not self.partition.accepts(identifier):
+                continue
+
+            if only_identifiers:
+                yield identifier
+                continue
+
+            article = self.client.document(
+                code=identifier.code, collection=identifier.collection)
+
+            if article:
+                yield article
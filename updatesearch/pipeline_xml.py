@@ -8,12 +8,16 @@ from citedby import client
 
 try:
     from .collection_classification import get_collection_classifications
+    from . import citation_cache
 except ImportError:
     from collection_classification import get_collection_classifications
+    import citation_cache
 
 
 CITEDBY = client.ThriftClient(domain='citedby.scielo.org:11610')
 
+CITATION_CACHE = citation_cache.open_cache()
+
 _CONFIG_DIR = os.path.dirname(os.path.abspath(__file__))
 
 with open(os.path.join(_CONFIG_DIR, 'networks_config.json')) as json_file:
@@ -738,15 +742,28 @@ class SciELOPublicationDate(plumber.Pipe):
         return data
 
 
+def fetch_received_citations(pid):
+    result = CITEDBY.citedby_pid(pid, metaonly=True)
+
+    return result.get('article', {'total_received': 0})['total_received']
+
+
 class ReceivedCitations(plumber.Pipe):
 
     def transform(self, data):
         raw, xml = data
 
-        result = CITEDBY.citedby_pid(raw.publisher_id, metaonly=True)
+        if CITATION_CACHE is not None:
+            total = CITATION_CACHE.total_received(
+                raw.publisher_id,
+                fetch_received_citations,
+                publication_date=raw.publication_date
+            )
+        else:
+            total = fetch_received_citations(raw.publisher_id)
 
         field = ET.Element('field')
-        field.text = str(result.get('article', {'total_received': 0})['total_received'])
+        field.text = str(total)
         field.set('name', 'total_received')
         xml.find('.').append(field)
 
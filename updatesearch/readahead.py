@@ -0,0 +1,90 @@
+# coding: utf-8
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+READ_AHEAD = 100
+
+_DONE = object()
+
+
+class ReadAhead(object):
+    """
+    Iterate over ``iterable`` in a background thread, keeping up to
+    ``depth`` items ready in a buffer, so the next pages of an ArticleMeta
+    listing are requested while the caller works on the current one.
+
+    Errors of the iterable are raised by the consumer, after the items read
+    before them.
+
+    :param iterable: iterable read in the background.
+    :param depth: maximum number of items read ahead.
+    """
+
+    def __init__(self, iterable, depth=READ_AHEAD):
+        self.depth = depth
+        self._items = queue.Queue(maxsize=max(depth, 1))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._read, args=(iterable,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def _read(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put((item, None)):
+                    return
+        except Exception as e:
+            self._put((_DONE, e))
+            return
+
+        self._put((_DONE, None))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._stop.is_set():
+            raise StopIteration
+
+        item, error = self._items.get()
+
+        if item is _DONE:
+            self._stop.set()
+            if error is not None:
+                raise error
+            raise StopIteration
+
+        return item
+
+    next = __next__
+
+    def close(self):
+        """
+        Stop reading, the items still in the buffer are discarded.
+        """
+        self._stop.set()
+
+
+def read_ahead(iterable, depth=READ_AHEAD):
+    """
+    Return ``iterable`` read ahead by a ``ReadAhead``, or as is when
+    ``depth`` is 0.
+    """
+    if not depth:
+        return iterable
+
+    return ReadAhead(iterable, depth)
@@ -0,0 +1,220 @@
+#!/usr/bin/python
+# coding: utf-8
+import os
+import time
+import argparse
+import textwrap
+import threading
+
+from updatepreprint import oai
+from updatepreprint import updatepreprint
+
+try:
+    from . import metadata
+    from . import engine
+    from . import writer
+    from . import spool
+    from .solrclient import connect, SOLR_POOL_SIZE
+except ImportError:
+    import metadata
+    import engine
+    import writer
+    import spool
+    from solrclient import connect, SOLR_POOL_SIZE
+
+
+SOLR_URL = os.environ.get('SOLR_URL', 'http://127.0.0.1/solr')
+OAI_URL = os.environ.get('OAI_URL', 'http://preprints.scielo.org/index.php/scielo/oai')
+
+
+class Replay(object):
+    """
+    Reprocess the documents recorded in a dead-letter spool.
+
+    Each document is fetched again from its source, ArticleMeta or the
+    preprints OAI server, transformed and sent to Solr. Documents are
+    fetched and transformed concurrently by ``threads`` workers. Documents
+    that fail again are recorded in a new spool at the same path.
+    """
+
+    def __init__(self, spool_file, solr_url=SOLR_URL, oai_url=OAI_URL,
+                 threads=4, load_indicators=False):
+        self.spool_file = spool_file
+        self.oai_url = oai_url
+        self.threads = threads
+        self.load_indicators = load_indicators
+        self.solr = connect(solr_url, pool_size=max(threads, SOLR_POOL_SIZE))
+        self.articlemeta = metadata.AMClient()
+        self.deleted = []
+        self._local = threading.local()
+
+    def oai_reader(self):
+        # One OAI session by worker thread.
+        if not hasattr(self._local, 'reader'):
+            self._local.reader = oai.OAIReader(self.oai_url, verify=False)
+
+        return self._local.reader
+
+    def transform(self, entry):
+        """
+        Fetch and transform the document of a spool entry.
+
+        :returns: list of serialized ``<doc>`` elements, or None for the
+                  failed removals and the preprints removed from the OAI
+                  server, removed by id at the end.
+        """
+        reference = entry['reference']
+
+        if entry['stage'] == 'delete':
+            self.deleted.append(entry['id'])
+            return None
+
+        if entry['source'] == 'articlemeta':
+            document = self.articlemeta.document(
+                code=reference['code'], collection=reference['collection'])
+
+            if not document:
+                raise ValueError('Document not found in ArticleMeta')
+
+            return metadata.pipeline_to_docs(
+                document, load_indicators=self.load_indicators)
+
+        if entry['source'] == 'oai':
+            record = self.oai_reader().GetRecord(
+                identifier=reference['identifier'], metadataPrefix='oai_dc')
+
+            if not record.header.deleted:
+                return [writer.serialize(doc) for doc in
+                        updatepreprint.pipeline_to_docs(record.xml)]
+
+            self.deleted.append(entry['id'])
+            return None
+
+        raise ValueError('Unknown source: %s' % entry['source'])
+
+    def run(self):
+        entries, replaying = spool.take(self.spool_file)
+        by_id = dict((entry['id'], entry) for entry in entries)
+        failures = spool.Spool(self.spool_file)
+
+        def failed(entry, stage, exception):
+            print("Error: {0}".format(exception))
+            failures.append(
+                entry['id'], stage, exception, entry['source'],
+                **entry['reference'])
+
+        def write_error(docs, exception):
+            for document_id in writer.document_ids(docs):
+                if document_id in by_id:
+                    failed(by_id[document_id], 'write', exception)
+
+        if not entries:
+            print("Nothing to replay in {0}".format(self.spool_file))
+            if os.path.exists(replaying):
+                os.remove(replaying)
+            return
+
+        print("Replaying {0} documents from {1}".format(len(entries), replaying))
+
+        solr_writer = writer.open_writer(
+            self.solr, max_concurrency=self.threads, on_error=write_error)
+
+        def write(docs):
+            for doc in docs:
+                solr_writer.add(doc)
+
+        replayer = engine.Engine(
+            self.transform,
+            write,
+            transformers=self.threads,
+            writers=1,
+            on_error=failed,
+            log=print
+        )
+
+        try:
+            replayer.run(entries)
+        finally:
+            solr_writer.close()
+
+        if self.deleted:
+            delete = ''.join('<id>%s</id>' % i for i in self.deleted)
+            try:
+                self.solr.update('<delete>%s</delete>' % delete, commit=False)
+            except Exception as e:
+                for document_id in self.deleted:
+                    failed(by_id[document_id], 'delete', e)
+
+        self.solr.commit()
+        os.remove(replaying)
+
+        print(solr_writer.report())
+        print("Replayed {0} documents, {1} failed again.".format(
+            len(entries) - failures.count, failures.count))
+        self.solr.log_stats(print)
+
+
+def main():
+
+    usage = """\
+    Reprocess the documents recorded in a dead-letter spool.
+
+    update_search and update_search_preprint record the documents that fail
+    to be indexed in the spool set with --spool. This process fetches these
+    documents again from ArticleMeta or the preprints OAI server and index
+    them in SciELO Solr. Documents that fail again stay in the spool.
+    """
+
+    parser = argparse.ArgumentParser(textwrap.dedent(usage))
+
+    parser.add_argument(
+        'spool',
+        help='dead-letter spool file.'
+    )
+
+    parser.add_argument(
+        '-t', '--threads',
+        type=int,
+        default=4,
+        help='number of documents fetched and transformed concurrently.'
+    )
+
+    parser.add_argument(
+        '-n', '--load_indicators',
+        default=False,
+        action='store_true',
+        help='Load articles received citations while including documents from ArticleMeta.'
+    )
+
+    parser.add_argument(
+        '--solr_url',
+        default=SOLR_URL,
+        help='Solr RESTFul URL, default is the environment variable ``SOLR_URL``. Use comma separated URLs to index in several Solr at once.'
+    )
+
+    parser.add_argument(
+        '--oai_url',
+        default=OAI_URL,
+        help='OAI URL of the preprints server, default is the environment variable ``OAI_URL``.'
+    )
+
+    args = parser.parse_args()
+
+    start = time.time()
+
+    try:
+        Replay(
+            args.spool,
+            solr_url=args.solr_url,
+            oai_url=args.oai_url,
+            threads=args.threads,
+            load_indicators=args.load_indicators
+        ).run()
+    except KeyboardInterrupt:
+        print("Interrupt by user")
+    finally:
+        end = time.time()
+        print("Duration {0} seconds.".format(end-start))
+
+if __name__ == "__main__":
+    main()
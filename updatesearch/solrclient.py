@@ -0,0 +1,433 @@
+# coding: utf-8
+import os
+import gzip
+import time
+import zlib
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+import SolrAPI
+
+logger = logging.getLogger(__name__)
+
+SOLR_TIMEOUT = float(os.environ.get('SOLR_TIMEOUT', 10))
+SOLR_CONNECT_TIMEOUT = float(os.environ.get('SOLR_CONNECT_TIMEOUT', 5))
+SOLR_POOL_SIZE = int(os.environ.get('SOLR_POOL_SIZE', 10))
+SOLR_RETRIES = int(os.environ.get('SOLR_RETRIES', 5))
+SOLR_BACKOFF = float(os.environ.get('SOLR_BACKOFF', 0.5))
+SOLR_OPTIMIZE_TIMEOUT = float(os.environ.get('SOLR_OPTIMIZE_TIMEOUT', 3600))
+SOLR_GZIP = os.environ.get('SOLR_GZIP', 'False') == 'True'
+SOLR_GZIP_LEVEL = int(os.environ.get('SOLR_GZIP_LEVEL', 6))
+
+# Size of the slices of the update body compressed and sent at a time.
+GZIP_CHUNK_SIZE = 64 * 1024
+
+# CPU time of the current thread, process wide before Python 3.7.
+thread_time = getattr(time, 'thread_time', time.process_time)
+
+# HTTP status codes of transient Solr failures, retried for idempotent
+# operations.
+RETRY_STATUS = (429, 502, 503, 504)
+
+
+class SolrError(Exception):
+    """
+    Solr answered an HTTP error, or failed after all the retries.
+    """
+
+    def __init__(self, message, status_code=None):
+        super(SolrError, self).__init__(message)
+        self.status_code = status_code
+
+
+class SolrStats(object):
+    """
+    Latency counters by Solr operation (select, update, delete, commit,
+    optimize).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.operations = {}
+        self.gzip = {'updates': 0, 'bytes': 0, 'sent_bytes': 0, 'cpu_seconds': 0.0}
+
+    def _counters(self, operation):
+        return self.operations.setdefault(operation, {
+            'requests': 0, 'errors': 0, 'retries': 0,
+            'seconds': 0.0, 'max_seconds': 0.0,
+        })
+
+    def record(self, operation, seconds, error=False):
+        with self._lock:
+            counters = self._counters(operation)
+            counters['requests'] += 1
+            counters['seconds'] += seconds
+            counters['max_seconds'] = max(counters['max_seconds'], seconds)
+            if error:
+                counters['errors'] += 1
+
+    def retry(self, operation):
+        with self._lock:
+            self._counters(operation)['retries'] += 1
+
+    def compressed(self, size, sent, cpu_seconds):
+        with self._lock:
+            self.gzip['updates'] += 1
+            self.gzip['bytes'] += size
+            self.gzip['sent_bytes'] += sent
+            self.gzip['cpu_seconds'] += cpu_seconds
+
+    def report(self):
+        """
+        Return one line by operation with the number of requests, errors,
+        retries and the average and max latency.
+        """
+        lines = []
+        with self._lock:
+            for operation, c in sorted(self.operations.items()):
+                lines.append(
+                    '{0}: {1} requests, {2} errors, {3} retries, '
+                    'avg {4:.3f}s, max {5:.3f}s'.format(
+                        operation, c['requests'], c['errors'], c['retries'],
+                        c['seconds'] / c['requests'] if c['requests'] else 0,
+                        c['max_seconds']))
+
+            g = self.gzip
+            if g['updates']:
+                lines.append(
+                    'gzip: {0} updates, {1} bytes sent as {2} ({3:.1%}), '
+                    '{4:.3f}s CPU'.format(
+                        g['updates'], g['bytes'], g['sent_bytes'],
+                        g['sent_bytes'] / g['bytes'] if g['bytes'] else 0,
+                        g['cpu_seconds']))
+
+        return lines
+
+
+class Solr(SolrAPI.Solr):
+    """
+    SolrAPI client sharing a pooled keep-alive HTTP session between all the
+    requests, with exponential backoff retries for idempotent operations and
+    latency counters in ``stats``.
+
+    Defaults come from the environment variables ``SOLR_TIMEOUT``,
+    ``SOLR_CONNECT_TIMEOUT``, ``SOLR_POOL_SIZE``, ``SOLR_RETRIES`` and
+    ``SOLR_BACKOFF``.
+
+    With ``compress`` (``SOLR_GZIP=True``) the update bodies are gzip
+    compressed while they are sent, with ``Content-Encoding: gzip``. Solr
+    must accept compressed requests, ex.: Jetty ``GzipHandler`` with request
+    inflation enabled. When Solr answers 415, or 400 and 500 to the first
+    compressed update, as Solr parsing the gzip stream as XML, the update
+    is sent again uncompressed once. If it succeeds the compression is
+    disabled for the session. The same applies to the bodies already
+    compressed by the caller, sent with ``update(compressed=True)``.
+
+    Unlike SolrAPI, HTTP errors raise ``SolrError``.
+    """
+
+    def __init__(self, url, timeout=None, connect_timeout=None, pool_size=None,
+                 retries=None, backoff=None, compress=None, compress_level=None):
+        super(Solr, self).__init__(url, timeout=timeout or SOLR_TIMEOUT)
+        self.connect_timeout = connect_timeout or SOLR_CONNECT_TIMEOUT
+        self.retries = SOLR_RETRIES if retries is None else retries
+        self.backoff = SOLR_BACKOFF if backoff is None else backoff
+        self.compress = SOLR_GZIP if compress is None else compress
+        self.compress_level = compress_level or SOLR_GZIP_LEVEL
+        # Unknown until the first compressed update succeeds or is refused.
+        self.gzip_supported = None
+        self.stats = SolrStats()
+
+        pool_size = pool_size or SOLR_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _sleep(self, attempt, response=None):
+        delay = self.backoff * (2 ** attempt)
+
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+
+        time.sleep(delay)
+
+    def request(self, operation, method, path, idempotent=True, retries=None,
+                timeout=None, **kwargs):
+        """
+        Send a request to Solr.
+
+        Connection errors, timeouts and ``RETRY_STATUS`` responses are
+        retried with exponential backoff when the operation is idempotent.
+
+        :param operation: operation name used by the latency counters.
+        :param method: HTTP method.
+        :param path: path after the core URL, ex.: ``/update``.
+        :param idempotent: whether the request can be safely repeated.
+        :param retries: number of retries, default ``self.retries``.
+        :param timeout: read timeout in seconds, default ``self.timeout``.
+
+        :returns: requests.Response
+        """
+        if not idempotent:
+            retries = 0
+        elif retries is None:
+            retries = self.retries
+
+        body = kwargs.pop('data', None)
+
+        for attempt in range(retries + 1):
+            # A body factory builds a new stream for each attempt.
+            data = body() if callable(body) else body
+
+            start = time.time()
+            try:
+                response = self.session.request(
+                    method, self.url + path, data=data,
+                    timeout=(self.connect_timeout, timeout or self.timeout),
+                    **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.stats.record(operation, time.time() - start, error=True)
+
+                if attempt < retries:
+                    logger.warning(
+                        "Solr %s failed (%s), retrying (%d/%d)",
+                        operation, e, attempt + 1, retries)
+                    self.stats.retry(operation)
+                    self._sleep(attempt)
+                    continue
+
+                raise SolrError('Solr %s failed at %s: %s' % (operation, self.url, e))
+
+            error = response.status_code >= 400
+            self.stats.record(operation, time.time() - start, error=error)
+
+            if response.status_code in RETRY_STATUS and attempt < retries:
+                logger.warning(
+                    "Solr %s answered %d, retrying (%d/%d)",
+                    operation, response.status_code, attempt + 1, retries)
+                self.stats.retry(operation)
+                self._sleep(attempt, response)
+                continue
+
+            if error:
+                raise SolrError(
+                    'Solr %s at %s answered %d: %s' % (
+                        operation, self.url, response.status_code,
+                        response.text[:500]),
+                    status_code=response.status_code)
+
+            return response
+
+    def select(self, params, format='json'):
+        params['wt'] = format
+
+        return self.request('select', 'GET', '/select', params=params).text
+
+    def delete(self, query, commit=False):
+        params = {'commit': 'true'} if commit else {}
+        headers = {'Content-Type': 'text/xml; charset=utf-8'}
+        data = '<delete><query>{0}</query></delete>'.format(query)
+
+        return self.request(
+            'delete', 'POST', '/update', params=params, headers=headers,
+            data=data).text
+
+    def gzip(self, data):
+        """
+        Compress ``data`` to a gzip stream, yielding each compressed slice
+        as soon as it is ready. The sizes and the CPU time spent are added
+        to ``stats`` at the end of the stream.
+        """
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+
+        compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, 31)
+        sent = 0
+        cpu = 0.0
+
+        for start in range(0, len(data), GZIP_CHUNK_SIZE):
+            begin = thread_time()
+            chunk = compressor.compress(data[start:start + GZIP_CHUNK_SIZE])
+            cpu += thread_time() - begin
+
+            if chunk:
+                sent += len(chunk)
+                yield chunk
+
+        begin = thread_time()
+        chunk = compressor.flush()
+        cpu += thread_time() - begin
+        sent += len(chunk)
+        yield chunk
+
+        logger.debug(
+            "Compressed %d bytes to %d (%.1f%%) in %.3fs CPU",
+            len(data), sent, 100.0 * sent / len(data) if data else 0, cpu)
+        self.stats.compressed(len(data), sent, cpu)
+
+    def update(self, data, headers=None, commit=False, idempotent=True,
+               retries=None, compressed=False):
+        """
+        :param compressed: ``data`` is already a gzip stream, sent as it is
+                           unless Solr does not accept compressed updates.
+        """
+        params = {'commit': 'true'} if commit else {}
+        headers = headers or {'Content-Type': 'text/xml; charset=utf-8'}
+
+        if compressed and self.gzip_supported is False:
+            data = gzip.decompress(data)
+            compressed = False
+
+        if not compressed and not self.compress:
+            return self.request(
+                'update', 'POST', '/update', idempotent=idempotent,
+                retries=retries, params=params, headers=headers, data=data).text
+
+        try:
+            text = self.request(
+                'update', 'POST', '/update', idempotent=idempotent,
+                retries=retries, params=params,
+                headers=dict(headers, **{'Content-Encoding': 'gzip'}),
+                data=data if compressed else lambda: self.gzip(data)).text
+        except SolrError as e:
+            if not self.gzip_refused(e):
+                raise
+            refused = e
+        else:
+            self.gzip_supported = True
+            return text
+
+        if compressed:
+            data = gzip.decompress(data)
+
+        # An error of the plain update is not caused by the compression.
+        text = self.request(
+            'update', 'POST', '/update', idempotent=idempotent,
+            retries=retries, params=params, headers=headers, data=data).text
+
+        logger.warning(
+            "Solr does not accept compressed updates (%s), disabling gzip",
+            refused)
+        self.compress = False
+        self.gzip_supported = False
+
+        return text
+
+    def gzip_refused(self, error):
+        """
+        Whether the error of a compressed update may mean Solr does not
+        accept compressed requests: a 415, or a 400 or 500 while no
+        compressed update succeeded.
+        """
+        if error.status_code == 415:
+            return True
+
+        return self.gzip_supported is None and error.status_code in (400, 500)
+
+    def commit(self, waitsearcher=False):
+        data = '<commit waitSearcher="' + str(waitsearcher).lower() + '"/>'
+        headers = {'Content-Type': 'text/xml; charset=utf-8'}
+
+        return self.request(
+            'commit', 'POST', '/update', headers=headers, data=data).text
+
+    def optimize(self):
+        """
+        Force the merge of the index segments. The merge of a large core
+        takes long and a retry would queue another one, so the request is
+        sent once with the ``SOLR_OPTIMIZE_TIMEOUT`` read timeout.
+        """
+        headers = {'Content-Type': 'text/xml; charset=utf-8'}
+
+        return self.request(
+            'optimize', 'GET', '/update', retries=0,
+            timeout=SOLR_OPTIMIZE_TIMEOUT, params={'optimize': 'true'},
+            headers=headers).text
+
+    def log_stats(self, log=None):
+        """
+        Write the latency counters with ``log`` (default ``logger.info``).
+        """
+        log = log or logger.info
+
+        for line in self.stats.report():
+            log("Solr {0}".format(line))
+
+
+class SolrFanout(object):
+    """
+    Several Solr targets kept in sync, ex.: a primary and a mirror.
+
+    Updates, deletes, commits and optimizations are sent to all the targets
+    concurrently, each one with its own session and retries, and raise the
+    first error once all the targets answered. Queries are answered by the
+    first target, the primary.
+
+    :param targets: list of ``Solr`` instances.
+    """
+
+    def __init__(self, targets):
+        self.targets = targets
+        self.url = ', '.join(target.url for target in targets)
+        self._executor = ThreadPoolExecutor(max_workers=len(targets))
+
+    def _all(self, method, *args, **kwargs):
+        futures = [
+            self._executor.submit(getattr(target, method), *args, **kwargs)
+            for target in self.targets]
+
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
+        return futures[0].result()
+
+    def select(self, params, format='json'):
+        return self.targets[0].select(params, format=format)
+
+    def delete(self, query, commit=False):
+        return self._all('delete', query, commit=commit)
+
+    def update(self, data, headers=None, commit=False, idempotent=True,
+               retries=None, compressed=False):
+        return self._all(
+            'update', data, headers=headers, commit=commit,
+            idempotent=idempotent, retries=retries, compressed=compressed)
+
+    def commit(self, waitsearcher=False):
+        return self._all('commit', waitsearcher=waitsearcher)
+
+    def optimize(self):
+        return self._all('optimize')
+
+    def log_stats(self, log=None):
+        log = log or logger.info
+
+        for target in self.targets:
+            for line in target.stats.report():
+                log("Solr {0} {1}".format(target.url, line))
+
+
+def connect(urls, **kwargs):
+    """
+    Return a ``Solr`` client for one URL or a ``SolrFanout`` for several.
+
+    :param urls: Solr URL, list of URLs or comma separated URLs.
+    :param kwargs: ``Solr`` arguments used for every target.
+    """
+    if isinstance(urls, str):
+        urls = urls.split(',')
+
+    urls = [url.strip() for url in urls if url.strip()]
+
+    if len(urls) == 1:
+        return Solr(urls[0], **kwargs)
+
+    return SolrFanout([Solr(url, **kwargs) for url in urls])
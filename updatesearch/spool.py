@@ -0,0 +1,95 @@
+# coding: utf-8
+import os
+import json
+import threading
+from datetime import datetime
+
+
+class Spool(object):
+    """
+    Dead-letter spool of the documents that failed to be indexed.
+
+    Each failure is appended as a JSON line with the Solr id of the
+    document, the stage that failed (fetch, transform, write, delete), the
+    error and the reference needed to fetch the document again from its
+    source, ex.:
+
+        {"id": "S0034-89102010000400007-scl", "stage": "transform",
+         "error": "ValueError: ...", "source": "articlemeta",
+         "reference": {"code": "S0034-89102010000400007", "collection": "scl"},
+         "time": "2020-05-01T10:00:00"}
+
+    The spool is reprocessed by ``update_search_replay``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def append(self, document_id, stage, exception, source, **reference):
+        """
+        Record a failed document.
+
+        :param document_id: Solr id of the document.
+        :param stage: name of the stage that failed.
+        :param exception: the error raised.
+        :param source: where the document comes from, ``articlemeta`` or
+                       ``oai``.
+        :param reference: arguments to fetch the document from the source.
+        """
+        entry = {
+            'id': document_id,
+            'stage': stage,
+            'error': '{0}: {1}'.format(type(exception).__name__, exception),
+            'source': source,
+            'reference': reference,
+            'time': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self.count += 1
+
+
+def read(path):
+    """
+    Iterate over the entries of a spool file.
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def take(path):
+    """
+    Move the spool aside to be replayed and return its entries, the last
+    failure of each document only.
+
+    Entries of a previous replay that did not finish are included, new
+    failures are appended to a new spool at ``path``.
+
+    :returns: (entries, path of the spool being replayed)
+    """
+    replaying = path + '.replaying'
+
+    entries = {}
+    if os.path.exists(replaying):
+        for entry in read(replaying):
+            entries[(entry['source'], entry['id'])] = entry
+
+    if os.path.exists(path):
+        for entry in read(path):
+            entries[(entry['source'], entry['id'])] = entry
+
+        with open(replaying, 'w', encoding='utf-8') as f:
+            for entry in entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.remove(path)
+
+    return list(entries.values()), replaying
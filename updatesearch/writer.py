@@ -0,0 +1,336 @@
+# coding: utf-8
+import os
+import time
+import logging
+import threading
+
+from lxml import etree as ET
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from .solrclient import SolrError, RETRY_STATUS, SOLR_RETRIES, SOLR_BACKOFF
+except ImportError:
+    from solrclient import SolrError, RETRY_STATUS, SOLR_RETRIES, SOLR_BACKOFF
+
+logger = logging.getLogger(__name__)
+
+SOLR_TARGET_LATENCY = float(os.environ.get('SOLR_TARGET_LATENCY', 2))
+SOLR_MAX_BATCH = int(os.environ.get('SOLR_MAX_BATCH', 1000))
+SOLR_MAX_CONCURRENCY = int(os.environ.get('SOLR_MAX_CONCURRENCY', 4))
+
+_STOP = object()
+
+
+def overloaded(exception):
+    """
+    Whether the error means Solr is overloaded: timeouts, connection errors
+    and ``RETRY_STATUS`` answers.
+    """
+    if not isinstance(exception, SolrError):
+        return False
+
+    return exception.status_code is None or exception.status_code in RETRY_STATUS
+
+
+def serialize(doc):
+    """
+    Return a ``<doc>`` element serialized to bytes, bytes are kept as is.
+    """
+    if isinstance(doc, bytes):
+        return doc
+
+    return ET.tostring(doc, encoding="utf-8", method="xml")
+
+
+def document_ids(docs):
+    """
+    Return the Solr ids of serialized ``<doc>`` elements.
+    """
+    return [ET.fromstring(doc).findtext('field[@name="id"]') for doc in docs]
+
+
+class SolrWriter(object):
+    """
+    Send ``<doc>`` elements to Solr in batched update requests, tuning the
+    batch size and the number of concurrent requests from the observed
+    update latency (AIMD).
+
+    While the updates answer under ``target_latency`` seconds the batch size
+    grows by ``increase`` documents up to ``max_batch``, then the
+    concurrency grows by one request up to ``max_concurrency``. An update
+    slower than the target halves the batch size, and an overloaded Solr
+    (429, 502, 503, 504, timeouts) halves both the batch size and the
+    concurrency. Overloaded batches are retried split at the new batch size.
+
+    Batches are queued to sender threads; ``add`` blocks when
+    ``max_concurrency`` batches are waiting, which holds back the producer.
+
+    A batch failing for another reason, as a document rejected with a 400,
+    is split in halves and sent again until the failing documents are
+    isolated. Failed documents are passed to ``on_error(docs, exception)``,
+    without it ``flush`` raises the first error.
+
+    :param solr: updatesearch.solrclient.Solr instance.
+    :param batch_size: initial number of documents by update request.
+    :param commit_within: ``commitWithin`` milliseconds set in the updates.
+    """
+
+    def __init__(self, solr, batch_size=100, min_batch=1,
+                 max_batch=SOLR_MAX_BATCH, concurrency=1,
+                 max_concurrency=SOLR_MAX_CONCURRENCY,
+                 target_latency=SOLR_TARGET_LATENCY, increase=10,
+                 decrease=0.5, retries=SOLR_RETRIES, backoff=SOLR_BACKOFF,
+                 commit_within=None, on_error=None):
+        self.solr = solr
+        self.max_batch = max(max_batch, 1)
+        self.min_batch = min(max(min_batch, 1), self.max_batch)
+        self.batch_size = min(max(batch_size, self.min_batch), self.max_batch)
+        self.max_concurrency = max(max_concurrency, 1)
+        self.concurrency = min(max(concurrency, 1), self.max_concurrency)
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.retries = retries
+        self.backoff = backoff
+        self.commit_within = commit_within
+        self.on_error = on_error
+
+        self.documents = 0
+        self.batches = 0
+        self.errors = 0
+        self._failures = []
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._slots = threading.Condition(self._lock)
+        self._active = 0
+        self._batches = queue.Queue(maxsize=self.max_concurrency)
+        self._threads = []
+
+    def _start(self):
+        for _ in range(self.max_concurrency):
+            thread = threading.Thread(target=self._sender)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def add(self, doc):
+        """
+        Add a ``<doc>`` element, or its serialization, to the next batch.
+        """
+        doc = serialize(doc)
+
+        with self._lock:
+            self._buffer.append(doc)
+            if len(self._buffer) < self.batch_size:
+                return
+            batch, self._buffer = self._buffer, []
+
+        self._put(batch)
+
+    def _put(self, batch):
+        if not self._threads:
+            self._start()
+
+        self._batches.put(batch)
+
+    def flush(self):
+        """
+        Send the pending documents and wait for all the updates.
+        """
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+
+        if batch:
+            self._put(batch)
+
+        self._batches.join()
+
+        with self._lock:
+            failures, self._failures = self._failures, []
+
+        if failures:
+            raise failures[0]
+
+    def close(self):
+        """
+        Flush and stop the sender threads.
+        """
+        try:
+            self.flush()
+        finally:
+            for _ in self._threads:
+                self._batches.put(_STOP)
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+
+    def payload(self, docs):
+        add = b'<add>'
+        if self.commit_within:
+            add = ('<add commitWithin="%d">' % self.commit_within).encode('utf-8')
+
+        return add + b''.join(docs) + b'</add>'
+
+    def _sender(self):
+        while True:
+            batch = self._batches.get()
+
+            if batch is _STOP:
+                self._batches.task_done()
+                break
+
+            try:
+                self._send(batch)
+            finally:
+                self._batches.task_done()
+
+    def _send(self, docs, attempt=0):
+        with self._slots:
+            while self._active >= self.concurrency:
+                self._slots.wait()
+            self._active += 1
+
+        start = time.time()
+        try:
+            self.solr.update(self.payload(docs), commit=False, retries=0)
+        except Exception as e:
+            self._release()
+
+            if overloaded(e):
+                self._adjust(time.time() - start, overloaded=True)
+
+                if attempt < self.retries:
+                    logger.warning(
+                        "Solr overloaded (%s), retrying %d documents in batches of %d",
+                        e, len(docs), self.batch_size)
+                    time.sleep(self.backoff * (2 ** attempt))
+                    for chunk in self.chunks(docs):
+                        self._send(chunk, attempt + 1)
+                    return
+            elif len(docs) > 1:
+                # One rejected document fails the whole update, the halves
+                # are sent again until it is isolated.
+                half = len(docs) // 2
+                self._send(docs[:half], attempt)
+                self._send(docs[half:], attempt)
+                return
+
+            self._fail(docs, e)
+            return
+
+        self._release()
+        self._adjust(time.time() - start)
+
+        with self._lock:
+            self.documents += len(docs)
+            self.batches += 1
+
+    def chunks(self, docs):
+        size = self.batch_size
+        for i in range(0, len(docs), size):
+            yield docs[i:i + size]
+
+    def _release(self):
+        with self._slots:
+            self._active -= 1
+            self._slots.notify_all()
+
+    def _fail(self, docs, exception):
+        with self._lock:
+            self.errors += 1
+            if self.on_error is None:
+                self._failures.append(exception)
+
+        if self.on_error is not None:
+            self.on_error(docs, exception)
+
+    def _adjust(self, latency, overloaded=False):
+        with self._slots:
+            if overloaded:
+                self.batch_size = max(self.min_batch, int(self.batch_size * self.decrease))
+                self.concurrency = max(1, int(self.concurrency * self.decrease))
+            elif latency > self.target_latency:
+                self.batch_size = max(self.min_batch, int(self.batch_size * self.decrease))
+            elif self.batch_size < self.max_batch:
+                self.batch_size = min(self.max_batch, self.batch_size + self.increase)
+            elif self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+                self._slots.notify_all()
+
+    def report(self):
+        return (
+            'Sent {0} documents in {1} updates, {2} failed; batch size {3}, '
+            'concurrency {4}'.format(
+                self.documents, self.batches, self.errors, self.batch_size,
+                self.concurrency))
+
+
+class FanoutWriter(object):
+    """
+    Send the same documents to several Solr targets, each one with its own
+    ``SolrWriter``: its own queue, batch size, concurrency and retries. A
+    slow target only holds back the producer once its queue is full.
+
+    Documents are serialized once and shared by all the targets.
+
+    :param writers: list of (Solr URL, SolrWriter).
+    """
+
+    def __init__(self, writers):
+        self.writers = writers
+
+    @property
+    def batch_size(self):
+        return min(w.batch_size for url, w in self.writers)
+
+    @property
+    def concurrency(self):
+        return min(w.concurrency for url, w in self.writers)
+
+    def add(self, doc):
+        doc = serialize(doc)
+
+        for url, solr_writer in self.writers:
+            solr_writer.add(doc)
+
+    def _each(self, method):
+        errors = []
+        for url, solr_writer in self.writers:
+            try:
+                getattr(solr_writer, method)()
+            except Exception as e:
+                errors.append(e)
+
+        if errors:
+            raise errors[0]
+
+    def flush(self):
+        self._each('flush')
+
+    def close(self):
+        self._each('close')
+
+    def report(self):
+        return '\n'.join(
+            '{0}: {1}'.format(url, solr_writer.report())
+            for url, solr_writer in self.writers)
+
+
+def open_writer(solr, **kwargs):
+    """
+    Return the writer of a ``Solr`` client, a ``FanoutWriter`` for a
+    ``SolrFanout``.
+
+    :param kwargs: ``SolrWriter`` arguments used for every target.
+    """
+    targets = getattr(solr, 'targets', None)
+
+    if targets is None:
+        return SolrWriter(solr, **kwargs)
+
+    return FanoutWriter([
+        (target.url, SolrWriter(target, **kwargs)) for target in targets])